@@ -1,19 +1,195 @@
-import json, time, os
+import atexit, json, time, os, queue, threading
+from typing import Dict, Optional
+
 from cryptography.fernet import Fernet
+from prometheus_client import Counter, Gauge, Histogram
+
+from effin.common.ledger import FlatLedger, SegmentedLedger
+from effin.common.metrics import gauge_function
 
 AUDIT_FILE = os.getenv("AUDIT_FILE", "effin/audit_ledger.jsonl")
 FERNET_KEY = os.getenv("FERNET_KEY")
 
-fernet = Fernet(FERNET_KEY.encode())
+# fsync after this many events / this many ms since the last fsync (0 = never on that trigger)
+AUDIT_FSYNC_EVERY = int(os.getenv("AUDIT_FSYNC_EVERY", "1000"))
+AUDIT_FSYNC_MS = float(os.getenv("AUDIT_FSYNC_MS", "1000"))
 
-def write_event(event: dict):
-    """Encrypt and append audit event."""
-    event["ts"] = time.time()
-    raw = json.dumps(event).encode()
-    token = fernet.encrypt(raw)
+# segmented: rolling segments + offset index (see effin/common/ledger.py); flat: single file
+AUDIT_FORMAT = os.getenv("AUDIT_FORMAT", "segmented").lower()
+AUDIT_SEGMENT_MB = float(os.getenv("AUDIT_SEGMENT_MB", "64"))
+AUDIT_SEGMENT_S = float(os.getenv("AUDIT_SEGMENT_S", "3600"))
+
+AUDIT_QUEUE_DEPTH = Gauge("effin_audit_queue_depth", "Audit events waiting for the writer thread")
+AUDIT_EVENTS = Counter("effin_audit_events_total", "Audit events written to the ledger")
+AUDIT_GROUP_SIZE = Histogram(
+    "effin_audit_group_size", "Audit events per ledger write",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+AUDIT_FSYNC_SECONDS = Histogram("effin_audit_fsync_seconds", "Time spent in fsync of the audit ledger")
+AUDIT_ERRORS = Counter("effin_audit_write_errors_total", "Failed audit ledger writes (retried)")
+
+_CLOSE = object()
+
+
+class AuditWriter:
+    """
+    Encrypted append-only JSONL ledger written by a background thread.
+
+    write() only enqueues; the thread drains everything queued, encrypts it
+    and appends it in one write to file handles kept open for its lifetime
+    (a segmented or flat ledger, see effin/common/ledger.py).
+    The file is fsynced once `fsync_every` events or `fsync_ms` milliseconds
+    have accumulated since the last fsync, and always on close().
+
+    Events are serialized on the writer thread: the caller hands the dict
+    over and must not mutate it afterwards.
+    """
+
+    def __init__(self, path: str, fernet: Fernet, fsync_every: int = AUDIT_FSYNC_EVERY,
+                 fsync_ms: float = AUDIT_FSYNC_MS, max_group: int = 1000, fmt: str = AUDIT_FORMAT,
+                 segment_bytes: int = int(AUDIT_SEGMENT_MB * (1 << 20)), segment_seconds: float = AUDIT_SEGMENT_S):
+        self.path = path
+        self.fernet = fernet
+        self.fsync_every = fsync_every
+        self.fsync_s = fsync_ms / 1000.0
+        self.max_group = max(1, max_group)
+
+        if fmt == "flat":
+            self.ledger = FlatLedger(path)
+        else:
+            self.ledger = SegmentedLedger(path, segment_bytes, segment_seconds)
+
+        self._q = queue.Queue()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._closed = False
+        gauge_function(AUDIT_QUEUE_DEPTH, self._q.qsize)
+
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    # ----------------------------------------------
+    # Producer side
+    # ----------------------------------------------
+    def write(self, event: dict):
+        if self._closed:
+            raise RuntimeError("audit writer is closed")
+        self._q.put(event)
+
+    def flush(self):
+        """Block until every event written so far is on disk (written + fsynced)."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._q.put(done)
+        done.wait()
 
-    # ensure directory exists
-    os.makedirs(os.path.dirname(AUDIT_FILE), exist_ok=True)
+    def close(self):
+        """Write out everything queued, fsync and close the file. Idempotent."""
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(_CLOSE)
+        self._thread.join()
 
-    with open(AUDIT_FILE, "ab") as f:
-        f.write(token + b"\n")
+    # ----------------------------------------------
+    # Writer thread
+    # ----------------------------------------------
+    def _append(self, tokens, ts: float):
+        """Append one encrypted group, retrying until it lands (nothing is dropped)."""
+        while True:
+            try:
+                self.ledger.append(tokens, ts)
+                return
+            except OSError as e:
+                AUDIT_ERRORS.inc()
+                print(f"[ERROR] Audit write to {self.path} failed, retrying: {e}")
+                try:
+                    self.ledger.close()
+                except OSError:
+                    pass
+                time.sleep(1.0)
+
+    def _sync(self):
+        if not self._unsynced:
+            return
+        t0 = time.perf_counter()
+        self.ledger.sync()
+        AUDIT_FSYNC_SECONDS.observe(time.perf_counter() - t0)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _sync_due(self) -> bool:
+        if not self._unsynced:
+            return False
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            return True
+        return bool(self.fsync_s) and time.monotonic() - self._last_sync >= self.fsync_s
+
+    def _run(self):
+        stop = False
+        while not stop:
+            timeout = None
+            if self._unsynced and self.fsync_s:
+                timeout = max(0.0, self._last_sync + self.fsync_s - time.monotonic())
+            try:
+                first = self._q.get(timeout=timeout)
+            except queue.Empty:
+                self._sync()
+                continue
+
+            group, waiters = [], []
+            item = first
+            while True:
+                if item is _CLOSE:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    group.append(item)
+                if len(group) >= self.max_group:
+                    break
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+
+            if group:
+                now = time.time()
+                self._append([self.fernet.encrypt(json.dumps(e, default=str).encode()) for e in group], now)
+                self._unsynced += len(group)
+                AUDIT_EVENTS.inc(len(group))
+                AUDIT_GROUP_SIZE.observe(len(group))
+
+            if stop or waiters or self._sync_due():
+                self._sync()
+            for w in waiters:
+                w.set()
+
+        self.ledger.close()
+
+
+# ------------------------------------------------------------
+# Shared writers: one per ledger file, so appends never interleave
+# ------------------------------------------------------------
+_writers: Dict[str, AuditWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path: Optional[str] = None, **kwargs) -> AuditWriter:
+    """Process-wide writer for `path` (default AUDIT_FILE); closed at exit."""
+    path = path or AUDIT_FILE
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            if not FERNET_KEY:
+                raise RuntimeError("FERNET_KEY missing")
+            writer = _writers[path] = AuditWriter(path, Fernet(FERNET_KEY.encode()), **kwargs)
+            atexit.register(writer.close)
+        return writer
+
+
+def write_event(event: dict):
+    """Encrypt and append audit event (queued; see AuditWriter)."""
+    event["ts"] = time.time()
+    get_writer().write(event)
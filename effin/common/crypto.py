@@ -1,6 +1,15 @@
 # effin/common/crypto.py
 import os
-from cryptography.fernet import Fernet
+import base64
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 import numpy as np
 import hashlib
 
@@ -11,6 +20,11 @@ if not FERNET_KEY:
 
 fernet = Fernet(FERNET_KEY.encode())
 
+# Token format for new vector tokens: fernet (readable by any Fernet client) | aesgcm (see below)
+VECTOR_CIPHER = os.getenv("VECTOR_CIPHER", "fernet").lower()
+# Threads for encrypt_vectors_b64 / decrypt_vectors_b64 on large batches (0 = caller's thread)
+CRYPTO_THREADS = int(os.getenv("CRYPTO_THREADS", "0"))
+
 
 def encrypt_vector(vec: np.ndarray) -> bytes:
     """
@@ -24,9 +38,9 @@ def encrypt_vector(vec: np.ndarray) -> bytes:
 
 def decrypt_vector(token: bytes, dtype=np.float32, shape=None) -> np.ndarray:
     """
-    Decrypt a Fernet token (bytes) and return a numpy array.
+    Decrypt a vector token (Fernet or AES-GCM, bytes) and return a numpy array.
     """
-    b = fernet.decrypt(token)
+    b = _open_token(token)
     arr = np.frombuffer(b, dtype=dtype)
     if shape:
         arr = arr.reshape(shape)
@@ -52,6 +66,134 @@ def decrypt_vector_b64(token_b64: str, dtype=np.float32, shape=None) -> np.ndarr
     return decrypt_vector(token, dtype=dtype, shape=shape)
 
 
+# ----------------------------
+# Batched vector tokens
+#
+# fernet: standard Fernet tokens (Fernet.encrypt per vector), readable by any
+#   Fernet client holding FERNET_KEY.
+# aesgcm: base64url(0x82 | salt(16) | nonce(12) | AES-256-GCM ciphertext + tag(16)).
+#   The key is derived from FERNET_KEY with HKDF under the token's salt; each
+#   process draws a fresh salt at start and again every GCM_KEY_MAX_TOKENS
+#   tokens, keeping every subkey far below the ~2^32 random-nonce limit.
+#   Authenticated, shorter and cheaper per token than Fernet. Readable by
+#   decrypt_vector(s)_b64 on any node sharing FERNET_KEY — not by plain
+#   Fernet clients. Tokens from before the salt (0x81 | nonce | ct, one key
+#   for all) are still read.
+# Large batches can be split across CRYPTO_THREADS threads: the cipher calls
+# release the GIL.
+# ----------------------------
+_GCM_HEADER = b"\x82"
+_GCM_HEADER_V1 = b"\x81"
+# New subkey (fresh random salt) after this many tokens in one process
+GCM_KEY_MAX_TOKENS = int(os.getenv("GCM_KEY_MAX_TOKENS", str(2 ** 28)))
+
+_master = base64.urlsafe_b64decode(FERNET_KEY.encode())
+
+
+@functools.lru_cache(maxsize=1024)
+def _gcm_key(salt: Optional[bytes]) -> AESGCM:
+    return AESGCM(HKDF(algorithm=hashes.SHA256(), length=32, salt=salt,
+                       info=b"effin vector tokens v1").derive(_master))
+
+
+_gcm_epoch_lock = threading.Lock()
+_gcm_salt = b""
+_gcm_used = 0
+
+
+def _gcm_epoch(n: int):
+    """(salt, key) for the next n tokens, rotating the salt once the current one has sealed its quota."""
+    global _gcm_salt, _gcm_used
+    with _gcm_epoch_lock:
+        if not _gcm_salt or _gcm_used + n > GCM_KEY_MAX_TOKENS:
+            _gcm_salt, _gcm_used = os.urandom(16), 0
+        _gcm_used += n
+        return _gcm_salt, _gcm_key(_gcm_salt)
+
+_crypto_pool: Optional[ThreadPoolExecutor] = None
+_crypto_pool_lock = threading.Lock()
+
+
+def _seal_fernet(plains: Sequence[bytes]) -> List[bytes]:
+    return [fernet.encrypt(p) for p in plains]
+
+
+def _seal_gcm(plains: Sequence[bytes]) -> List[bytes]:
+    salt, gcm = _gcm_epoch(len(plains))
+    head = _GCM_HEADER + salt
+    nonces = os.urandom(12 * len(plains))
+    return [
+        base64.urlsafe_b64encode(head + nonces[12 * k:12 * k + 12] + gcm.encrypt(nonces[12 * k:12 * k + 12], p, head))
+        for k, p in enumerate(plains)
+    ]
+
+
+def _open_token(token) -> bytes:
+    """One Fernet or AES-GCM token (str or bytes) → plaintext; InvalidToken on any bad token."""
+    try:
+        if isinstance(token, str):
+            token = token.encode()
+        raw = base64.urlsafe_b64decode(token)
+        if raw[:1] == _GCM_HEADER:
+            if len(raw) < 29:
+                raise ValueError("short token")
+            return _gcm_key(raw[1:17]).decrypt(raw[17:29], raw[29:], raw[:17])
+        if raw[:1] == _GCM_HEADER_V1:
+            return _gcm_key(None).decrypt(raw[1:13], raw[13:], _GCM_HEADER_V1)
+        return fernet.decrypt(token)
+    except (InvalidToken, InvalidTag, ValueError, TypeError, AttributeError):
+        raise InvalidToken from None
+
+
+def _open_tokens(tokens: Sequence) -> List[bytes]:
+    return [_open_token(t) for t in tokens]
+
+
+def _in_threads(fn, items: Sequence, threads: int, min_chunk: int = 256) -> list:
+    """fn(chunk) over `threads` chunks of items (in order), or inline for small inputs."""
+    global _crypto_pool
+    if threads <= 1 or len(items) < 2 * min_chunk:
+        return fn(items)
+    with _crypto_pool_lock:
+        if _crypto_pool is None or _crypto_pool._max_workers < threads:
+            _crypto_pool = ThreadPoolExecutor(threads, thread_name_prefix="effin-crypto")
+    step = max(min_chunk, -(-len(items) // threads))
+    out = []
+    for part in _crypto_pool.map(fn, [items[i:i + step] for i in range(0, len(items), step)]):
+        out.extend(part)
+    return out
+
+
+def encrypt_vectors_b64(matrix: np.ndarray, mode: Optional[str] = None, threads: Optional[int] = None) -> List[str]:
+    """
+    One token string per row of `matrix` (float32 bytes of the row), in
+    VECTOR_CIPHER mode unless `mode` is given ("fernet" | "aesgcm").
+    """
+    mode = (mode or VECTOR_CIPHER).lower()
+    seal = {"fernet": _seal_fernet, "aesgcm": _seal_gcm}.get(mode)
+    if seal is None:
+        raise ValueError(f"unknown vector cipher {mode!r} (fernet | aesgcm)")
+    mat = np.ascontiguousarray(matrix, dtype=np.float32)
+    row = mat.shape[1] * 4 if mat.ndim == 2 else 0
+    data = mat.tobytes()
+    plains = [data[i:i + row] for i in range(0, len(data), row)] if row else []
+    tokens = _in_threads(seal, plains, CRYPTO_THREADS if threads is None else threads)
+    return [t.decode() for t in tokens]
+
+
+def decrypt_vectors_b64(tokens: Sequence[str], dtype=np.float32, threads: Optional[int] = None) -> np.ndarray:
+    """
+    Token strings (Fernet or AES-GCM, mixed) → (N, dim) matrix. Every token
+    is authenticated first; raises InvalidToken if any fails.
+    """
+    if not len(tokens):
+        return np.empty((0, 0), dtype=dtype)
+    plains = _in_threads(_open_tokens, list(tokens), CRYPTO_THREADS if threads is None else threads)
+    if len({len(p) for p in plains}) != 1:
+        raise InvalidToken("vector tokens of different lengths")
+    return np.frombuffer(b"".join(plains), dtype=dtype).reshape(len(plains), -1)
+
+
 # ----------------------------
 # Raw bytes helpers
 # ----------------------------
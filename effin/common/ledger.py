@@ -0,0 +1,399 @@
+# effin/common/ledger.py
+"""
+Audit ledger storage.
+
+Flat ledger: one Fernet token per line in a single file (the original format).
+
+Segmented ledger: `audit_bank1.jsonl` → directory `audit_bank1.ledger/` holding
+    00000001.jsonl   Fernet tokens, one per line (same format as a flat ledger)
+    00000001.idx     one '<Qd' record per line: byte offset, write timestamp
+A segment is rolled once it exceeds `segment_bytes` or `segment_seconds`.
+Record count, first / last timestamp and the offset of any record are read
+from the .idx without touching the tokens, so tail and time-range reads cost
+what they return, not the size of the ledger.
+"""
+import glob
+import os
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+IDX_RECORD = struct.Struct("<Qd")          # byte offset, unix timestamp
+IDX_DTYPE = np.dtype([("offset", "<u8"), ("ts", "<f8")])
+
+
+def ledger_dir(path: str) -> str:
+    """Segment directory belonging to the flat ledger path `path`."""
+    return os.path.splitext(path)[0] + ".ledger"
+
+
+# ------------------------------------------------------------
+# Writers (used by effin.common.audit.AuditWriter)
+# ------------------------------------------------------------
+class FlatLedger:
+    """Single append-only file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = None
+
+    def append(self, tokens: List[bytes], ts: float):
+        if self._f is None:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            self._f = open(self.path, "ab")
+        self._f.write(b"".join(t + b"\n" for t in tokens))
+        self._f.flush()
+
+    def sync(self):
+        if self._f is not None:
+            os.fsync(self._f.fileno())
+
+    def close(self):
+        if self._f is not None:
+            f, self._f = self._f, None
+            f.close()
+
+
+class SegmentedLedger:
+    """Rolling segments with a sidecar offset / timestamp index."""
+
+    def __init__(self, path: str, segment_bytes: int = 64 << 20, segment_seconds: float = 3600.0):
+        self.dir = ledger_dir(path)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self._data = None
+        self._idx = None
+        self._seq = 0
+        self._size = 0
+        self._opened_at = 0.0
+
+    def _open(self, ts: float):
+        os.makedirs(self.dir, exist_ok=True)
+        segments = list_segments(self.dir)
+        if segments:
+            last = Segment(segments[-1])
+            self._seq = int(os.path.basename(last.path)[:8])
+            size = os.path.getsize(last.path)
+            idx = last.index()
+            first = last.first_ts
+            # continue the last segment only if its index covers every line in it
+            clean = size == 0 or (len(idx) and _read(last.path, int(idx["offset"][-1])).count(b"\n") == 1)
+            if clean and size < self.segment_bytes and (first is None or ts - first < self.segment_seconds):
+                self._data = open(last.path, "ab")
+                self._idx = open(last.idx_path, "ab")
+                self._idx.truncate(len(idx) * IDX_RECORD.size)   # drop a torn index record
+                self._size = size
+                self._opened_at = ts if first is None else first
+                return
+        self._roll(ts)
+
+    def _roll(self, ts: float):
+        self.close()
+        self._seq += 1
+        path = os.path.join(self.dir, f"{self._seq:08d}.jsonl")
+        self._data = open(path, "ab")
+        self._idx = open(path[:-6] + ".idx", "ab")
+        self._size = 0
+        self._opened_at = ts
+
+    def append(self, tokens: List[bytes], ts: float):
+        if self._data is None:
+            self._open(ts)
+        elif self._size >= self.segment_bytes or ts - self._opened_at >= self.segment_seconds:
+            self.sync()
+            self._roll(ts)
+
+        idx = bytearray()
+        off = self._size
+        for t in tokens:
+            idx += IDX_RECORD.pack(off, ts)
+            off += len(t) + 1
+        # data before index: a crash can leave unindexed lines, never an index past the data
+        self._data.write(b"".join(t + b"\n" for t in tokens))
+        self._data.flush()
+        self._idx.write(idx)
+        self._idx.flush()
+        self._size = off
+
+    def sync(self):
+        if self._data is not None:
+            os.fsync(self._data.fileno())
+            os.fsync(self._idx.fileno())
+
+    def close(self):
+        for f in (self._data, self._idx):
+            if f is not None:
+                f.close()
+        self._data = self._idx = None
+
+
+# ------------------------------------------------------------
+# Readers
+# ------------------------------------------------------------
+def list_segments(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, "[0-9]" * 8 + ".jsonl")))
+
+
+def _split(data: bytes) -> List[bytes]:
+    return [line for line in data.split(b"\n") if line.strip()]
+
+
+def _read(path: str, start: int, end: Optional[int] = None) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read() if end is None else f.read(max(0, end - start))
+
+
+def _tail_offset(path: str, n: int, block: int = 1 << 16) -> int:
+    """Byte offset where the last n lines of a file start, reading backwards block by block."""
+    with open(path, "rb") as f:
+        end = pos = f.seek(0, os.SEEK_END)
+        data = b""
+        # n + 1 newlines: the one ending the file plus one in front of each wanted line
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    if n <= 0:
+        return end
+    cut = len(data)
+    for _ in range(n + (1 if data.endswith(b"\n") else 0)):
+        cut = data.rfind(b"\n", 0, cut)
+        if cut < 0:
+            return pos
+    return pos + cut + 1
+
+
+class Segment:
+    """One .jsonl file, with its .idx sidecar when it has one."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.idx_path = path[:-6] + ".idx" if path.endswith(".jsonl") else path + ".idx"
+
+    def index(self) -> np.ndarray:
+        """(count,) structured array of (offset, ts); memory-mapped, empty if unindexed."""
+        try:
+            count = os.path.getsize(self.idx_path) // IDX_RECORD.size
+        except OSError:
+            return np.empty(0, dtype=IDX_DTYPE)
+        if count == 0:
+            return np.empty(0, dtype=IDX_DTYPE)
+        return np.memmap(self.idx_path, dtype=IDX_DTYPE, mode="r", shape=(count,))
+
+    @property
+    def indexed(self) -> bool:
+        return os.path.exists(self.idx_path)
+
+    @property
+    def count(self) -> int:
+        if not self.indexed:
+            with open(self.path, "rb") as f:     # flat file: one scan
+                return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+        return len(self.index())
+
+    @property
+    def first_ts(self) -> Optional[float]:
+        idx = self.index()
+        return float(idx["ts"][0]) if len(idx) else None
+
+    @property
+    def last_ts(self) -> Optional[float]:
+        idx = self.index()
+        return float(idx["ts"][-1]) if len(idx) else None
+
+    def tail_offset(self, n: int) -> int:
+        """Byte offset of the n-th last record (lines written past the index included)."""
+        if not self.indexed:
+            return _tail_offset(self.path, n)
+        idx = self.index()
+        return int(idx["offset"][max(0, len(idx) - n)]) if len(idx) and n > 0 else 0
+
+    def tail(self, n: int) -> List[bytes]:
+        if n <= 0:
+            return []
+        return _split(_read(self.path, self.tail_offset(n)))[-n:]
+
+    def byte_range(self, t0: float, t1: float) -> Optional[Tuple[int, int]]:
+        """[start, end) bytes of the indexed records written within [t0, t1], or None."""
+        idx = self.index()
+        if not len(idx):
+            return None
+        ts = idx["ts"]
+        i = int(np.searchsorted(ts, t0, "left"))
+        j = int(np.searchsorted(ts, t1, "right"))
+        if i >= j:
+            return None
+        if j < len(idx):
+            return int(idx["offset"][i]), int(idx["offset"][j])
+        last = int(idx["offset"][-1])
+        with open(self.path, "rb") as f:
+            f.seek(last)
+            return int(idx["offset"][i]), last + len(f.readline())
+
+    def range(self, t0: float, t1: float, fernet=None) -> List[bytes]:
+        if not self.indexed:
+            lines = _split(_read(self.path, 0))
+            if fernet is None:
+                return lines
+            return [t for t in lines if t0 <= _token_ts(fernet, t) <= t1]
+        span = self.byte_range(t0, t1)
+        return _split(_read(self.path, *span)) if span else []
+
+
+def _token_ts(fernet, token: bytes) -> float:
+    try:
+        return float(fernet.extract_timestamp(token))
+    except Exception:
+        return float("nan")
+
+
+class LedgerReader:
+    """
+    Read side of a ledger path. A pre-existing flat file at `path` is treated
+    as the oldest (unindexed) segment, followed by the segment directory.
+    Returns raw Fernet tokens, oldest first.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dir = ledger_dir(path)
+
+    def segments(self) -> List[Segment]:
+        segs = [Segment(self.path)] if os.path.isfile(self.path) else []
+        return segs + [Segment(p) for p in list_segments(self.dir)]
+
+    def count(self) -> int:
+        return sum(s.count for s in self.segments())
+
+    def tail(self, n: int = 500) -> List[bytes]:
+        """Last n tokens; reads only the segments (and bytes) that hold them."""
+        out: List[List[bytes]] = []
+        need = n
+        for seg in reversed(self.segments()):
+            if need <= 0:
+                break
+            lines = seg.tail(need)
+            out.append(lines)
+            need -= len(lines)
+        return [t for lines in reversed(out) for t in lines]
+
+    def range(self, t0: float, t1: float, fernet=None) -> Iterator[bytes]:
+        """
+        Tokens written within [t0, t1]. Indexed segments that do not overlap
+        the range are skipped from their index alone (unindexed lines left by
+        a crash are only visible to tail()); a flat file is filtered by Fernet
+        token timestamp when `fernet` is given, else returned whole.
+        """
+        for seg in self.segments():
+            if seg.indexed:
+                first, last = seg.first_ts, seg.last_ts
+                if first is None or first > t1 or last < t0:
+                    continue
+            yield from seg.range(t0, t1, fernet)
+
+
+class LedgerFollower:
+    """
+    tail -f over a ledger: remembers the segment, inode and byte offset it has
+    read up to and decodes only records appended since the last poll().
+
+    Keeps the last `window` decoded events in a deque. poll() is thread-safe
+    and cheap to call from many readers: within `min_interval` seconds of the
+    last disk read it returns the current window without touching the ledger.
+    A replaced or truncated file (different inode, or shorter than the saved
+    offset) restarts the window from the new file's tail.
+    `on_new(events)` is called with each poll's newly decoded events; the
+    first poll starts `backfill` records back (default: `window`).
+
+    `decode(token)` decodes one record. Alternatively `decode_range(path,
+    start, end)` decodes the new bytes of a segment at once (e.g.
+    LedgerDecoder.decode_file, which skips and counts corrupted records).
+    """
+
+    def __init__(self, path: str, decode: Optional[Callable[[bytes], dict]] = None, window: int = 500,
+                 min_interval: float = 1.0, on_new: Optional[Callable[[List[dict]], None]] = None,
+                 backfill: Optional[int] = None,
+                 decode_range: Optional[Callable[[str, int, int], Iterable[dict]]] = None):
+        if (decode is None) == (decode_range is None):
+            raise ValueError("LedgerFollower takes one of decode / decode_range")
+        self.reader = LedgerReader(path)
+        self.decode = decode
+        self.decode_range = decode_range
+        self.window = window
+        self.min_interval = min_interval
+        self.on_new = on_new
+        self.backfill = window if backfill is None else backfill
+        self.events: Deque[dict] = deque(maxlen=window)
+        self.decoded = 0           # events decoded so far, for observability
+        self._seg: Optional[str] = None
+        self._ino = None
+        self._pos = 0
+        self._polled = 0.0
+        self._lock = threading.Lock()
+
+    def _start(self, segments: List[Segment]):
+        """Position the cursor `backfill` records before the end."""
+        self.events.clear()
+        need = self.backfill
+        k = len(segments) - 1
+        while k > 0 and need > segments[k].count:
+            need -= segments[k].count
+            k -= 1
+        seg = segments[k]
+        self._seg, self._ino = seg.path, os.stat(seg.path).st_ino
+        self._pos = seg.tail_offset(need)
+
+    def _moved(self, paths: List[str]) -> bool:
+        if self._seg not in paths:
+            return True
+        st = os.stat(self._seg)
+        return st.st_ino != self._ino or st.st_size < self._pos
+
+    def _advance(self):
+        segments = self.reader.segments()
+        if not segments:
+            return
+        paths = [s.path for s in segments]
+        if self._seg is None or self._moved(paths):
+            self._start(segments)
+            paths = [s.path for s in self.reader.segments()]
+
+        new = []
+        while True:
+            data = _read(self._seg, self._pos)
+            cut = data.rfind(b"\n") + 1          # complete lines only
+            if self.decode_range is None:
+                new += [self.decode(token) for token in _split(data[:cut])]
+            elif cut:
+                new += self.decode_range(self._seg, self._pos, self._pos + cut)
+            self._pos += cut
+
+            k = paths.index(self._seg)
+            if k + 1 >= len(paths):
+                break
+            # a newer segment exists: this one is finished
+            self._seg = paths[k + 1]
+            self._ino = os.stat(self._seg).st_ino
+            self._pos = 0
+
+        self.decoded += len(new)
+        self.events.extend(new)
+        if new and self.on_new is not None:
+            self.on_new(new)
+
+    def poll(self) -> List[dict]:
+        """Current window of decoded events, oldest first."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._polled >= self.min_interval:
+                self._advance()
+                self._polled = now
+            return list(self.events)
@@ -0,0 +1,146 @@
+# effin/common/ledger_decode.py
+"""
+Bulk audit-ledger decoding (decrypt + JSON parse), optionally across a
+process pool. Used by the dashboard and the aggregator to read ledgers, and
+by tools/benchmark_decrypt.py.
+"""
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple, Union
+
+from cryptography.fernet import Fernet
+
+from effin.common.ledger import LedgerReader
+
+# LedgerDecoder processes used by the dashboard / aggregator (1 = decode in-process)
+LEDGER_DECODE_WORKERS = int(os.getenv("LEDGER_DECODE_WORKERS", "1"))
+
+# path, start, end, key, t0, t1 (t0 / t1 only for unindexed files, filtered by token timestamp)
+Job = Tuple[str, int, int, Fernet, Optional[float], Optional[float]]
+
+
+def _decode_chunk(job: Job) -> Tuple[List[dict], int]:
+    """Decrypt + JSON-parse the lines in bytes [start, end) of a ledger file."""
+    path, start, end, fernet, t0, t1 = job
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        data = fh.read(end - start)
+    events, corrupted = [], 0
+    for line in data.split(b"\n"):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            if t0 is not None or t1 is not None:
+                ts = fernet.extract_timestamp(line)
+                if (t0 is not None and ts < t0) or (t1 is not None and ts > t1):
+                    continue
+            events.append(json.loads(fernet.decrypt(line)))
+        except Exception:
+            corrupted += 1
+    return events, corrupted
+
+
+def _chunk_bounds(path: str, start: int, end: int, chunk_bytes: int) -> Iterator[Tuple[int, int]]:
+    """Split [start, end) into ~chunk_bytes ranges that end on a newline."""
+    with open(path, "rb") as fh:
+        pos = start
+        while pos < end:
+            cut = min(end, pos + chunk_bytes)
+            if cut < end:
+                fh.seek(cut)
+                cut = min(end, cut + len(fh.readline()))
+            yield pos, cut
+            pos = cut
+
+
+class LedgerDecoder:
+    """
+    Decrypts and parses audit ledgers across a process pool.
+
+    Files (or byte ranges of them) are cut into ~`chunk_bytes` pieces on line
+    boundaries; workers read and decode their own piece, so only parsed
+    events cross the process boundary. Results stream back in ledger order
+    with at most 2 × workers chunks in flight. Lines that fail to decrypt or
+    parse are skipped and counted in `corrupted`.
+
+    `key` (a FERNET_KEY string or a Fernet) is the default; each call may
+    pass its own, so one pool serves ledgers under different keys.
+    workers=1 decodes in-process (no pool).
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_bytes: int = 1 << 20,
+                 key: Union[str, Fernet, None] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_bytes = chunk_bytes
+        self.key = key or os.getenv("FERNET_KEY")
+        self.corrupted = 0
+        self.decoded = 0
+        self._pool = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+
+    def _fernet(self, key) -> Fernet:
+        key = key or self.key
+        if not key:
+            raise RuntimeError("FERNET_KEY missing")
+        return key if isinstance(key, Fernet) else Fernet(key.encode() if isinstance(key, str) else key)
+
+    def _run(self, jobs: Iterator[Job]) -> Iterator[dict]:
+        results = map(_decode_chunk, jobs) if self._pool is None else self._ordered(jobs)
+        for events, corrupted in results:
+            self.corrupted += corrupted
+            self.decoded += len(events)
+            yield from events
+
+    def _ordered(self, jobs):
+        pending = deque()
+        for job in jobs:
+            pending.append(self._pool.submit(_decode_chunk, job))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def decode_file(self, path: str, start: int = 0, end: Optional[int] = None, key=None) -> Iterator[dict]:
+        """Events in bytes [start, end) of one ledger file, in order."""
+        fernet = self._fernet(key)
+        end = os.path.getsize(path) if end is None else end
+        return self._run((path, a, b, fernet, None, None) for a, b in _chunk_bounds(path, start, end, self.chunk_bytes))
+
+    def decode_ledger(self, path: str, t0: Optional[float] = None, t1: Optional[float] = None,
+                      key=None) -> Iterator[dict]:
+        """
+        Events of a (flat or segmented) ledger written within [t0, t1], in
+        order. Indexed segments are read only where their index overlaps the
+        range; unindexed (flat) files are scanned and filtered by Fernet
+        token timestamp, like LedgerReader.range().
+        """
+        fernet = self._fernet(key)
+        ranged = t0 is not None or t1 is not None
+
+        def jobs():
+            for seg in LedgerReader(path).segments():
+                if not ranged or not seg.indexed:
+                    span, bounds = (0, os.path.getsize(seg.path)), (t0, t1)
+                else:
+                    span = seg.byte_range(t0 if t0 is not None else float("-inf"),
+                                          t1 if t1 is not None else float("inf"))
+                    if span is None:
+                        continue
+                    bounds = (None, None)       # the index already selected the records
+                for a, b in _chunk_bounds(seg.path, span[0], span[1], self.chunk_bytes):
+                    yield (seg.path, a, b, fernet) + bounds
+
+        return self._run(jobs())
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,41 @@
+# effin/common/metrics.py
+import asyncio
+import os
+from typing import Callable, List, Tuple
+
+from prometheus_client import CollectorRegistry, Gauge, start_http_server
+
+# Set (before prometheus_client is imported) by the multi-process node: every
+# process writes its samples to files there and the front process serves them.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+_sampled: List[Tuple[Gauge, Callable[[], float]]] = []
+
+
+def gauge_function(gauge: Gauge, fn: Callable[[], float]):
+    """
+    Gauge.set_function(), which multiprocess mode silently ignores: there the
+    value is sampled by sample_gauges() instead.
+    """
+    if MULTIPROC_DIR:
+        _sampled.append((gauge, fn))
+    else:
+        gauge.set_function(fn)
+
+
+async def sample_gauges(interval: float = 1.0):
+    """Multiprocess mode: copy gauge_function() values into the gauges; cancel the task to stop it."""
+    while True:
+        for gauge, fn in _sampled:
+            gauge.set(fn())
+        await asyncio.sleep(interval)
+
+
+def serve(port: int):
+    """/metrics on `port`: this process, or every process of the node in multiprocess mode."""
+    if not MULTIPROC_DIR:
+        return start_http_server(port)
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return start_http_server(port, registry=registry)
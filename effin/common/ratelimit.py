@@ -0,0 +1,99 @@
+# effin/common/ratelimit.py
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `burst` banked; take() never blocks."""
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self, n: float = 1.0, now: Optional[float] = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def delay(self, n: float = 1.0, now: Optional[float] = None) -> float:
+        """Seconds until `n` tokens are available (0 if they are now)."""
+        self._refill(time.monotonic() if now is None else now)
+        return max(0.0, (n - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+
+
+class KeyedRateLimiter:
+    """
+    One TokenBucket per key, created full on first use. Buckets live in an
+    LRU of at most `max_keys`; an evicted key simply starts over with a full
+    bucket, so memory stays bounded however many keys show up.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def allow(self, key: Hashable, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(1.0, now)
+
+
+class TTLSet:
+    """
+    Recently seen keys: a key stays "seen" for `ttl` seconds after it was
+    first added, and at most `max_keys` are kept (oldest evicted first).
+    """
+
+    def __init__(self, ttl: float, max_keys: int = 100_000):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._seen: "OrderedDict[Hashable, float]" = OrderedDict()    # key → expiry, in insertion order
+
+    def __len__(self):
+        return len(self._seen)
+
+    def __contains__(self, key: Hashable) -> bool:
+        expiry = self._seen.get(key)
+        return expiry is not None and expiry > time.monotonic()
+
+    def add(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """Record `key`; False if it was already seen within the TTL."""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        if key in self._seen:
+            return False
+        self._seen[key] = now + self.ttl
+        if len(self._seen) > self.max_keys:
+            self._seen.popitem(last=False)
+        return True
+
+    def _expire(self, now: float):
+        # same TTL for every key, so insertion order is expiry order
+        seen = self._seen
+        while seen:
+            key, expiry = next(iter(seen.items()))
+            if expiry > now:
+                break
+            del seen[key]
@@ -0,0 +1,188 @@
+# effin/common/rings.py
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class RingEngine:
+    """
+    Online fraud-ring clustering: connected components over alert edges
+    (tx ↔ matched tx) with a union-find (union by size, path halving), so
+    each edge costs amortized ~O(1).
+
+    Ring IDs are stable: when two rings merge, the older ID survives. Each
+    ring tracks its size (txs), edge count, the banks it spans and when it
+    was first / last seen.
+
+    Edges older than `window_s`, or beyond the newest `max_edges`, expire.
+    Union-find cannot delete, so once as many edges have expired as are
+    still live the structure is rebuilt from the live edges (amortized
+    O(1) per edge, memory bounded by `max_edges`). After a rebuild every
+    component keeps the oldest ring ID among its txs; if expiry split a
+    ring, the largest part keeps the ID and the others get new ones.
+    """
+
+    def __init__(self, window_s: float = 3600.0, max_edges: int = 1_000_000, prefix: str = "ring-"):
+        self.window_s = window_s
+        self.max_edges = max_edges
+        self.prefix = prefix
+        self._next_ring = 0
+        self._edges: Deque[Tuple[float, int, int]] = deque()
+        self._expired = 0
+        self._bank_idx: Dict[str, int] = {}
+        self.banks: List[str] = []
+        self._reset_nodes()
+
+    def _reset_nodes(self):
+        self._ids: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._node_bank: List[int] = []
+        self._parent: List[int] = []
+        # valid at roots only
+        self._size: List[int] = []
+        self._nedges: List[int] = []
+        self._mask: List[int] = []
+        self._ring: List[int] = []
+        self._first: List[float] = []
+        self._last: List[float] = []
+
+    def __len__(self):
+        """Txs currently tracked."""
+        return len(self._keys)
+
+    @property
+    def live_edges(self) -> int:
+        return len(self._edges)
+
+    # ----------------------------------------------
+    # Union-find
+    # ----------------------------------------------
+    def _bank(self, bank: Optional[str]) -> int:
+        if bank is None:
+            return -1
+        b = self._bank_idx.get(bank)
+        if b is None:
+            b = self._bank_idx[bank] = len(self.banks)
+            self.banks.append(bank)
+        return b
+
+    def _node(self, key: str, b: int, ts: float, ring: Optional[int] = None) -> int:
+        i = self._ids.get(key)
+        if i is None:
+            i = self._ids[key] = len(self._keys)
+            self._keys.append(key)
+            self._node_bank.append(b)
+            self._parent.append(i)
+            self._size.append(1)
+            self._nedges.append(0)
+            self._mask.append(1 << b if b >= 0 else 0)
+            if ring is None:
+                ring, self._next_ring = self._next_ring, self._next_ring + 1
+            self._ring.append(ring)
+            self._first.append(ts)
+            self._last.append(ts)
+        return i
+
+    def _find(self, x: int) -> int:
+        parent = self._parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def _union(self, a: int, b: int, ts: float) -> int:
+        ra, rb = self._find(a), self._find(b)
+        if ra != rb:
+            if self._size[ra] < self._size[rb]:
+                ra, rb = rb, ra
+            self._parent[rb] = ra
+            self._size[ra] += self._size[rb]
+            self._nedges[ra] += self._nedges[rb]
+            self._mask[ra] |= self._mask[rb]
+            self._ring[ra] = min(self._ring[ra], self._ring[rb])      # oldest ID survives
+            self._first[ra] = min(self._first[ra], self._first[rb])
+            self._last[ra] = max(self._last[ra], self._last[rb])
+        self._nedges[ra] += 1
+        self._last[ra] = max(self._last[ra], ts)
+        return ra
+
+    # ----------------------------------------------
+    # Public API
+    # ----------------------------------------------
+    def add_edge(self, u: str, v: str, ts: Optional[float] = None,
+                 u_bank: Optional[str] = None, v_bank: Optional[str] = None) -> str:
+        """Record an alert edge; returns the ring ID both txs now belong to."""
+        ts = time.time() if ts is None else ts
+        a = self._node(u, self._bank(u_bank), ts)
+        b = self._node(v, self._bank(v_bank), ts)
+        self._union(a, b, ts)
+        self._edges.append((ts, a, b))
+        if len(self._edges) > self.max_edges:
+            self._edges.popleft()
+            self._expired += 1
+        self._maybe_rebuild()       # renumbers nodes: look the ring up by key afterwards
+        return self.prefix + format(self._ring[self._find(self._ids[u])], "x")
+
+    def ring_of(self, key: str) -> Optional[str]:
+        i = self._ids.get(key)
+        return None if i is None else self.prefix + format(self._ring[self._find(i)], "x")
+
+    def info(self, key: str) -> Optional[dict]:
+        """Ring of tx `key`: id, size, edges, banks spanned, first / last seen."""
+        i = self._ids.get(key)
+        if i is None:
+            return None
+        r = self._find(i)
+        mask = self._mask[r]
+        return {
+            "ring_id": self.prefix + format(self._ring[r], "x"),
+            "size": self._size[r],
+            "edges": self._nedges[r],
+            "banks": [b for k, b in enumerate(self.banks) if mask >> k & 1],
+            "bank_span": bin(mask).count("1"),
+            "first_seen": self._first[r],
+            "last_seen": self._last[r],
+        }
+
+    def rings(self, top: Optional[int] = None) -> List[dict]:
+        """All rings (largest first), optionally only the `top` largest."""
+        roots = [i for i, p in enumerate(self._parent) if p == i]
+        roots.sort(key=lambda r: -self._size[r])
+        return [self.info(self._keys[r]) for r in roots[:top]]
+
+    # ----------------------------------------------
+    # Expiry
+    # ----------------------------------------------
+    def expire(self, now: Optional[float] = None):
+        """Drop edges older than the window (rebuilds once enough have expired)."""
+        cutoff = (time.time() if now is None else now) - self.window_s
+        while self._edges and self._edges[0][0] < cutoff:
+            self._edges.popleft()
+            self._expired += 1
+        self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        if self._expired and self._expired >= len(self._edges):
+            self.rebuild()
+
+    def rebuild(self):
+        """Recompute components from the live edges only; txs without live edges are forgotten."""
+        keys, banks = self._keys, self._node_bank
+        old_ring = [self._ring[self._find(i)] for i in range(len(keys))]
+        edges = self._edges
+        self._reset_nodes()
+        self._edges = deque()
+        self._expired = 0
+
+        for ts, a, b in edges:
+            na = self._node(keys[a], banks[a], ts, old_ring[a])
+            nb = self._node(keys[b], banks[b], ts, old_ring[b])
+            self._union(na, nb, ts)
+            self._edges.append((ts, na, nb))
+
+        # a ring split by expiry: the largest part keeps the ID
+        claimed: Dict[int, int] = {}
+        for r in sorted((i for i, p in enumerate(self._parent) if p == i), key=lambda r: -self._size[r]):
+            if self._ring[r] in claimed:
+                self._ring[r], self._next_ring = self._next_ring, self._next_ring + 1
+            claimed[self._ring[r]] = r
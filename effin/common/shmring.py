@@ -0,0 +1,181 @@
+# effin/common/shmring.py
+"""
+Fixed-size slots in one multiprocessing.shared_memory block, so batches of
+embeddings and their per-row metadata move between processes without being
+pickled: only slot indices go through the control channel (a Pipe / Queue
+owned by the caller, who also decides which slots are free).
+
+Each slot holds up to `rows` transactions:
+
+    count     u4                      rows in use
+    vectors   (rows, dim) float32     the embedding matrix
+    meta      (rows,) META_DTYPE      fixed-width per-row fields
+    arena     rows * arena_per_row    utf-8 strings, addressed by meta offsets
+
+The layout is stored as JSON at the start of the block, so attach(name)
+needs nothing but the name.
+"""
+import json
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"EFRING1\n"
+HEADER_BYTES = 4096
+
+# strings kept in the arena, in this order (meta str_off / str_len columns)
+STRING_FIELDS = ("tx_id", "merchant_category", "location", "device_fingerprint")
+_STRING_DEFAULTS = ("", "unknown", "unknown", "unknown")
+
+META_DTYPE = np.dtype([
+    ("bank", "<u2"),                             # index into the ring's bank table
+    ("tx_ref", "S12"),                           # hash_id_hex(tx_id)
+    ("amount", "<f8"),
+    ("sig", "<f8", (4,)),                        # feature_signature
+    ("is_fraud", "?"),
+    ("str_off", "<u4", (len(STRING_FIELDS),)),   # arena offsets of STRING_FIELDS
+    ("str_len", "<u4", (len(STRING_FIELDS),)),
+])
+
+
+def _align(n: int, to: int = 64) -> int:
+    return (n + to - 1) // to * to
+
+
+class ShmRing:
+    """`slots` slots of up to `rows` transactions each; create() in one process, attach() in the others."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: dict, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.slots = layout["slots"]
+        self.rows = layout["rows"]
+        self.dim = layout["dim"]
+        self.arena_bytes = layout["arena_bytes"]
+        self.banks: List[str] = layout["banks"]
+        self._bank_codes = {b: i for i, b in enumerate(self.banks)}
+
+        rows, dim = self.rows, self.dim
+        self._vec_off = 64
+        self._meta_off = self._vec_off + _align(rows * dim * 4)
+        self._arena_off = self._meta_off + _align(rows * META_DTYPE.itemsize)
+        self.slot_bytes = _align(self._arena_off + self.arena_bytes)
+
+        buf = shm.buf
+        self._count = [np.ndarray((1,), np.uint32, buf, HEADER_BYTES + i * self.slot_bytes) for i in range(self.slots)]
+        self._vectors = [np.ndarray((rows, dim), np.float32, buf, HEADER_BYTES + i * self.slot_bytes + self._vec_off)
+                         for i in range(self.slots)]
+        self._meta = [np.ndarray((rows,), META_DTYPE, buf, HEADER_BYTES + i * self.slot_bytes + self._meta_off)
+                      for i in range(self.slots)]
+        self._arena = [np.ndarray((self.arena_bytes,), np.uint8, buf, HEADER_BYTES + i * self.slot_bytes + self._arena_off)
+                       for i in range(self.slots)]
+
+    @classmethod
+    def create(cls, slots: int, rows: int, dim: int = 32, arena_per_row: int = 128,
+               banks: Sequence[str] = (), name: Optional[str] = None) -> "ShmRing":
+        layout = {"slots": slots, "rows": rows, "dim": dim, "arena_bytes": rows * arena_per_row, "banks": list(banks)}
+        header = MAGIC + json.dumps(layout).encode()
+        if len(header) > HEADER_BYTES:
+            raise ValueError("ring layout does not fit the header (too many banks)")
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls._size(layout))
+        shm.buf[:len(header)] = header
+        return cls(shm, layout, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ShmRing":
+        # meant for processes started by the creator: they share its resource tracker,
+        # which then unlinks the block once, when the creator does
+        shm = shared_memory.SharedMemory(name=name)
+        head = bytes(shm.buf[:HEADER_BYTES])
+        if not head.startswith(MAGIC):
+            shm.close()
+            raise ValueError(f"shared memory '{name}' is not an effin ring")
+        layout = json.loads(head[len(MAGIC):].rstrip(b"\0"))
+        return cls(shm, layout, owner=False)
+
+    @staticmethod
+    def _size(layout: dict) -> int:
+        rows, dim = layout["rows"], layout["dim"]
+        slot = _align(64 + _align(rows * dim * 4) + _align(rows * META_DTYPE.itemsize) + layout["arena_bytes"])
+        return HEADER_BYTES + layout["slots"] * slot
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # ----------------------------------------------
+    # Slot access (views into shared memory, no copies)
+    # ----------------------------------------------
+    def count(self, i: int) -> int:
+        return int(self._count[i][0])
+
+    def vectors(self, i: int) -> np.ndarray:
+        """(count, dim) view of slot i's embedding matrix."""
+        return self._vectors[i][:self.count(i)]
+
+    def meta(self, i: int) -> np.ndarray:
+        return self._meta[i][:self.count(i)]
+
+    def strings(self, i: int, field: str) -> List[str]:
+        k = STRING_FIELDS.index(field)
+        meta, arena = self.meta(i), self._arena[i]
+        return [arena[o:o + n].tobytes().decode() for o, n in zip(meta["str_off"][:, k].tolist(), meta["str_len"][:, k].tolist())]
+
+    def columns(self, i: int) -> dict:
+        """Slot i as the column dict FraudEncoder.embed_batch() takes."""
+        meta = self.meta(i)
+        cols = {f: self.strings(i, f) for f in STRING_FIELDS[1:]}
+        cols.update(amount=meta["amount"], feature_signature=meta["sig"], is_fraud=meta["is_fraud"])
+        return cols
+
+    def bank(self, i: int) -> List[str]:
+        return [self.banks[c] for c in self.meta(i)["bank"].tolist()]
+
+    # ----------------------------------------------
+    # Writing
+    # ----------------------------------------------
+    def write_txs(self, i: int, txs: Sequence[dict], bank_id: str) -> bool:
+        """
+        Fill slot i from tx dicts (encoder inputs + strings; vectors and
+        tx_ref are left to the encoding side). False if the batch does not
+        fit the slot: too many rows, too many string bytes, or an unknown bank.
+        """
+        n = len(txs)
+        code = self._bank_codes.get(bank_id)
+        if n > self.rows or code is None:
+            return False
+        strs = [tx.get(f, d) for f, d in zip(STRING_FIELDS, _STRING_DEFAULTS) for tx in txs]
+        try:
+            blob = "".join(strs).encode()
+        except TypeError:
+            strs = [str(s) for s in strs]
+            blob = "".join(strs).encode()
+        lens = list(map(len, strs))
+        if len(blob) != sum(lens):
+            # non-ASCII somewhere: byte lengths differ from character lengths
+            lens = [len(s.encode()) for s in strs]
+        if len(blob) > self.arena_bytes:
+            return False
+        lens = np.array(lens, dtype=np.int64)
+
+        meta, arena = self._meta[i][:n], self._arena[i]
+        arena[:len(blob)] = np.frombuffer(blob, dtype=np.uint8)
+        meta["str_off"] = (np.cumsum(lens) - lens).reshape(len(STRING_FIELDS), n).T
+        meta["str_len"] = lens.reshape(len(STRING_FIELDS), n).T
+        meta["bank"] = code
+        meta["amount"] = np.fromiter((float(tx.get("amount", 0)) for tx in txs), dtype=np.float64, count=n)
+        meta["sig"] = np.array([tx.get("feature_signature", [0, 0, 0, 0]) for tx in txs], dtype=np.float64).reshape(n, 4)
+        meta["is_fraud"] = np.fromiter((bool(tx.get("is_fraud")) for tx in txs), dtype=bool, count=n)
+        self._count[i][0] = n
+        return True
+
+    def close(self):
+        """Detach (and free the block if this process created it). Views handed out must be gone."""
+        self._count = self._vectors = self._meta = self._arena = []
+        try:
+            self.shm.close()
+        except BufferError:
+            print(f"[WARN] Shared memory '{self.shm.name}' still has views in use — left mapped.")
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,243 @@
+# effin/dashboard/aggregates.py
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# distance histogram bins (squared L2 on normalized vectors lies in [0, 4])
+DIST_EDGES = np.linspace(0.0, 4.0, 41)
+
+
+class AggregateStore:
+    """
+    Incrementally maintained dashboard aggregates, fed with decoded audit
+    events as they arrive (update() is O(new events)); every view is read
+    from numpy columns without rescanning events.
+
+      - tx / alert counts per bank and per-second buckets for TPS
+      - cross-bank alert adjacency matrix (grows with the banks seen)
+      - unique rings per bank pair, ring membership (LRU, `max_rings`)
+      - alert distance histogram and a ring buffer of recent (ts, distance)
+    """
+
+    def __init__(self, horizon_s: int = 300, timeline: int = 500, max_rings: int = 100_000):
+        self.horizon = horizon_s
+        self.banks: List[str] = []
+        self._bank_idx: Dict[str, int] = {}
+        cap = 4
+        self.tx_total = np.zeros(cap, dtype=np.int64)
+        self.alert_total = np.zeros(cap, dtype=np.int64)
+        self.fraud_total = np.zeros(cap, dtype=np.int64)
+        self._tx_sec = np.zeros((cap, horizon_s), dtype=np.int64)      # per-second tx counts
+        self._sec_stamp = np.full((cap, horizon_s), -1, dtype=np.int64)
+        self.adjacency = np.zeros((cap, cap), dtype=np.int64)          # alerts src → matched bank
+        self.edge_rings = np.zeros((cap, cap), dtype=np.int64)         # unique rings per bank pair
+        self.dist_hist = np.zeros(len(DIST_EDGES), dtype=np.int64)     # last bin = overflow
+
+        self.max_rings = max_rings
+        # ring → (alerts, bank bitmask, last ts, linked bank pairs)
+        self.rings: "OrderedDict[str, Tuple[int, int, float, frozenset]]" = OrderedDict()
+        self.linked_rings = 0      # rings in `rings` that link at least one bank pair
+
+        self._tl_ts = np.zeros(timeline, dtype=np.float64)
+        self._tl_dist = np.zeros(timeline, dtype=np.float64)
+        self._tl_n = 0
+        self.last_ts = 0.0
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------
+    # Banks (columns grow by doubling)
+    # ----------------------------------------------
+    def _bank(self, name: Optional[str]) -> int:
+        if name is None:
+            return -1
+        i = self._bank_idx.get(name)
+        if i is None:
+            i = self._bank_idx[name] = len(self.banks)
+            self.banks.append(name)
+            if i >= len(self.tx_total):
+                self._grow(2 * len(self.tx_total))
+        return i
+
+    def _grow(self, cap: int):
+        n = len(self.tx_total)
+        for attr in ("tx_total", "alert_total", "fraud_total"):
+            setattr(self, attr, np.concatenate([getattr(self, attr), np.zeros(cap - n, dtype=np.int64)]))
+        self._tx_sec = np.vstack([self._tx_sec, np.zeros((cap - n, self.horizon), dtype=np.int64)])
+        self._sec_stamp = np.vstack([self._sec_stamp, np.full((cap - n, self.horizon), -1, dtype=np.int64)])
+        for attr in ("adjacency", "edge_rings"):
+            m = np.zeros((cap, cap), dtype=np.int64)
+            m[:n, :n] = getattr(self, attr)
+            setattr(self, attr, m)
+
+    # ----------------------------------------------
+    # Ingest
+    # ----------------------------------------------
+    def update(self, events: Iterable[dict]):
+        txb, txs, fraud, alerts = [], [], [], []
+        for e in events:
+            if e.get("alert_id"):
+                alerts.append(e)
+            elif e.get("event") == "tx_processed":
+                txb.append(e.get("bank_id"))
+                txs.append(e.get("timestamp") or e.get("ts") or 0.0)
+                fraud.append(bool(e.get("is_fraud")))
+        with self._lock:
+            if txb:
+                self._add_txs(txb, txs, fraud)
+            if alerts:
+                self._add_alerts(alerts)
+
+    def _add_txs(self, banks, stamps, fraud):
+        rows = np.array([self._bank(b) for b in banks], dtype=np.int64)
+        ok = rows >= 0
+        rows = rows[ok]
+        secs = np.asarray(stamps, dtype=np.float64)[ok].astype(np.int64)
+        np.add.at(self.tx_total, rows, 1)
+        np.add.at(self.fraud_total, rows, np.asarray(fraud)[ok].astype(np.int64))
+
+        # per-second buckets: a newer second takes over its slot, older (late) events are not bucketed
+        slots = secs % self.horizon
+        newer = secs > self._sec_stamp[rows, slots]
+        self._tx_sec[rows[newer], slots[newer]] = 0
+        np.maximum.at(self._sec_stamp, (rows, slots), secs)
+        cur = self._sec_stamp[rows, slots] == secs
+        np.add.at(self._tx_sec, (rows[cur], slots[cur]), 1)
+        if len(secs):
+            self.last_ts = max(self.last_ts, float(secs.max()))
+
+    def _add_alerts(self, alerts: List[dict]):
+        src = np.array([self._bank(a.get("bank_id")) for a in alerts], dtype=np.int64)
+        dst = np.array([self._bank(a.get("matched_bank")) for a in alerts], dtype=np.int64)
+        np.add.at(self.alert_total, src[src >= 0], 1)
+        pair = (src >= 0) & (dst >= 0)
+        np.add.at(self.adjacency, (src[pair], dst[pair]), 1)
+
+        dist = np.array([a.get("distance") if a.get("distance") is not None else np.nan for a in alerts],
+                        dtype=np.float64)
+        ts = np.array([a.get("timestamp") or a.get("ts") or 0.0 for a in alerts], dtype=np.float64)
+        have = ~np.isnan(dist)
+        bins = np.minimum(np.searchsorted(DIST_EDGES, dist[have], side="right") - 1, len(DIST_EDGES) - 1)
+        np.add.at(self.dist_hist, np.maximum(bins, 0), 1)
+        self._timeline(ts[have], dist[have])
+
+        for a, s, d in zip(alerts, src, dst):
+            ring = a.get("ring_id")
+            if not ring:
+                continue
+            count, mask, _, pairs = self.rings.pop(ring, (0, 0, 0.0, frozenset()))
+            s, d = int(s), int(d)
+            mask |= (1 << s if s >= 0 else 0) | (1 << d if d >= 0 else 0)
+            if s >= 0 and d >= 0 and (s, d) not in pairs:
+                self.edge_rings[s, d] += 1          # first time this ring links the pair
+                self.linked_rings += not pairs
+                pairs = pairs | {(s, d)}
+            self.rings[ring] = (count + 1, mask, a.get("timestamp") or 0.0, pairs)
+            if len(self.rings) > self.max_rings:
+                _, evicted = self.rings.popitem(last=False)
+                self.linked_rings -= bool(evicted[3])
+
+    def _timeline(self, ts: np.ndarray, dist: np.ndarray):
+        cap = len(self._tl_ts)
+        ts, dist = ts[-cap:], dist[-cap:]
+        pos = (self._tl_n + np.arange(len(ts))) % cap
+        self._tl_ts[pos] = ts
+        self._tl_dist[pos] = dist
+        self._tl_n += len(ts)
+
+    # ----------------------------------------------
+    # Views
+    # ----------------------------------------------
+    def tps(self, bank: str, window_s: int = 60) -> float:
+        """Mean tx/s for `bank` over the last `window_s` seconds of ledger time."""
+        i = self._bank_idx.get(bank)
+        if i is None or not self.last_ts:
+            return 0.0
+        window_s = min(window_s, self.horizon)
+        now = int(self.last_ts)
+        with self._lock:
+            live = self._sec_stamp[i] > now - window_s
+            return float(self._tx_sec[i][live].sum()) / window_s
+
+    def totals(self, bank: str) -> Dict[str, int]:
+        i = self._bank_idx.get(bank)
+        if i is None:
+            return {"tx": 0, "alerts": 0, "fraud": 0}
+        return {"tx": int(self.tx_total[i]), "alerts": int(self.alert_total[i]), "fraud": int(self.fraud_total[i])}
+
+    def matrix(self) -> Tuple[List[str], np.ndarray]:
+        """(banks, alerts[src, matched]) over every bank seen so far."""
+        n = len(self.banks)
+        with self._lock:
+            return list(self.banks), self.adjacency[:n, :n].copy()
+
+    def ring_edges(self) -> List[Tuple[str, str, int, int]]:
+        """(src, dst, alerts, unique rings) for every linked bank pair."""
+        banks, adj = self.matrix()
+        rings = self.edge_rings[:len(banks), :len(banks)]
+        return [(banks[s], banks[d], int(adj[s, d]), int(rings[s, d])) for s, d in zip(*np.nonzero(adj))]
+
+    def ring_members(self, ring: str) -> List[str]:
+        """Banks a ring has touched."""
+        mask = self.rings[ring][1] if ring in self.rings else 0
+        return [b for i, b in enumerate(self.banks) if mask >> i & 1]
+
+    def histogram(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(bin left edges, counts); the last bin counts distances ≥ its edge."""
+        with self._lock:
+            return DIST_EDGES.copy(), self.dist_hist.copy()
+
+    def timeline(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Most recent alerts as (timestamps, distances), oldest first."""
+        cap = len(self._tl_ts)
+        with self._lock:
+            n = min(self._tl_n, cap)
+            order = (self._tl_n - n + np.arange(n)) % cap
+            return self._tl_ts[order].copy(), self._tl_dist[order].copy()
+
+    def snapshot(self) -> dict:
+        """JSON-able copy of every view (served by the aggregator, read back by SnapshotView)."""
+        banks, adj = self.matrix()
+        edges, hist = self.histogram()
+        tl_ts, tl_dist = self.timeline()
+        return {
+            "banks": banks,
+            "totals": {b: self.totals(b) for b in banks},
+            "tps": {b: self.tps(b) for b in banks},
+            "matrix": adj.tolist(),
+            "ring_edges": self.ring_edges(),
+            "linked_rings": self.linked_rings,
+            "histogram": {"edges": edges.tolist(), "counts": hist.tolist()},
+            "timeline": {"ts": tl_ts.tolist(), "distance": tl_dist.tolist()},
+        }
+
+
+class SnapshotView:
+    """AggregateStore's read API over a snapshot() dict."""
+
+    def __init__(self, snap: dict):
+        self.snap = snap
+        self.banks = snap["banks"]
+        self.linked_rings = snap["linked_rings"]
+
+    def totals(self, bank: str) -> Dict[str, int]:
+        return self.snap["totals"].get(bank, {"tx": 0, "alerts": 0, "fraud": 0})
+
+    def tps(self, bank: str, window_s: int = 60) -> float:
+        return self.snap["tps"].get(bank, 0.0)
+
+    def matrix(self) -> Tuple[List[str], np.ndarray]:
+        n = len(self.banks)
+        return list(self.banks), np.asarray(self.snap["matrix"], dtype=np.int64).reshape(n, n)
+
+    def ring_edges(self) -> List[Tuple[str, str, int, int]]:
+        return [tuple(e) for e in self.snap["ring_edges"]]
+
+    def histogram(self) -> Tuple[np.ndarray, np.ndarray]:
+        h = self.snap["histogram"]
+        return np.asarray(h["edges"]), np.asarray(h["counts"], dtype=np.int64)
+
+    def timeline(self) -> Tuple[np.ndarray, np.ndarray]:
+        t = self.snap["timeline"]
+        return np.asarray(t["ts"]), np.asarray(t["distance"])
@@ -0,0 +1,255 @@
+# effin/dashboard/aggregator.py
+"""
+Network-wide audit aggregator.
+
+Tails every bank ledger in AUDIT_DIR (audit_<bank>.jsonl / audit_<bank>.ledger),
+merges new events across banks in timestamp order and keeps one global
+AggregateStore plus recent alert / transaction windows, so the dashboard
+reads a single consistent snapshot instead of decrypting ledgers itself.
+
+    GET /v1/health
+    GET /v1/banks
+    GET /v1/snapshot?bank=bank1&alerts=200&txs=40
+
+    FERNET_KEY=... python -m effin.dashboard.aggregator --port 8600
+"""
+import argparse, glob, heapq, json, os, threading, time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from cryptography.fernet import Fernet
+
+from effin.common.ledger import LedgerFollower
+from effin.common.ledger_decode import LEDGER_DECODE_WORKERS, LedgerDecoder
+from effin.common.rings import RingEngine
+from effin.dashboard.aggregates import AggregateStore
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+AUDIT_DIR = os.getenv("AUDIT_DIR", ROOT)
+AGGREGATOR_PORT = int(os.getenv("AGGREGATOR_PORT", "8600"))
+AGGREGATOR_POLL_S = float(os.getenv("AGGREGATOR_POLL_S", "1.0"))
+# a bank silent for this long no longer holds back the merge watermark
+AGGREGATOR_MAX_LAG_S = float(os.getenv("AGGREGATOR_MAX_LAG_S", "5.0"))
+# records read from each ledger's tail at startup
+AGGREGATOR_BACKFILL = int(os.getenv("AGGREGATOR_BACKFILL", "5000"))
+RING_WINDOW_S = float(os.getenv("RING_WINDOW_S", "3600"))
+
+
+def discover_banks(audit_dir: str) -> Dict[str, str]:
+    """bank → ledger path for every audit_<bank>.jsonl / audit_<bank>.ledger in `audit_dir`."""
+    banks = {}
+    for p in glob.glob(os.path.join(audit_dir, "audit_*.jsonl")) + glob.glob(os.path.join(audit_dir, "audit_*.ledger")):
+        name = os.path.splitext(os.path.basename(p))[0][len("audit_"):]
+        banks[name] = os.path.join(audit_dir, f"audit_{name}.jsonl")
+    return dict(sorted(banks.items()))
+
+
+def event_ts(e: dict) -> float:
+    return e.get("timestamp") or e.get("ts") or 0.0
+
+
+def fernet_for(bank: str) -> Fernet:
+    """FERNET_KEY_<BANK> if set, else the shared FERNET_KEY."""
+    key = os.getenv(f"FERNET_KEY_{bank.split('.')[0].upper()}") or os.getenv("FERNET_KEY")
+    if not key:
+        raise RuntimeError("FERNET_KEY missing")
+    return Fernet(key.encode())
+
+
+class Aggregator:
+    """
+    One LedgerFollower per bank. New events are held per bank until the
+    merge watermark (oldest latest-timestamp among banks active within
+    `max_lag` seconds) passes them, then k-way merged (heapq) into the store,
+    so aggregates and windows see one timestamp-ordered network stream.
+
+    Alerts are re-clustered network-wide by a RingEngine: `ring_id` becomes
+    the global ring (the node's own is kept as `node_ring_id`).
+    """
+
+    def __init__(self, audit_dir: str = AUDIT_DIR, keys: Callable[[str], Fernet] = fernet_for,
+                 max_lag: float = AGGREGATOR_MAX_LAG_S, backfill: int = AGGREGATOR_BACKFILL,
+                 alerts_window: int = 5000, txs_window: int = 500, decode_workers: int = LEDGER_DECODE_WORKERS):
+        self.audit_dir = audit_dir
+        self.keys = keys
+        self.max_lag = max_lag
+        self.backfill = backfill
+        self.store = AggregateStore()
+        self.rings = RingEngine(window_s=RING_WINDOW_S)
+        self.alerts: Deque[dict] = deque(maxlen=alerts_window)
+        self.txs: Dict[str, Deque[dict]] = {}
+        self.txs_window = txs_window
+        self.corrupted: Dict[str, int] = {}
+        self.decoder = LedgerDecoder(workers=decode_workers)      # one pool, each bank's key per call
+        self.merged = 0
+        self._followers: Dict[str, LedgerFollower] = {}
+        self._pending: Dict[str, List[dict]] = {}
+        self._latest: Dict[str, float] = {}
+        self._seen_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------
+    # Tailing
+    # ----------------------------------------------
+    def _decoder(self, bank: str):
+        fernet = self.keys(bank)
+
+        def decode_range(path: str, start: int, end: int) -> List[dict]:
+            before = self.decoder.corrupted
+            events = list(self.decoder.decode_file(path, start, end, key=fernet))
+            self.corrupted[bank] += self.decoder.corrupted - before
+            return events
+        return decode_range
+
+    def discover(self):
+        for bank, path in discover_banks(self.audit_dir).items():
+            if bank not in self._followers:
+                self._pending[bank] = []
+                self.corrupted[bank] = 0
+                follower = LedgerFollower(
+                    path, decode_range=self._decoder(bank), window=1, min_interval=0, backfill=self.backfill,
+                    on_new=lambda events, b=bank: self._pending[b].extend(events)
+                )
+                with self._lock:
+                    self._followers[bank] = follower
+
+    def poll(self, now: Optional[float] = None):
+        """Read every ledger once and merge whatever the watermark allows."""
+        self.discover()
+        now = time.time() if now is None else now
+        for bank, follower in self._followers.items():
+            before = len(self._pending[bank])
+            follower.poll()
+            if len(self._pending[bank]) > before:
+                self._pending[bank].sort(key=event_ts)
+                self._latest[bank] = max(self._latest.get(bank, 0.0), event_ts(self._pending[bank][-1]))
+                self._seen_at[bank] = now
+
+        active = [self._latest[b] for b in self._latest if now - self._seen_at[b] < self.max_lag]
+        watermark = min(active) if active else float("inf")
+        watermark = max(watermark, now - self.max_lag)
+
+        ready = []
+        for bank, pending in self._pending.items():
+            k = 0
+            while k < len(pending) and event_ts(pending[k]) <= watermark:
+                k += 1
+            if k:
+                ready.append(pending[:k])
+                del pending[:k]
+        if ready:
+            self._apply(list(heapq.merge(*ready, key=event_ts)))
+
+    def _apply(self, events: List[dict]):
+        with self._lock:
+            for e in events:
+                if e.get("alert_id") and e.get("tx_id") and e.get("matched_id"):
+                    e["node_ring_id"] = e.get("ring_id")
+                    e["ring_id"] = self.rings.add_edge(e["tx_id"], e["matched_id"], event_ts(e),
+                                                       e.get("bank_id"), e.get("matched_bank"))
+            self.store.update(events)
+            for e in events:
+                if e.get("alert_id"):
+                    self.alerts.append(e)
+                elif e.get("event") == "tx_processed":
+                    bank = e.get("bank_id")
+                    if bank not in self.txs:
+                        self.txs[bank] = deque(maxlen=self.txs_window)
+                    self.txs[bank].append(e)
+            self.merged += len(events)
+            if events:
+                self.rings.expire(event_ts(events[-1]))
+
+    def run(self, interval: float = AGGREGATOR_POLL_S, stop: Optional[threading.Event] = None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[ERROR] aggregator poll failed: {e}")
+            stop.wait(interval)
+
+    def close(self):
+        self.decoder.close()
+
+    # ----------------------------------------------
+    # Queries
+    # ----------------------------------------------
+    def banks(self) -> List[str]:
+        with self._lock:
+            return sorted(set(self._followers) | set(self.store.banks))
+
+    def snapshot(self, bank: Optional[str] = None, alerts: int = 200, txs: int = 40) -> dict:
+        """Global aggregates + recent alerts involving `bank` (all if None) and its recent txs, newest first."""
+        with self._lock:
+            recent = [a for a in reversed(self.alerts)
+                      if bank is None or bank in (a.get("bank_id"), a.get("matched_bank"))][:alerts]
+            bank_txs = list(reversed(self.txs.get(bank, ())))[:txs] if bank else []
+            return {
+                "generated_at": time.time(),
+                "merged": self.merged,
+                "corrupted": dict(self.corrupted),
+                "aggregates": self.store.snapshot(),
+                "rings": self.rings.rings(top=20),
+                "alerts": recent,
+                "txs": bank_txs,
+            }
+
+
+# ------------------------------------------------------------
+# HTTP API
+# ------------------------------------------------------------
+def make_server(agg: Aggregator, host: str = "127.0.0.1", port: int = AGGREGATOR_PORT) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            qs = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                if url.path == "/v1/health":
+                    status, body = 200, {"status": "ok", "banks": len(agg.banks()), "merged": agg.merged}
+                elif url.path == "/v1/banks":
+                    status, body = 200, {"banks": agg.banks()}
+                elif url.path == "/v1/snapshot":
+                    status, body = 200, agg.snapshot(qs.get("bank"), int(qs.get("alerts", 200)), int(qs.get("txs", 40)))
+                else:
+                    status, body = 404, {"detail": "unknown path"}
+            except ValueError as e:
+                status, body = 400, {"detail": str(e)}
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    import dotenv
+    dotenv.load_dotenv()
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--audit-dir", default=AUDIT_DIR)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=AGGREGATOR_PORT)
+    args = ap.parse_args()
+
+    agg = Aggregator(args.audit_dir)
+    threading.Thread(target=agg.run, daemon=True).start()
+    server = make_server(agg, args.host, args.port)
+    print(f"EFFIN aggregator → {args.audit_dir} | http://{args.host}:{args.port}/v1/snapshot")
+    try:
+        server.serve_forever()
+    finally:
+        agg.close()
@@ -1,11 +1,29 @@
 import streamlit as st
-import os, json, time
+import os, sys, json, time
+import urllib.parse, urllib.request
 import numpy as np
-from cryptography.fernet import Fernet
 import pandas as pd
 import networkx as nx
 import matplotlib.pyplot as plt
 
+# `streamlit run` only puts this file's directory on sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from effin.common.ledger import LedgerFollower
+from effin.common.ledger_decode import LEDGER_DECODE_WORKERS, LedgerDecoder
+from effin.dashboard.aggregates import AggregateStore, SnapshotView
+from effin.dashboard.aggregator import discover_banks, event_ts
+
+# Ledgers are read from AUDIT_DIR (default: repo root, where the nodes write them),
+# or, with AGGREGATOR_URL set, from the aggregator service (python -m effin.dashboard.aggregator)
+AUDIT_DIR = os.getenv("AUDIT_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+AGGREGATOR_URL = os.getenv("AGGREGATOR_URL", "").rstrip("/")
+
+
+def aggregator_get(path, **params):
+    url = f"{AGGREGATOR_URL}{path}?{urllib.parse.urlencode(params)}"
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return json.loads(resp.read())
+
 st.set_page_config(page_title="EFFIN Dashboard", layout="wide")
 st.title("🔐 EFFIN – Multi-Bank Encrypted Fraud Intelligence Dashboard")
 
@@ -27,39 +45,65 @@ if view_mode == "Regulator / Auditor":
 # ----------------------------------------------------
 # BANK SELECTOR
 # ----------------------------------------------------
-bank = st.selectbox("Select Bank Node:", ["bank1", "bank2", "bank3"])
-AUDIT_FILE = f"C:/Users/rameeza/PycharmProjects/effin/audit_{bank}.jsonl"
+try:
+    known_banks = aggregator_get("/v1/banks")["banks"] if AGGREGATOR_URL else list(discover_banks(AUDIT_DIR))
+except OSError as e:
+    st.error(f"❌ Aggregator unreachable at {AGGREGATOR_URL}: {e}")
+    st.stop()
+bank = st.selectbox("Select Bank Node:", known_banks or ["bank1", "bank2", "bank3"])
+AUDIT_FILE = os.path.join(AUDIT_DIR, f"audit_{bank}.jsonl")
 
 
 
 # ----------------------------------------------------
-# Load Fernet key
+# Load Fernet key (not needed when the aggregator decrypts)
 # ----------------------------------------------------
 FERNET_KEY = os.getenv("FERNET_KEY")
-if not FERNET_KEY:
+if not FERNET_KEY and not AGGREGATOR_URL:
     st.error("❌ FERNET_KEY missing — cannot decrypt audit logs.")
     st.stop()
 
-fernet = Fernet(FERNET_KEY.encode())
 
 
 # ----------------------------------------------------
-# Decrypt helper
+# Decrypt helper (records that fail to decrypt are counted, not shown)
 # ----------------------------------------------------
-def tail_decrypt(path, n=500):
-    items = []
-    if not os.path.exists(path):
-        return items
-    with open(path, "rb") as f:
-        lines = f.readlines()[-n:]
+@st.cache_resource
+def ledger_decoder():
+    return LedgerDecoder(workers=LEDGER_DECODE_WORKERS, key=FERNET_KEY)
 
-    for L in reversed(lines):
-        try:
-            data = fernet.decrypt(L.strip())
-            items.append(json.loads(data))
-        except:
-            items.append({"error": "decrypt_failed"})
-    return items
+
+class LedgerView:
+    """One follower + aggregate store per ledger; aggregates are updated with new events only."""
+
+    def __init__(self, path, n):
+        self.decoder = ledger_decoder()
+        self.store = AggregateStore()
+        self.corrupted = 0
+        self.follower = LedgerFollower(path, window=n, on_new=self.store.update, decode_range=self.decode_range)
+
+    def decode_range(self, path, start, end):
+        before = self.decoder.corrupted
+        events = list(self.decoder.decode_file(path, start, end))
+        self.corrupted += self.decoder.corrupted - before
+        return events
+
+
+@st.cache_resource
+def ledger_view(path, n=500):
+    # shared by every dashboard session watching this ledger
+    return LedgerView(path, n)
+
+
+def tail_decrypt(path, n=500):
+    # decrypts only records appended since the previous refresh; newest first
+    if AGGREGATOR_URL:
+        # network-wide snapshot: alerts involving this bank + its recent txs, global aggregates
+        snap = aggregator_get("/v1/snapshot", bank=bank)
+        events = sorted(snap["alerts"] + snap["txs"], key=event_ts, reverse=True)
+        return events, SnapshotView(snap["aggregates"]), snap.get("corrupted", {}).get(bank, 0)
+    view = ledger_view(path, n)
+    return list(reversed(view.follower.poll())), view.store, view.corrupted
 
 
 # ----------------------------------------------------
@@ -73,7 +117,12 @@ container = st.empty()
 
 while True:
     with container.container():
-        events = tail_decrypt(AUDIT_FILE)
+        try:
+            events, agg, corrupted = tail_decrypt(AUDIT_FILE)
+        except OSError as e:
+            st.error(f"❌ Aggregator unreachable at {AGGREGATOR_URL}: {e}")
+            time.sleep(REFRESH_INTERVAL)
+            continue
 
         if not events:
             st.info(" No decryptable entries yet. Wait for the node to generate traffic.")
@@ -88,21 +137,19 @@ while True:
         # ----------------------------------------------------
         col1, col2, col3, col4 = st.columns(4)
 
-        total_tx = len(txs)
-        total_alerts = len(alerts)
-
-        if txs:
-            time_span = (txs[0]["timestamp"] - txs[-1]["timestamp"]) or 1
-            tps = total_tx / time_span
-        else:
-            tps = 0
+        totals = agg.totals(bank)
+        total_tx = totals["tx"]
+        total_alerts = totals["alerts"]
+        tps = agg.tps(bank)
 
         fraud_rate = (total_alerts / total_tx * 100) if total_tx else 0
 
-        col1.metric("Transactions (recent)", total_tx)
+        col1.metric("Transactions", total_tx)
         col2.metric("Fraud Alerts", total_alerts)
         col3.metric("Fraud Rate %", f"{fraud_rate:.2f}%")
         col4.metric("TPS", f"{tps:.2f}")
+        if corrupted:
+            st.caption(f"⚠️ {corrupted} audit records could not be decrypted (wrong key or corrupted) and were skipped.")
 
         st.markdown("---")
 
@@ -137,11 +184,9 @@ while True:
         # ----------------------------------------------------
         st.subheader("📈 Fraud Alerts Timeline")
 
-        if alerts:
-            df_alerts = pd.DataFrame([
-                {"timestamp": a["timestamp"], "distance": a["distance"]}
-                for a in alerts
-            ])
+        tl_ts, tl_dist = agg.timeline()
+        if len(tl_ts):
+            df_alerts = pd.DataFrame({"timestamp": tl_ts, "distance": tl_dist})
             df_alerts["time_str"] = df_alerts["timestamp"].apply(
                 lambda x: time.strftime("%H:%M:%S", time.localtime(x))
             )
@@ -156,26 +201,17 @@ while True:
         # ----------------------------------------------------
         st.subheader(" Encrypted Fraud Ring Graph")
 
+        # bank-level graph from the precomputed adjacency (one edge per linked bank pair)
         G = nx.Graph()
 
-        for a in alerts:
-            ring = a.get("ring_id")
-            src = a.get("bank_id")
-            dst = a.get("matched_bank")
-
-            if ring and src and dst:
-                G.add_node(src, bank=src)
-                G.add_node(dst, bank=dst)
-                # Add edge with ring ID as attribute
-                if G.has_edge(src, dst):
-                    # Increase weight if edge already exists
-                    G[src][dst]['weight'] += 1
-                    # Add ring ID to set of rings for this edge
-                    if 'rings' not in G[src][dst]:
-                        G[src][dst]['rings'] = set()
-                    G[src][dst]['rings'].add(ring)
-                else:
-                    G.add_edge(src, dst, ring=ring, weight=1, rings={ring})
+        for src, dst, n_alerts, n_rings in agg.ring_edges():
+            G.add_node(src, bank=src)
+            G.add_node(dst, bank=dst)
+            if G.has_edge(src, dst):
+                G[src][dst]['weight'] += n_alerts
+                G[src][dst]['rings'] += n_rings
+            else:
+                G.add_edge(src, dst, weight=n_alerts, rings=n_rings)
 
         if len(G.nodes) == 0:
             st.info("No fraud rings detected yet.")
@@ -202,7 +238,7 @@ while True:
 
             # Add title
             ax.set_title(
-                f"Fraud Ring Network - {len(G.edges())} connections, {len(set().union(*[G[u][v]['rings'] for u, v in G.edges()]))} unique rings",
+                f"Fraud Ring Network - {len(G.edges())} connections, {agg.linked_rings} unique rings",
                 fontsize=12, pad=20)
 
             st.pyplot(fig)
@@ -214,8 +250,7 @@ while True:
             with col2:
                 st.metric("Cross-Bank Links", len(G.edges()))
             with col3:
-                unique_rings = len(set().union(*[G[u][v].get('rings', set()) for u, v in G.edges()]))
-                st.metric("Unique Fraud Rings", unique_rings)
+                st.metric("Unique Fraud Rings", agg.linked_rings)
 
         st.markdown("---")
 
@@ -224,16 +259,8 @@ while True:
         # ----------------------------------------------------
         st.subheader(" Cross-Bank Similarity Matrix")
 
-        banks = ["bank1", "bank2", "bank3"]
-        matrix = pd.DataFrame(0, index=banks, columns=banks)
-
-        for a in alerts:
-            src = a.get("bank_id")
-            dst = a.get("matched_bank")
-            if src in banks and dst in banks:
-                matrix.loc[src, dst] += 1
-
-        st.dataframe(matrix)
+        banks, counts = agg.matrix()
+        st.dataframe(pd.DataFrame(counts, index=banks, columns=banks))
 
         st.markdown("---")
 
@@ -242,9 +269,9 @@ while True:
         # ----------------------------------------------------
         st.subheader("📊 ANN Distance Distribution")
 
-        if alerts:
-            distances = [a.get("distance", 0) for a in alerts]
-            df_dist = pd.DataFrame({"distance": distances})
+        edges, hist = agg.histogram()
+        if hist.any():
+            df_dist = pd.DataFrame({"alerts": hist}, index=[f"{e:.1f}" for e in edges])
             st.bar_chart(df_dist)
         else:
             st.write("No fraud alerts yet.")
@@ -289,6 +316,7 @@ while True:
                             **Matched Bank:** `{a.get('matched_bank', 'Unknown')}`  
                             **Similarity Distance:** `{a.get('distance', 0):.4f}`  
                             **Fraud Ring ID:** `{a.get('ring_id', 'Unknown')}`  
+                            **Ring Size:** `{a.get('ring_size', '?')} txs across {a.get('ring_banks', '?')} banks`  
                             **Timestamp:** `{time.ctime(ts) if ts else "unknown"}`  
 
                             ---
@@ -312,6 +340,7 @@ while True:
                             **Matched Transaction:** `{a.get('matched_id', 'Unknown')}`  
                             **Similarity Distance:** `{a.get('distance', 0):.4f}`  
                             **Fraud Ring ID:** `{a.get('ring_id', 'Unknown')}`  
+                            **Ring Size:** `{a.get('ring_size', '?')} txs across {a.get('ring_banks', '?')} banks`  
                             **Timestamp:** `{time.ctime(ts) if ts else "unknown"}`  
 
                             ---
@@ -1,5 +1,22 @@
 # effin/encoder/model.py
+import os
+
 import numpy as np
+from typing import Dict, Optional, Sequence, Union
+
+from effin.encoder.vocab import CategoricalTable, DEFAULT_HASH_KEY
+
+# Column layout of the 32-dim embedding (see embed_transaction)
+SIG_SLICE = slice(0, 4)
+FRAUD_SLICE = slice(4, 8)
+AMOUNT_COL = 8
+MERCH_SLICE = slice(9, 13)
+LOC_SLICE = slice(13, 17)
+DEV_SLICE = slice(17, 21)
+
+# A block of transactions: list of tx dicts, or dict of column arrays
+TxBlock = Union[Sequence[dict], Dict[str, Sequence]]
+
 
 class FraudEncoder:
     """
@@ -8,26 +25,35 @@ class FraudEncoder:
     while keeping each bank's normal behavior separated.
     """
 
-    def __init__(self):
+    def __init__(self, hash_key: Optional[bytes] = None, buckets: int = 1 << 14,
+                 exact_vocab: bool = False, max_vocab: int = 100_000):
         # Shared global fraud vector (base pattern)
         self.FRAUD_VEC = np.array([0.25, 0.22, 0.31, 0.45])
 
-        # Deterministic categorical vocab
-        self.merchant_vocab = {}
-        self.location_vocab = {}
-        self.device_vocab = {}
+        # Deterministic categorical vocab (keyed hash → stable across processes/nodes)
+        table_args = dict(key=hash_key or DEFAULT_HASH_KEY, size=4, buckets=buckets,
+                          exact=exact_vocab, max_entries=max_vocab)
+        self.merchant_vocab = CategoricalTable("merchant", **table_args)
+        self.location_vocab = CategoricalTable("location", **table_args)
+        self.device_vocab = CategoricalTable("device", **table_args)
 
         self.embed_dim = 32
 
+    @classmethod
+    def from_env(cls) -> "FraudEncoder":
+        """ENCODER_HASH_KEY / ENCODER_BUCKETS / ENCODER_EXACT_VOCAB / ENCODER_MAX_VOCAB."""
+        return cls(
+            hash_key=os.getenv("ENCODER_HASH_KEY", "").encode() or None,
+            buckets=int(os.getenv("ENCODER_BUCKETS", str(1 << 14))),
+            exact_vocab=os.getenv("ENCODER_EXACT_VOCAB", "false").lower() in ("1", "true", "yes"),
+            max_vocab=int(os.getenv("ENCODER_MAX_VOCAB", "100000"))
+        )
+
     # ----------------------------------------------
     # Deterministic categorical embedding
     # ----------------------------------------------
-    def _embed_cat(self, value, vocab, size=4):
-        if value not in vocab:
-            seed = abs(hash(value)) % (2**32)
-            rng = np.random.default_rng(seed)
-            vocab[value] = rng.uniform(-0.5, 0.5, size)
-        return vocab[value]
+    def _embed_cat(self, value, vocab: CategoricalTable):
+        return vocab.lookup(value)
 
     # ----------------------------------------------
     # MAIN ENCODER
@@ -90,3 +116,88 @@ class FraudEncoder:
         # Normalize for ANN stability
         avg = avg / (np.linalg.norm(avg) + 1e-12)
         return avg.astype(np.float32)
+
+    # ----------------------------------------------
+    # BATCH ENCODER (columnar)
+    # ----------------------------------------------
+    def embed_batch(self, txs: TxBlock, normalize: bool = True, out: np.ndarray = None) -> np.ndarray:
+        """
+        Encode N transactions into one (N, 32) float32 matrix.
+
+        `txs` is either a list of tx dicts or a dict of columns:
+            feature_signature (N, 4), is_fraud (N,), amount (N,),
+            merchant_category / location / device_fingerprint (N,)
+        Missing columns take the same defaults as embed_transaction.
+
+        With normalize=False every row is bit-identical to embed_transaction(tx).
+        With normalize=True rows are L2-normalized in one pass (see l2_normalize).
+        """
+        cols = self._columns(txs)
+        n = cols["n"]
+
+        if out is None:
+            out = np.empty((n, self.embed_dim), dtype=np.float32)
+        out[:, DEV_SLICE.stop:] = 0.0
+
+        # Numeric parts are computed in float64 and cast on assignment,
+        # exactly like the per-transaction path.
+        out[:, SIG_SLICE] = cols["feature_signature"] * 1.5
+        out[:, FRAUD_SLICE] = np.where(cols["is_fraud"][:, None], self.FRAUD_VEC * 5.0, 0.0)
+        out[:, AMOUNT_COL] = (cols["amount"] / 5000.0) * 0.3
+
+        self._embed_cat_column(cols["merchant_category"], self.merchant_vocab, out[:, MERCH_SLICE])
+        self._embed_cat_column(cols["location"], self.location_vocab, out[:, LOC_SLICE])
+        self._embed_cat_column(cols["device_fingerprint"], self.device_vocab, out[:, DEV_SLICE])
+
+        if normalize:
+            self.l2_normalize(out)
+        return out
+
+    @staticmethod
+    def l2_normalize(mat: np.ndarray) -> np.ndarray:
+        """
+        In-place row-wise L2 normalization of a float32 matrix.
+        Each row's result does not depend on the other rows, so a batch of N
+        normalizes bit-identically to N batches of one.
+        """
+        norms = np.sqrt(np.einsum("ij,ij->i", mat, mat))
+        mat /= (norms + 1e-12)[:, None]
+        return mat
+
+    def _embed_cat_column(self, values: Sequence, vocab: CategoricalTable, out: np.ndarray):
+        # one vocab lookup per distinct value, then a single gather
+        if len(values):
+            out[:] = vocab.lookup_many(values) * 0.5
+
+    @staticmethod
+    def _columns(txs: TxBlock) -> dict:
+        """Normalize a list of tx dicts or a column dict into column arrays."""
+        if isinstance(txs, dict):
+            n = len(next(iter(txs.values()))) if txs else 0
+
+            def col(key, default):
+                return txs[key] if key in txs else [default] * n
+
+            sig = np.asarray(txs["feature_signature"], dtype=np.float64) if "feature_signature" in txs \
+                else np.zeros((n, 4))
+            return {
+                "n": n,
+                "feature_signature": sig.reshape(n, 4),
+                "is_fraud": np.asarray(col("is_fraud", False), dtype=bool),
+                "amount": np.asarray(col("amount", 0), dtype=np.float64),
+                "merchant_category": col("merchant_category", "unknown"),
+                "location": col("location", "unknown"),
+                "device_fingerprint": col("device_fingerprint", "unknown"),
+            }
+
+        n = len(txs)
+        return {
+            "n": n,
+            "feature_signature": np.array([tx.get("feature_signature", [0, 0, 0, 0]) for tx in txs],
+                                          dtype=np.float64).reshape(n, 4),
+            "is_fraud": np.fromiter((bool(tx.get("is_fraud")) for tx in txs), dtype=bool, count=n),
+            "amount": np.fromiter((float(tx.get("amount", 0)) for tx in txs), dtype=np.float64, count=n),
+            "merchant_category": [tx.get("merchant_category", "unknown") for tx in txs],
+            "location": [tx.get("location", "unknown") for tx in txs],
+            "device_fingerprint": [tx.get("device_fingerprint", "unknown") for tx in txs],
+        }
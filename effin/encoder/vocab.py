@@ -0,0 +1,114 @@
+# effin/encoder/vocab.py
+import hashlib
+from collections import OrderedDict
+from typing import Hashable, Sequence
+
+import numpy as np
+
+# Shared by every bank node: embeddings only line up across nodes
+# when all of them use the same key.
+DEFAULT_HASH_KEY = b"effin-encoder-v1"
+
+
+def hash_key(key: bytes) -> bytes:
+    """BLAKE2b takes keys of up to 64 bytes: longer ones are hashed down to 64 (shorter ones used as is)."""
+    if len(key) > hashlib.blake2b.MAX_KEY_SIZE:
+        return hashlib.blake2b(key, digest_size=hashlib.blake2b.MAX_KEY_SIZE, person=b"effin-hash-key").digest()
+    return key
+
+
+class CategoricalTable:
+    """
+    Process-independent categorical embedding table.
+
+    Values are mapped with a keyed BLAKE2b digest (the field name is used as
+    personalization, so "X" as a merchant and "X" as a device differ).
+
+    - hashing mode (default): feature hashing into a fixed (buckets, size)
+      array; memory is fixed, colliding values share a row. Bucket indices of
+      recently seen values are memoized (at most `max_entries`, then reset).
+    - exact mode: every value gets its own vector derived from its digest,
+      cached in an LRU of at most `max_entries`. Eviction is lossless because
+      the vector is recomputed from the digest on the next miss.
+    """
+
+    def __init__(self, name: str, key: bytes = DEFAULT_HASH_KEY, size: int = 4,
+                 buckets: int = 1 << 14, exact: bool = False, max_entries: int = 100_000):
+        self.name = name
+        self.key = hash_key(key)
+        self.size = size
+        self.buckets = buckets
+        self.exact = exact
+        self.max_entries = max_entries
+        self._person = name.encode()[:16]
+
+        self._rows = {}
+        if exact:
+            self._lru: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+            self.table = None
+        else:
+            self._lru = None
+            seed = int.from_bytes(self._digest(b"__table_seed__", 8), "little")
+            self.table = np.random.default_rng(seed).uniform(-0.5, 0.5, (buckets, size))
+
+    # ----------------------------------------------
+    # Hashing
+    # ----------------------------------------------
+    def _digest(self, data: bytes, digest_size: int) -> bytes:
+        return hashlib.blake2b(data, digest_size=digest_size, key=self.key, person=self._person).digest()
+
+    def bucket(self, value) -> int:
+        """Stable bucket index for `value` (hashing mode)."""
+        row = self._rows.get(value)
+        if row is None:
+            row = int.from_bytes(self._digest(str(value).encode(), 8), "little") % self.buckets
+            if len(self._rows) >= self.max_entries:
+                self._rows.clear()
+            self._rows[value] = row
+        return row
+
+    def _exact_vector(self, value) -> np.ndarray:
+        words = np.frombuffer(self._digest(str(value).encode(), 4 * self.size), dtype="<u4")
+        return words / 2.0 ** 32 - 0.5
+
+    # ----------------------------------------------
+    # Lookups
+    # ----------------------------------------------
+    def lookup(self, value) -> np.ndarray:
+        """Return the float64 embedding of `value` (length `size`)."""
+        if not self.exact:
+            return self.table[self.bucket(value)]
+
+        vec = self._lru.get(value)
+        if vec is None:
+            vec = self._exact_vector(value)
+            self._lru[value] = vec
+            if len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+        else:
+            self._lru.move_to_end(value)
+        return vec
+
+    def lookup_many(self, values: Sequence) -> np.ndarray:
+        """Embed a column of values -> (N, size); one hash per distinct value."""
+        codes = {}
+        idx = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.intp, count=len(values))
+        if not codes:
+            return np.empty((0, self.size))
+        if self.exact:
+            table = np.stack([self.lookup(v) for v in codes])
+            return table[idx]
+        rows = np.fromiter((self.bucket(v) for v in codes), dtype=np.intp, count=len(codes))
+        return self.table[rows[idx]]
+
+    def __len__(self):
+        return len(self._lru) if self.exact else self.buckets
+
+    def __contains__(self, value):
+        return value in self._lru if self.exact else True
+
+    def nbytes(self) -> int:
+        """Approximate memory held by embedding vectors."""
+        if self.exact:
+            return len(self._lru) * self.size * 8
+        return self.table.nbytes + len(self._rows) * 8
@@ -1,12 +1,27 @@
 # effin/node/__main__.py
-import dotenv
-dotenv.load_dotenv()
-
-from effin.node.app import main
-import asyncio, os
+import asyncio, os, shutil, tempfile
 
+# Nothing at import time: worker processes of the multi-process node re-import
+# this module (multiprocessing spawn) and must configure the app themselves.
 if __name__ == "__main__":
-    asyncio.run(main(
-        tps=float(os.getenv("TPS", "2.0")),
-        workers=int(os.getenv("WORKERS", "2"))
-    ))
+    import dotenv
+    dotenv.load_dotenv()
+
+    tps = float(os.getenv("TPS", "2.0"))
+    processes = int(os.getenv("NODE_PROCESSES", "1")) or os.cpu_count() or 1
+    if processes > 1:
+        # before prometheus_client is imported: every process writes its metrics here
+        prom_dir = os.environ.setdefault(
+            "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), f"effin_prom_{os.getenv('BANK_ID', 'bank1')}")
+        )
+        shutil.rmtree(prom_dir, ignore_errors=True)
+        os.makedirs(prom_dir)
+
+        from effin.node.multiproc import run
+        run(processes, tps)
+    else:
+        from effin.node.app import main
+        asyncio.run(main(
+            tps=tps,
+            workers=int(os.getenv("WORKERS", "2"))
+        ))
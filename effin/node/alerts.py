@@ -0,0 +1,150 @@
+# effin/node/alerts.py
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _floats(values: list) -> Tuple[np.ndarray, np.ndarray]:
+    """Column of numeric-ish values → (float64 with NaN for None / unparseable, not-None mask)."""
+    try:
+        out = np.array(values, dtype=np.float64)
+        return out, ~np.isnan(out)
+    except (TypeError, ValueError):
+        out = np.full(len(values), np.nan)
+        for j, v in enumerate(values):
+            try:
+                out[j] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return out, np.array([v is not None for v in values], dtype=bool)
+
+
+class NeighborBlock:
+    """
+    A query `results` payload as (N, K) arrays, padded where a row has fewer
+    than K neighbors (distance / score NaN, id None, bank code -1):
+
+      distance, score, has_score, valid   parsed up front (one pass per field)
+      ids, bank (codes into `banks`)      built on first access
+
+    `score` follows the alert rule: "score", else "similarity" when score is
+    falsy; `has_score` marks neighbors that carry one (even if unparseable).
+    Thresholds are applied first, so bank lookups in hits() only touch the
+    few neighbors that pass. `rows[i][j]` is the original neighbor dict.
+    """
+
+    __slots__ = ("rows", "valid", "distance", "score", "has_score", "_flat", "_ids", "_bank", "banks")
+
+    def __init__(self, results: Sequence[Sequence[Dict]], k: Optional[int] = None):
+        self.rows = results
+        n = len(results)
+        k = max((len(g) for g in results), default=0) if k is None else k
+
+        self._flat = flat = [nb for g in results for nb in g[:k]]
+        if len(flat) == n * k:
+            self.valid = np.ones((n, k), dtype=bool)
+        else:
+            lens = np.fromiter((min(len(g), k) for g in results), dtype=np.intp, count=n)
+            self.valid = np.arange(k)[None, :] < lens[:, None]
+
+        dist, _ = _floats([nb.get("distance") for nb in flat])
+        score, has_score = _floats([nb.get("score") or nb.get("similarity") for nb in flat])
+        self.distance = self._column(dist, np.nan)
+        self.score = self._column(score, np.nan)
+        self.has_score = self._column(has_score, False)
+        self._ids = self._bank = None
+        self.banks: List = []
+
+    def _column(self, flat: np.ndarray, pad) -> np.ndarray:
+        if flat.size == self.valid.size:
+            return flat.reshape(self.valid.shape)
+        out = np.full(self.valid.shape, pad, dtype=flat.dtype)
+        out[self.valid] = flat
+        return out
+
+    @property
+    def shape(self):
+        return self.valid.shape
+
+    @property
+    def ids(self) -> np.ndarray:
+        if self._ids is None:
+            ids = np.empty(len(self._flat), dtype=object)
+            ids[:] = [nb.get("id") for nb in self._flat]
+            self._ids = self._column(ids, None)
+        return self._ids
+
+    @property
+    def bank(self) -> np.ndarray:
+        if self._bank is None:
+            codes: Dict = {}
+            flat = np.fromiter((codes.setdefault((nb.get("metadata") or {}).get("bank_id"), len(codes))
+                                for nb in self._flat), dtype=np.int32, count=len(self._flat))
+            self.banks = list(codes)
+            self._bank = self._column(flat, -1)
+        return self._bank
+
+    def other_bank(self, own_bank: str, among: Optional[np.ndarray] = None) -> np.ndarray:
+        """Neighbors from a bank other than `own_bank` (missing metadata counts), optionally only within `among`."""
+        if among is None:
+            bank = self.bank
+            code = self.banks.index(own_bank) if own_bank in self.banks else -2
+            return self.valid & (bank != code)
+        out = np.zeros(self.shape, dtype=bool)
+        rows, cols = np.nonzero(among & self.valid)
+        out[rows, cols] = [(self.rows[i][j].get("metadata") or {}).get("bank_id") != own_bank
+                           for i, j in zip(rows.tolist(), cols.tolist())]
+        return out
+
+    def hits(self, own_bank: str, distance_threshold: float, similarity_threshold: float) -> np.ndarray:
+        """
+        (N, K) alert mask: neighbor from another bank and, when it carries a
+        score, score ≥ similarity_threshold, otherwise distance ≤ distance_threshold
+        (NaN, i.e. missing or unparseable, never passes).
+        """
+        with np.errstate(invalid="ignore"):
+            passed = np.where(self.has_score, self.score >= similarity_threshold, self.distance <= distance_threshold)
+        return self.other_bank(own_bank, among=passed)
+
+
+# ----------------------------
+# Reference: the per-neighbor alert loop NeighborBlock.hits replaces, and
+# synthetic payloads to check and time one against the other
+# (tests/test_alerts.py, tools/benchmark_alerts.py)
+# ----------------------------
+def loop_hits(results: Sequence[Sequence[Dict]], own_bank: str, distance_threshold: float,
+              similarity_threshold: float, debug: bool = False) -> List[Tuple[int, Dict]]:
+    """(query row, neighbor) pairs that alert, one neighbor at a time (the old stage_alert check)."""
+    hits = []
+    for i, group in enumerate(results):
+        if debug:
+            print(f"[DEBUG] Query {i} neighbors raw:", group)
+        for neighbor in group:
+            dist = neighbor.get("distance")
+            score = neighbor.get("score") or neighbor.get("similarity")
+            if debug:
+                print(f"[DEBUG] neighbor id={neighbor.get('id')} meta={neighbor.get('metadata')} "
+                      f"distance={dist} score={score}")
+            if neighbor.get("metadata", {}).get("bank_id") == own_bank:
+                continue
+            triggered = False
+            if score is not None:
+                try:
+                    triggered = float(score) >= similarity_threshold
+                except Exception:
+                    pass
+            elif dist is not None:
+                try:
+                    triggered = float(dist) <= distance_threshold
+                except Exception:
+                    pass
+            if triggered:
+                hits.append((i, neighbor))
+    return hits
+
+
+def make_results(n: int, k: int, rng, banks: Sequence[str] = ("bank1", "bank2", "bank3")) -> List[List[Dict]]:
+    """n query rows of k neighbors with random distances and banks (`rng` is a random.Random)."""
+    return [[{"id": f"tx-{q}-{j}", "distance": rng.uniform(0, 2),
+              "metadata": {"bank_id": rng.choice(banks), "tx_ref": "ab" * 8}}
+             for j in range(k)] for q in range(n)]
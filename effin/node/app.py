@@ -1,19 +1,31 @@
 # effin/node/app.py
 import asyncio
 import os
+import signal
 import time
-import json
 import uuid
-from typing import List, Dict
+import weakref
+from typing import Optional
 
-from prometheus_client import Counter, Histogram, start_http_server
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
 
 from effin.encoder.model import FraudEncoder
-from effin.node.ingest import tx_producer
-from effin.node.search import CyborgWrapper
-from effin.common.crypto import encrypt_vector_b64, hash_id_hex
-from cryptography.fernet import Fernet
-import numpy as np
+from effin.node.loadgen import TxGenerator, TrafficRecorder, generate_into, replay_into, parse_speed
+from effin.node.ingest import open_source, ack
+from effin.node.search import CyborgWrapper, CyborgUnavailable, RetryPolicy, CircuitBreaker
+from effin.node.pipeline import Batch, Pipeline, Stage, parse_concurrency
+from effin.node.batcher import MicroBatcher
+from effin.node.alerts import NeighborBlock
+from effin.node.training import TrainScheduler
+from effin.node.encodeproc import EncodeService
+from effin.node.indexes import IndexManager
+from effin.node.localindex import LocalIndex, IVFLocalIndex, LOCAL_LOOKUPS, LOCAL_HITS, LOCAL_DEGRADED, LOCAL_SAVED
+from effin.common.audit import get_writer
+from effin.common.rings import RingEngine
+from effin.common.ratelimit import KeyedRateLimiter, TTLSet
+from effin.common.metrics import MULTIPROC_DIR, gauge_function, sample_gauges, serve
+from effin.common.crypto import CRYPTO_THREADS, encrypt_vectors_b64, decrypt_vector_b64, hash_id_hex
 
 
 # ------------------------------------------------------------
@@ -23,9 +35,23 @@ import numpy as np
 # so all banks write/read to the same encrypted vector index for cross-bank detection.
 INDEX_NAME = os.getenv("INDEX_NAME", "effin_global_fraud_index")
 INDEX_KEY = os.getenv("INDEX_KEY", "")
+# keep: reuse the index if its config matches (create if missing) | recreate: drop it first (dev only)
+INDEX_STARTUP_MODE = os.getenv("INDEX_STARTUP_MODE", "keep").lower()
+# "" (unversioned INDEX_NAME) | N (INDEX_NAME__vN) | latest (follow new versions: dual-write, then swap)
+INDEX_VERSION = os.getenv("INDEX_VERSION", "").lower()
+INDEX_SWAP_MIN_VECTORS = int(os.getenv("INDEX_SWAP_MIN_VECTORS", "0"))
+INDEX_REFRESH_S = float(os.getenv("INDEX_REFRESH_S", "60"))
 TOP_K = int(os.getenv("TOP_K", "5"))
-BATCH_SIZE = int(os.getenv("BATCH_SIZE", "32"))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "32"))          # upper bound of the adaptive batch size
+BATCH_MIN_SIZE = int(os.getenv("BATCH_MIN_SIZE", "1"))
+BATCH_LINGER_MS = float(os.getenv("BATCH_LINGER_MS", "50"))
+TARGET_P99_MS = float(os.getenv("TARGET_P99_MS", "1000"))  # 0 disables batch size adaptation
+# Index training (own task): after TRAIN_AFTER upserts, every TRAIN_EVERY_S, or when observed recall
+# drops below TRAIN_MIN_RECALL (0 disables a trigger); runs at least TRAIN_MIN_INTERVAL_S apart
 TRAIN_AFTER = int(os.getenv("TRAIN_AFTER", "500"))
+TRAIN_EVERY_S = float(os.getenv("TRAIN_EVERY_S", "600"))
+TRAIN_MIN_RECALL = float(os.getenv("TRAIN_MIN_RECALL", "0.9"))
+TRAIN_MIN_INTERVAL_S = float(os.getenv("TRAIN_MIN_INTERVAL_S", "30"))
 
 # Support both a distance threshold (lower-is-better) and a similarity threshold (higher-is-better)
 ALERT_DISTANCE_THRESHOLD = float(os.getenv("ALERT_DISTANCE_THRESHOLD", "0.3"))
@@ -34,9 +60,52 @@ ALERT_SIMILARITY_THRESHOLD = float(os.getenv("ALERT_SIMILARITY_THRESHOLD", "0.7"
 BANK_ID = os.getenv("BANK_ID", "bank1")
 AUDIT_FILE = os.getenv("AUDIT_FILE", f"audit_{BANK_ID}.jsonl")
 PROM_PORT = int(os.getenv("PROM_PORT", "8001"))
-
-# Debugging: prints full ANN results when true
+# Set by the multi-process node (effin.node.multiproc) in its worker processes
+NODE_WORKER = os.getenv("NODE_WORKER", "")
+
+# Synthetic traffic: generated in blocks (TPS), optionally recorded to TRAFFIC_RECORD,
+# or replayed from TRAFFIC_REPLAY at TRAFFIC_SPEED (1 | 10 | max)
+TRAFFIC_BLOCK = int(os.getenv("TRAFFIC_BLOCK", "256"))
+TRAFFIC_SEED = os.getenv("TRAFFIC_SEED", "")
+TRAFFIC_RECORD = os.getenv("TRAFFIC_RECORD", "")
+TRAFFIC_REPLAY = os.getenv("TRAFFIC_REPLAY", "")
+TRAFFIC_SPEED = parse_speed(os.getenv("TRAFFIC_SPEED", "1"))
+# Real transaction stream instead of synthetic traffic: - | file:<path> | tcp:<host>:<port> |
+# unix:<path> | broker:<dir>/<topic>. Offsets of fully audited txs are committed every INGEST_CHECKPOINT_S
+INGEST_SOURCE = os.getenv("INGEST_SOURCE", "")
+INGEST_CHECKPOINT = os.getenv("INGEST_CHECKPOINT", f"ingest_{BANK_ID}.offset")
+INGEST_CHECKPOINT_S = float(os.getenv("INGEST_CHECKPOINT_S", "1.0"))
+
+# Pipeline: bounded queue (in batches) in front of every stage + per-stage worker counts
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+STAGE_CONCURRENCY = os.getenv("STAGE_CONCURRENCY", "")
+# Overlap upsert + query of a batch in a single "upsert_query" stage (vectors serialized once)
+COMBINED_ROUND_TRIP = os.getenv("COMBINED_ROUND_TRIP", "true").lower() in ("1", "true", "yes")
+# Encode in this many separate processes, exchanging batches through a shared-memory ring of
+# ENCODE_RING_SLOTS slots (0 = encode on the event loop)
+ENCODE_PROCESSES = int(os.getenv("ENCODE_PROCESSES", "0"))
+ENCODE_RING_SLOTS = int(os.getenv("ENCODE_RING_SLOTS", "64"))
+
+# Local hot-vector cache: pre-screens batches before the remote query, serves degraded mode
+LOCAL_INDEX = os.getenv("LOCAL_INDEX", "flat").lower()          # flat | ivf | off
+LOCAL_INDEX_CAPACITY = int(os.getenv("LOCAL_INDEX_CAPACITY", "16384"))
+# cache remote neighbors (other banks) found within this distance
+LOCAL_INDEX_RADIUS = float(os.getenv("LOCAL_INDEX_RADIUS", str(2 * ALERT_DISTANCE_THRESHOLD)))
+
+# Fraud rings: connected components over alert edges, expired after RING_WINDOW_S
+RING_WINDOW_S = float(os.getenv("RING_WINDOW_S", "3600"))
+RING_MAX_EDGES = int(os.getenv("RING_MAX_EDGES", "1000000"))
+
+# Alert suppression: one alert per (tx, matched ring or tx_ref, matched bank) within the TTL,
+# and at most ALERT_RING_RATE alerts/s per ring (bursts of ALERT_RING_BURST); 0 disables either
+ALERT_DEDUP_TTL_S = float(os.getenv("ALERT_DEDUP_TTL_S", "600"))
+ALERT_DEDUP_MAX = int(os.getenv("ALERT_DEDUP_MAX", "100000"))
+ALERT_RING_RATE = float(os.getenv("ALERT_RING_RATE", "5"))
+ALERT_RING_BURST = float(os.getenv("ALERT_RING_BURST", "20"))
+
+# Debugging: per-batch result summary, plus the raw neighbors of a DEBUG_SAMPLE fraction of queries
 DEBUG_MODE = os.getenv("DEBUG_MODE", "true").lower() in ("1", "true", "yes")
+DEBUG_SAMPLE = float(os.getenv("DEBUG_SAMPLE", "0.01"))
 
 
 # ------------------------------------------------------------
@@ -45,240 +114,518 @@ DEBUG_MODE = os.getenv("DEBUG_MODE", "true").lower() in ("1", "true", "yes")
 Q_COUNTER = Counter("effin_queries_total", "Total queries processed", ["worker"])
 UPSERT_COUNTER = Counter("effin_upserts_total", "Total upsert operations", ["worker"])
 ALERT_COUNTER = Counter("effin_alerts_total", "Total alerts emitted", ["severity"])
+ALERT_SUPPRESSED = Counter("effin_alerts_suppressed_total", "Alerts dropped before emit", ["reason"])
+DEAD_LETTERS = Counter("effin_dead_letter_total", "Txs of dropped batches written to the audit ledger as dead letters", ["stage"])
 LATENCY_HIST = Histogram("effin_query_latency_seconds", "Query latency seconds")
+INGEST_DEPTH = Gauge("effin_ingest_queue_depth", "Transactions waiting in the ingest queue")
+E2E_HIST = Histogram(
+    "effin_alert_decision_latency_seconds",
+    "Transaction timestamp → alert decision",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
 
 # ------------------------------------------------------------
 # MODEL + SEARCH CLIENT
 # ------------------------------------------------------------
-encoder = FraudEncoder()
+# All bank nodes must share ENCODER_HASH_KEY so categorical embeddings line up
+encoder = FraudEncoder.from_env()
+if ENCODE_PROCESSES > 0 and encoder.merchant_vocab.exact:
+    # exact vocabularies grow per process, so separate encoders would disagree
+    print("[WARN] ENCODE_PROCESSES ignored with ENCODER_EXACT_VOCAB — encoding in-process.")
+    ENCODE_PROCESSES = 0
+encode_service = EncodeService(ENCODE_PROCESSES, rows=BATCH_SIZE, slots=ENCODE_RING_SLOTS, bank_id=BANK_ID) \
+    if ENCODE_PROCESSES > 0 else None
 
 cy = CyborgWrapper(
     endpoint=os.getenv("CYBORGDB_ENDPOINT"),
     api_key=os.getenv("CYBORGDB_API_KEY"),
-    index_key=INDEX_KEY
+    index_key=INDEX_KEY,
+    json_backend=os.getenv("JSON_BACKEND") or None,   # orjson | numpy | stdlib (default: fastest available)
+    # one shared connection pool per node
+    max_connections=int(os.getenv("CYBORG_MAX_CONNECTIONS", "64")),
+    max_keepalive=int(os.getenv("CYBORG_MAX_KEEPALIVE", "32")),
+    keepalive_expiry=float(os.getenv("CYBORG_KEEPALIVE_EXPIRY", "30")),
+    http2=os.getenv("CYBORG_HTTP2", "false").lower() in ("1", "true", "yes"),
+    # resilience: jittered retries, optional hedged queries, breaker + spill queue
+    retry=RetryPolicy(attempts=int(os.getenv("CYBORG_RETRIES", "3"))),
+    breaker=CircuitBreaker(
+        threshold=int(os.getenv("CYBORG_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("CYBORG_BREAKER_RESET_S", "10"))
+    ),
+    hedge_percentile=float(os.getenv("CYBORG_HEDGE_PERCENTILE", "0")) or None,
+    spill_max=int(os.getenv("CYBORG_SPILL_MAX", "50000")),
+    # spilled upserts are on disk before their txs are acked (see CyborgWrapper)
+    spill_path=os.getenv("CYBORG_SPILL_FILE", os.path.splitext(AUDIT_FILE)[0] + ".spill") or None
 )
 
+if LOCAL_INDEX == "ivf":
+    local_index = IVFLocalIndex(dim=32, capacity=LOCAL_INDEX_CAPACITY)
+elif LOCAL_INDEX in ("off", "false", "0", "none"):
+    local_index = None
+else:
+    local_index = LocalIndex(dim=32, capacity=LOCAL_INDEX_CAPACITY)
+
+rings = RingEngine(window_s=RING_WINDOW_S, max_edges=RING_MAX_EDGES,
+                   prefix=f"ring-{BANK_ID}-w{NODE_WORKER}-" if NODE_WORKER else f"ring-{BANK_ID}-")
+alert_seen = TTLSet(ALERT_DEDUP_TTL_S, ALERT_DEDUP_MAX) if ALERT_DEDUP_TTL_S > 0 else None
+ring_limiter = KeyedRateLimiter(ALERT_RING_RATE, ALERT_RING_BURST) if ALERT_RING_RATE > 0 else None
+
 q = asyncio.Queue(maxsize=5000)
-_upsert_count = 0
-_upsert_lock = asyncio.Lock()
+gauge_function(INGEST_DEPTH, q.qsize)
+
+# One batcher shared by the whole node (flushes on size or linger deadline)
+batcher = MicroBatcher(
+    q,
+    max_size=BATCH_SIZE,
+    min_size=BATCH_MIN_SIZE,
+    linger_ms=BATCH_LINGER_MS,
+    target_p99_s=TARGET_P99_MS / 1000.0 or None
+)
+indexes = IndexManager(cy, INDEX_NAME, dimension=32, version=INDEX_VERSION,
+                       swap_min_vectors=INDEX_SWAP_MIN_VECTORS)
+
+trainer = TrainScheduler(
+    lambda: cy.train_index(indexes.name),
+    after_vectors=TRAIN_AFTER,
+    every_s=TRAIN_EVERY_S,
+    min_recall=TRAIN_MIN_RECALL,
+    min_interval_s=TRAIN_MIN_INTERVAL_S
+)
 
 # ------------------------------------------------------------
 # ENCRYPTED AUDIT LOG
-# (unchanged — audit remains Fernet-encrypted JSONL)
+# Fernet-encrypted JSONL, written in groups by a background thread
+# (fsync policy: AUDIT_FSYNC_EVERY events / AUDIT_FSYNC_MS)
 # ------------------------------------------------------------
 FERNET_KEY = os.getenv("FERNET_KEY")
 if not FERNET_KEY:
     raise RuntimeError("FERNET_KEY missing")
 
-fernet = Fernet(FERNET_KEY.encode())
+audit = get_writer(AUDIT_FILE)
 
 
 def append_audit(event: dict):
-    raw = json.dumps(event).encode()
-    token = fernet.encrypt(raw)
-    with open(AUDIT_FILE, "ab") as f:
-        f.write(token + b"\n")
+    audit.write(event)
 
 
 # ------------------------------------------------------------
-# ENSURE INDEX EXISTS (DROP + RECREATE FRESH INDEX)
+# OPEN THE SHARED INDEX (KEPT ACROSS RESTARTS; RECREATE ONLY ON REQUEST)
 # ------------------------------------------------------------
 async def ensure_index_exists():
-    """
-    Always delete existing index and recreate it cleanly.
-    Useful during development to guarantee a fresh ANN graph.
-    """
-    try:
-        # Try deleting the index first (ignore errors if it doesn't exist)
-        await cy.client.post(
-            f"{cy.endpoint}/v1/indexes/delete",
-            json={"index_name": INDEX_NAME, "index_key": INDEX_KEY},
-            headers=cy.headers
-        )
-        print(f"[INFO] Deleted existing index '{INDEX_NAME}'")
-    except Exception as e:
-        print(f"[WARN] Could not delete index (may not exist): {e}")
-
-    # Now recreate a fresh index
+    """Open the shared index per INDEX_STARTUP_MODE / INDEX_VERSION (kept across restarts by default)."""
     try:
-        resp = await cy.client.post(
-            f"{cy.endpoint}/v1/indexes/create",
-            json={
-                "index_name": INDEX_NAME,
-                "index_key": INDEX_KEY,
-                "index_config": {
-                    "type": "ivfflat",
-                    "dimension": 32
-                }
-            },
-            headers=cy.headers
-        )
-        print(f"[SUCCESS] Created new index '{INDEX_NAME}'")
-        return resp.json()
+        return await indexes.open(INDEX_STARTUP_MODE)
     except Exception as e:
-        print(f"[ERROR] Failed to create index '{INDEX_NAME}': {e}")
+        print(f"[ERROR] Failed to open index '{INDEX_NAME}': {e}")
         raise
 
 
 # ------------------------------------------------------------
-# WORKER LOGIC
+# PIPELINE STAGES
+# encode → encrypt → prescreen → upsert → query (or combined upsert_query) → alert → audit
 # ------------------------------------------------------------
-async def worker_consume(name: str):
-    global _upsert_count
-    batch: List[Dict] = []
+async def next_batch():
+    """Next micro-batch from the shared batcher; None once shut down and drained."""
+    txs = await batcher.next_batch()
+    return Batch(txs) if txs else None
+
+
+def stage_encode(batch: Batch):
+    # Encode + L2-normalize the whole batch in one pass
+    batch.vectors = encoder.embed_batch(batch.txs)
+
+
+async def stage_encode_shm(batch: Batch):
+    # encoded by an encoder process into a ring slot; vectors are a view of it until the batch is audited
+    encoded = await encode_service.encode(batch.txs)
+    if encoded is None:
+        return stage_encode(batch)
+    slot, batch.vectors, batch.tx_refs = encoded
+    batch.release = weakref.finalize(batch, encode_service.release, slot)
+
+
+async def stage_encrypt(batch: Batch):
+    # Encrypt the whole batch in one call (VECTOR_CIPHER tokens); with CRYPTO_THREADS
+    # it runs off the event loop, the cipher releases the GIL
+    if CRYPTO_THREADS:
+        tokens = await asyncio.to_thread(encrypt_vectors_b64, batch.vectors)
+    else:
+        tokens = encrypt_vectors_b64(batch.vectors)
+
+    for i, (tx, vec) in enumerate(zip(batch.txs, batch.vectors)):
+        # metadata for the index: include bank_id and an anonymized tx reference and encrypted vector token
+        metadata = {
+            "bank_id": BANK_ID,
+            # hashed tx reference (not raw tx_id)
+            "tx_ref": batch.tx_refs[i] if batch.tx_refs else hash_id_hex(tx["tx_id"]),
+            # encrypted token stored in metadata for compliance/retrieval (authenticated: Fernet or AES-GCM)
+            "enc_vec": tokens[i]
+        }
+
+        batch.items.append({
+            "id": tx["tx_id"],    # id used by index (keeps original id so you can map locally)
+            "vector": vec,        # numeric vector required by CyborgDB
+            "metadata": metadata
+        })
+
+
+async def shadow_upsert(batch: Batch, shadow: str):
+    try:
+        await cy.batch_upsert(shadow, batch.items)
+    except Exception as e:
+        print(f"[WARN] Shadow upsert to '{shadow}' failed: {e}")
 
-    while True:
-        tx = await q.get()
-        start = time.time()
 
-        try:
-            vec = encoder.embed_transaction(tx)
-
-            # Normalize embedding for ANN stability (L2)
-            vec = vec / (np.linalg.norm(vec) + 1e-12)
-
-            # ---------------------------
-            # Encrypt the vector (Fernet) and keep encrypted token in metadata
-            # ---------------------------
-            enc_token_str = encrypt_vector_b64(vec)  # string of Fernet token
-
-            # metadata for the index: include bank_id and an anonymized tx reference and encrypted vector token
-            metadata = {
-                "bank_id": BANK_ID,
-                # hashed tx reference (not raw tx_id)
-                "tx_ref": hash_id_hex(tx["tx_id"]),
-                # encrypted token stored in metadata for compliance/retrieval (safe because it's Fernet)
-                "enc_vec": enc_token_str
-            }
-
-            batch.append({
-                "id": tx["tx_id"],    # id used by index (keeps original id so you can map locally)
-                "vector": vec,        # numeric vector required by CyborgDB
-                "metadata": metadata
-            })
-
-            # ----------------------------------------------------
-            # PROCESS BATCH
-            # ----------------------------------------------------
-            if len(batch) >= BATCH_SIZE:
-
-                await cy.batch_upsert(INDEX_NAME, batch)
-                UPSERT_COUNTER.labels(worker=name).inc(len(batch))
-
-                # TRAIN
-                async with _upsert_lock:
-                    _upsert_count += len(batch)
-                    if _upsert_count >= TRAIN_AFTER:
-                        try:
-                            await cy.client.post(
-                                f"{cy.endpoint}/v1/indexes/train",
-                                json={"index_name": INDEX_NAME, "index_key": INDEX_KEY},
-                                headers=cy.headers
-                            )
-                        except Exception:
-                            pass
-                        _upsert_count = 0
-
-                # QUERY batch (numeric vectors)
-                vectors = [item["vector"] for item in batch]
-
-                with LATENCY_HIST.time():
-                    result = await cy.batch_query(INDEX_NAME, vectors, top_k=TOP_K)
-
-                Q_COUNTER.labels(worker=name).inc(len(batch))
-
-                # ALERT CHECK
-                # result expected shape: {"results": [[neighbor, neighbor, ...], [...]]}
-                for i, group in enumerate(result.get("results", [])):
-                    # debug-print entire neighbor group for visibility
-                    if DEBUG_MODE:
-                        print(f"[DEBUG] Query {i} neighbors raw:", group)
-
-                    for neighbor in group:
-                        # neighbor contains 'distance' (numeric) and 'metadata'
-                        dist = neighbor.get("distance")
-                        score = neighbor.get("score") or neighbor.get("similarity")
-                        meta2 = neighbor.get("metadata", {})
-
-                        # debug each neighbor details
-                        if DEBUG_MODE:
-                            print(f"[DEBUG] neighbor id={neighbor.get('id')} meta={meta2} distance={dist} score={score}")
-
-                        # REQUIRE: different bank
-                        if meta2.get("bank_id") == BANK_ID:
-                            continue
-
-                        triggered = False
-
-                        # Use similarity/distance thresholds as before
-                        if score is not None:
-                            try:
-                                s = float(score)
-                                if s >= ALERT_SIMILARITY_THRESHOLD:
-                                    triggered = True
-                            except Exception:
-                                pass
-                        elif dist is not None:
-                            try:
-                                d = float(dist)
-                                if d <= ALERT_DISTANCE_THRESHOLD:
-                                    triggered = True
-                            except Exception:
-                                pass
-
-                        if triggered:
-                            alert = {
-                                "alert_id": str(uuid.uuid4()),
-                                "tx_id": batch[i]["id"],
-                                "matched_id": neighbor.get("id"),
-                                "distance": dist,
-                                "score": score,
-                                "bank_id": BANK_ID,
-                                "matched_bank": meta2.get("bank_id"),
-                                "matched_tx_ref": meta2.get("tx_ref"),
-                                "ring_id": f"ring-{meta2.get('tx_ref')}",  # 🔑 fraud ring key
-                                "timestamp": time.time()
-                            }
-                            ALERT_COUNTER.labels(severity="high").inc()
-                            print("ALERT:", alert)
-                            append_audit(alert)
-
-                batch.clear()
-
-            # ALWAYS LOG TX (local audit stores tx_id in encrypted ledger)
-            append_audit({
-                "event": "tx_processed",
-                "bank_id": BANK_ID,
-                "tx_id": tx["tx_id"],
-                "timestamp": time.time(),
-                "is_fraud": tx.get("is_fraud", False)
-            })
+async def with_shadow(batch: Batch, primary):
+    """
+    Await the primary CyborgDB call; while an alias swap is in progress the
+    next index version gets the same upsert concurrently, not after it.
+    """
+    if not indexes.shadow:
+        return await primary
+    result, _ = await asyncio.gather(primary, shadow_upsert(batch, indexes.shadow), return_exceptions=True)
+    if isinstance(result, BaseException):
+        raise result
+    return result
 
-        except Exception as e:
-            print(f"[ERROR worker {name}] {e}")
 
-        finally:
-            q.task_done()
-            LATENCY_HIST.observe(time.time() - start)
+async def stage_upsert(batch: Batch):
+    t0 = time.perf_counter()
+    await with_shadow(batch, cy.batch_upsert(indexes.name, batch.items))
+    batch.rtt += time.perf_counter() - t0
+    UPSERT_COUNTER.labels(worker="upsert").inc(len(batch))
+    trainer.record_upserts(len(batch))
+
+
+async def stage_query(batch: Batch):
+    # QUERY batch (numeric vectors)
+    t0 = time.perf_counter()
+    try:
+        batch.result = await cy.batch_query(indexes.name, batch.vectors, top_k=TOP_K)
+    except CyborgUnavailable as e:
+        # no neighbors this time (local pre-screen alerts still stand); the batch is still audited
+        batch.degraded = True
+        print(f"[WARN] Query skipped, CyborgDB unavailable: {e}")
+    elapsed = time.perf_counter() - t0
+    LATENCY_HIST.observe(elapsed)
+
+    batch.rtt += elapsed
+    batcher.observe_round_trip(batch.rtt)
+
+    Q_COUNTER.labels(worker="query").inc(len(batch))
+
+
+async def stage_upsert_query(batch: Batch):
+    # COMBINED: one vector serialization, upsert + query overlapped
+    t0 = time.perf_counter()
+    try:
+        batch.result = await with_shadow(batch, cy.upsert_and_query(indexes.name, batch.items, top_k=TOP_K))
+    except CyborgUnavailable as e:
+        # upsert was spilled for replay; no neighbors this time, the batch is still audited
+        batch.degraded = True
+        print(f"[WARN] Query skipped, CyborgDB unavailable: {e}")
+    elapsed = time.perf_counter() - t0
+    LATENCY_HIST.observe(elapsed)
+
+    batch.rtt += elapsed
+    batcher.observe_round_trip(batch.rtt)
+
+    UPSERT_COUNTER.labels(worker="upsert_query").inc(len(batch))
+    Q_COUNTER.labels(worker="upsert_query").inc(len(batch))
+    trainer.record_upserts(len(batch))
+
+
+def suppress_alert(tx_id: str, matched_keys, matched_bank, ring_id: str) -> bool:
+    """Drop repeats of (tx, matched ring / tx_ref, matched bank) and alerts over the ring's rate."""
+    if alert_seen is not None:
+        keys = [(tx_id, k, matched_bank) for k in matched_keys if k]
+        if any(k in alert_seen for k in keys):
+            ALERT_SUPPRESSED.labels(reason="duplicate").inc()
+            return True
+        for k in keys:
+            alert_seen.add(k)
+    if ring_limiter is not None and not ring_limiter.allow(ring_id):
+        ALERT_SUPPRESSED.labels(reason="rate_limited").inc()
+        return True
+    return False
+
+
+def make_alert(batch: Batch, i: int, neighbor: dict, dist, score, source: str) -> Optional[dict]:
+    meta2 = neighbor.get("metadata", {})
+    now = time.time()
+    tx_id, matched_id = batch.items[i]["id"], neighbor.get("id")
+    # the matched tx itself, and the ring it was in before this edge joins it to ours
+    matched_keys = (meta2.get("tx_ref") or matched_id, rings.ring_of(matched_id))
+    ring_id = rings.add_edge(tx_id, matched_id, now, BANK_ID, meta2.get("bank_id"))
+    if suppress_alert(tx_id, matched_keys, meta2.get("bank_id"), ring_id):
+        return None
+    ring = rings.info(tx_id)
+    alert = {
+        "alert_id": str(uuid.uuid4()),
+        "tx_id": tx_id,
+        "matched_id": matched_id,
+        "distance": dist,
+        "score": score,
+        "bank_id": BANK_ID,
+        "matched_bank": meta2.get("bank_id"),
+        "matched_tx_ref": meta2.get("tx_ref"),
+        "ring_id": ring_id,                         # 🔑 fraud ring key (stable across merges)
+        "ring_size": ring["size"],
+        "ring_banks": ring["bank_span"],
+        "source": source,                          # "local" (cache pre-screen) or "remote"
+        "timestamp": now
+    }
+    ALERT_COUNTER.labels(severity="high").inc()
+    print("ALERT:", alert)
+    batch.alerts.append(alert)
+    return alert
+
+
+def stage_prescreen(batch: Batch):
+    # LOCAL PRE-SCREEN: alert on cached cross-bank fraud vectors before the remote query
+    if local_index is None or not len(local_index):
+        return
+    LOCAL_LOOKUPS.inc(len(batch))
+    groups = local_index.neighbors(batch.vectors, top_k=TOP_K, max_distance=ALERT_DISTANCE_THRESHOLD)
+    for i, group in enumerate(groups):
+        hit = False
+        for neighbor in group:
+            if neighbor["metadata"].get("bank_id") == BANK_ID:
+                continue
+            make_alert(batch, i, neighbor, neighbor["distance"], None, "local")
+            batch.prescreened[(i, neighbor["id"])] = neighbor["distance"]
+            hit = True
+        if hit:
+            LOCAL_HITS.inc()
+    batch.prescreen_at = time.time()
+
+
+def cache_neighbor(neighbor: dict, dist):
+    """Keep a close cross-bank neighbor in the local index (vector recovered from its enc_vec)."""
+    meta2 = neighbor.get("metadata") or {}
+    if dist is None or neighbor.get("id") in local_index or not meta2.get("enc_vec"):
+        return
+    try:
+        if float(dist) > LOCAL_INDEX_RADIUS:
+            return
+        vec = decrypt_vector_b64(meta2["enc_vec"])
+    except Exception:
+        return  # other bank's key, or not a distance
+    local_index.add(neighbor["id"], vec, {k: v for k, v in meta2.items() if k != "enc_vec"})
+
+
+def debug_sample(block: NeighborBlock, hits):
+    n, k = block.shape
+    print(f"[DEBUG] results {n}x{k}: {int(hits.sum())} cross-bank neighbors over threshold")
+    for i in np.nonzero(np.random.random(n) < DEBUG_SAMPLE)[0]:
+        print(f"[DEBUG] Query {i} neighbors raw:", block.rows[i])
+
+
+def observe_recall(batch: Batch, block: NeighborBlock):
+    """Locally confirmed neighbors are in the remote index too: did its top_k return them?"""
+    expected = found = 0
+    for (i, matched_id), d in batch.prescreened.items():
+        if i >= len(block.rows):
+            continue
+        row = block.rows[i]
+        if any(nb.get("id") == matched_id for nb in row):
+            expected += 1
+            found += 1
+        elif len(row) < TOP_K or not np.nanmax(block.distance[i], initial=-np.inf) <= d:
+            expected += 1      # a slot was free or held a farther neighbor: a miss
+    trainer.record_recall(expected, found)
+
+
+def stage_alert(batch: Batch):
+    block = NeighborBlock(batch.result.get("results", []))
+    rings.expire()
+    if batch.prescreened:
+        if batch.degraded:
+            LOCAL_DEGRADED.inc(len(batch.prescreened))
+        else:
+            LOCAL_SAVED.observe(time.time() - batch.prescreen_at)
+            observe_recall(batch, block)
+
+    # ALERT CHECK
+    # result expected shape: {"results": [[neighbor, neighbor, ...], [...]]} → (N, top_k) arrays
+    hits = block.hits(BANK_ID, ALERT_DISTANCE_THRESHOLD, ALERT_SIMILARITY_THRESHOLD)
+    if DEBUG_MODE:
+        debug_sample(block, hits)
+
+    if local_index is not None:
+        with np.errstate(invalid="ignore"):
+            close = block.other_bank(BANK_ID, among=block.distance <= LOCAL_INDEX_RADIUS)
+        for i, j in zip(*np.nonzero(close)):
+            neighbor = block.rows[i][j]
+            cache_neighbor(neighbor, neighbor.get("distance"))
+
+    for i, j in zip(*np.nonzero(hits)):
+        i, neighbor = int(i), block.rows[i][j]
+        # already alerted by the local pre-screen
+        if (i, neighbor.get("id")) in batch.prescreened:
+            continue
+        score = neighbor.get("score") or neighbor.get("similarity")
+        make_alert(batch, i, neighbor, neighbor.get("distance"), score, "remote")
+
+    # Alert decision made for every tx in the batch
+    now = time.time()
+    for tx in batch.txs:
+        E2E_HIST.observe(now - tx["timestamp"])
+
+
+def stage_audit(batch: Batch):
+    for alert in batch.alerts:
+        append_audit(alert)
+
+    # ALWAYS LOG TX (local audit stores tx_id in encrypted ledger)
+    for tx in batch.txs:
+        append_audit({
+            "event": "tx_processed",
+            "bank_id": BANK_ID,
+            "tx_id": tx["tx_id"],
+            "timestamp": time.time(),
+            "is_fraud": tx.get("is_fraud", False)
+        })
+    # offsets are committed only after these events are flushed (see checkpoint_loop)
+    ack(batch.txs)
+    if batch.release is not None:
+        batch.release()
+
+
+def dead_letter(batch: Batch, stage: str, exc: BaseException):
+    """
+    A stage raised on this batch: record each tx in the audit ledger as a
+    dead letter (enough to re-submit it) and ack it, so the ingest offset
+    moves past it instead of stalling — and replaying it — forever.
+    """
+    for tx in batch.txs:
+        append_audit({
+            "event": "tx_dead_letter",
+            "bank_id": BANK_ID,
+            "stage": stage,
+            "error": f"{type(exc).__name__}: {exc}",
+            "timestamp": time.time(),
+            "tx": {k: v for k, v in tx.items() if k != "_ack"},
+        })
+    DEAD_LETTERS.labels(stage=stage).inc(len(batch.txs))
+    ack(batch.txs)
+    if batch.release is not None:
+        batch.release()
+
+
+def build_pipeline(workers: int = 2) -> Pipeline:
+    """
+    Network stages default to `workers` concurrent batches; override any stage
+    with STAGE_CONCURRENCY, e.g. "encrypt=2,upsert=4,query=4".
+    """
+    concurrency = parse_concurrency(STAGE_CONCURRENCY, {
+        "encode": max(1, ENCODE_PROCESSES), "encrypt": 1, "prescreen": 1, "upsert": workers, "query": workers, "upsert_query": workers,
+        "alert": 1, "audit": 1
+    })
+    if COMBINED_ROUND_TRIP:
+        network = [Stage("upsert_query", stage_upsert_query, concurrency["upsert_query"])]
+    else:
+        network = [
+            Stage("upsert", stage_upsert, concurrency["upsert"]),
+            Stage("query", stage_query, concurrency["query"]),
+        ]
+    stages = [
+        Stage("encode", stage_encode_shm if encode_service else stage_encode, concurrency["encode"]),
+        Stage("encrypt", stage_encrypt, concurrency["encrypt"]),
+        Stage("prescreen", stage_prescreen, concurrency["prescreen"]),
+        *network,
+        Stage("alert", stage_alert, concurrency["alert"]),
+        Stage("audit", stage_audit, concurrency["audit"]),
+    ]
+    return Pipeline(next_batch, stages, queue_size=PIPELINE_QUEUE_SIZE, on_drop=dead_letter)
 
 
 # ------------------------------------------------------------
 # MAIN
 # ------------------------------------------------------------
-async def main(tps=20.0, workers=2):
-    start_http_server(PROM_PORT)
+async def tx_producer(tps: float):
+    if TRAFFIC_REPLAY:
+        n = await replay_into(q, TRAFFIC_REPLAY, speed=TRAFFIC_SPEED, block=TRAFFIC_BLOCK)
+        print(f"[INFO] Replay of {TRAFFIC_REPLAY} finished: {n} transactions")
+        await asyncio.Event().wait()       # keep serving until shutdown
+    gen = TxGenerator(BANK_ID, seed=int(TRAFFIC_SEED) if TRAFFIC_SEED else None)
+    recorder = TrafficRecorder(TRAFFIC_RECORD, gen.header()) if TRAFFIC_RECORD else None
+    try:
+        await generate_into(q, gen, tps, block=TRAFFIC_BLOCK, recorder=recorder)
+    finally:
+        if recorder is not None:
+            recorder.close()
+            print(f"[INFO] Recorded {recorder.count} transactions → {TRAFFIC_RECORD}")
 
-    await ensure_index_exists()
 
-    worker_tasks = [
-        asyncio.create_task(worker_consume(f"worker-{i}"))
-        for i in range(workers)
-    ]
+async def commit_offsets(source):
+    """Persist the source offset, once every tx below it has its audit events on disk."""
+    snap = source.snapshot()
+    await asyncio.to_thread(audit.flush)
+    source.commit(snap)
 
-    producer_task = asyncio.create_task(tx_producer(q, tps=tps))
 
-    print(f"EFFIN node running → {BANK_ID} | audit={AUDIT_FILE} | port {PROM_PORT} | index={INDEX_NAME}")
-    await asyncio.gather(producer_task, *worker_tasks)
+async def checkpoint_loop(source, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await commit_offsets(source)
+        except Exception as e:
+            print(f"[WARN] Ingest checkpoint failed: {e}")
+
+
+async def main(tps=20.0, workers=2, serve_metrics=True):
+    """One node process; worker processes of the multi-process node pass serve_metrics=False."""
+    if serve_metrics:
+        serve(PROM_PORT)
+    sample_task = asyncio.create_task(sample_gauges()) if MULTIPROC_DIR else None
+
+    await ensure_index_exists()
+    if encode_service is not None:
+        encode_service.start()
+
+    pipeline = build_pipeline(workers)
+    pipeline_task = asyncio.create_task(pipeline.run())
+    train_task = asyncio.create_task(trainer.run())
+    index_task = asyncio.create_task(indexes.run(INDEX_REFRESH_S))
+
+    source = open_source(INGEST_SOURCE, INGEST_CHECKPOINT, group=BANK_ID)
+    if source is None:
+        producer_task = asyncio.create_task(tx_producer(tps))
+    else:
+        print(f"[INFO] Ingesting from {INGEST_SOURCE}")
+        producer_task = asyncio.create_task(source.run(q))
+        checkpoint_task = asyncio.create_task(checkpoint_loop(source, INGEST_CHECKPOINT_S))
+
+    # Ctrl+C / SIGTERM: stop ingest, flush the partial batch, drain every stage
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: KeyboardInterrupt still stops the loop, without draining
+
+    print(f"EFFIN node running → {BANK_ID} | audit={AUDIT_FILE} | port {PROM_PORT} | index={indexes.name}")
+    stop_task = asyncio.create_task(stop.wait())
+    await asyncio.wait({producer_task, pipeline_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+
+    print("[INFO] Shutting down — flushing pending batches…")
+    producer_task.cancel()
+    stop_task.cancel()
+    batcher.close()
+    await pipeline_task
+    if encode_service is not None:
+        encode_service.close()
+    train_task.cancel()
+    index_task.cancel()
+    await cy.close()
+    if source is not None:
+        checkpoint_task.cancel()
+        await commit_offsets(source)
+    await asyncio.to_thread(audit.close)
+    if sample_task is not None:
+        sample_task.cancel()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+# effin/node/batcher.py
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+BATCH_TARGET_SIZE = Gauge("effin_batch_target_size", "Current adaptive micro-batch size limit")
+BATCH_FLUSHES = Counter("effin_batch_flushes_total", "Micro-batch flushes by trigger", ["reason"])
+BATCH_RTT_P99 = Gauge("effin_batch_rtt_p99_seconds", "p99 CyborgDB round trip per batch (recent window)")
+
+
+class MicroBatcher:
+    """
+    Single shared batcher in front of the pipeline.
+
+    A batch is flushed on whichever comes first:
+      - `size` transactions collected ("size")
+      - `linger_ms` elapsed since the first transaction of the batch ("linger")
+      - close() was called; the partial batch is flushed ("shutdown")
+
+    With `target_p99_s` set, `size` adapts (AIMD) to the observed CyborgDB round
+    trip: when p99 round trip + linger exceeds the target the size is cut by a
+    quarter, when it is well under the target it grows by one.
+    """
+
+    def __init__(self, q: asyncio.Queue, max_size: int = 32, min_size: int = 1,
+                 linger_ms: float = 50.0, target_p99_s: Optional[float] = None, window: int = 200):
+        self.q = q
+        self.max_size = max(1, max_size)
+        self.min_size = max(1, min(min_size, self.max_size))
+        self.linger = linger_ms / 1000.0
+        self.target = target_p99_s
+        self.size = self.max_size
+        self._rtts = deque(maxlen=window)
+        self._closed = asyncio.Event()
+        BATCH_TARGET_SIZE.set(self.size)
+
+    # ----------------------------------------------
+    # Flushing
+    # ----------------------------------------------
+    async def _get(self, timeout: Optional[float]):
+        """q.get() bounded by timeout / close(); returns None instead of an item on either."""
+        try:
+            return self.q.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        if self._closed.is_set() or (timeout is not None and timeout <= 0):
+            return None
+
+        getter = asyncio.ensure_future(self.q.get())
+        closer = asyncio.ensure_future(self._closed.wait())
+        try:
+            await asyncio.wait({getter, closer}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            getter.cancel()
+            raise
+        finally:
+            closer.cancel()
+        # Queue.get only removes the item after it resumes, so a pending getter
+        # can be cancelled without losing anything.
+        if getter.done():
+            return getter.result()
+        getter.cancel()
+        return None
+
+    async def next_batch(self) -> Optional[List[Dict]]:
+        """Next batch of transactions, or None once closed and drained."""
+        first = await self._get(None)
+        if first is None:
+            return None
+        self.q.task_done()
+
+        txs = [first]
+        deadline = time.monotonic() + self.linger
+        while len(txs) < self.size:
+            tx = await self._get(deadline - time.monotonic())
+            if tx is None:
+                break
+            self.q.task_done()
+            txs.append(tx)
+
+        if len(txs) >= self.size:
+            reason = "size"
+        elif self._closed.is_set():
+            reason = "shutdown"
+        else:
+            reason = "linger"
+        BATCH_FLUSHES.labels(reason=reason).inc()
+        return txs
+
+    def close(self):
+        """Stop waiting for new transactions; whatever is queued is still flushed."""
+        self._closed.set()
+
+    # ----------------------------------------------
+    # Adaptive sizing
+    # ----------------------------------------------
+    def observe_round_trip(self, seconds: float):
+        """Feed the CyborgDB round-trip time of one flushed batch."""
+        self._rtts.append(seconds)
+        if not self.target or len(self._rtts) < 10:
+            return
+
+        p99 = float(np.percentile(self._rtts, 99))
+        BATCH_RTT_P99.set(p99)
+        budget = self.target - self.linger
+
+        size = self.size
+        if p99 > budget:
+            size = max(self.min_size, int(size * 0.75))
+        elif p99 < 0.5 * budget:
+            size = min(self.max_size, size + 1)
+
+        if size != self.size:
+            # judge the new size on fresh samples only
+            self.size = size
+            self._rtts.clear()
+            BATCH_TARGET_SIZE.set(size)
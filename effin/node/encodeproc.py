@@ -0,0 +1,155 @@
+# effin/node/encodeproc.py
+"""
+FraudEncoder in separate processes, fed through a shared-memory ring.
+
+The node writes a batch's encoder inputs into a free ShmRing slot and sends
+the slot index down a pipe. An encoder process embeds the slot in place
+(embed_batch(..., out=<slot vectors>)), fills in tx_ref hashes and sends
+the index back. The node then reads the (N, 32) matrix where it lies, with
+nothing pickled either way, and frees the slot once the batch is audited.
+"""
+import asyncio
+import multiprocessing as mp
+import signal
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter
+
+from effin.common.shmring import ShmRing
+
+ENCODE_INLINE = Counter("effin_encode_inline_total", "Batches encoded in-process instead of by an encoder process", ["reason"])
+
+
+def _encode_worker(conn, ring_name: str):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # the node stops us once its pipeline drained
+    from effin.common.crypto import hash_id_hex
+    from effin.encoder.model import FraudEncoder
+
+    ring = ShmRing.attach(ring_name)
+    encoder = FraudEncoder.from_env()
+    try:
+        while True:
+            try:
+                i = conn.recv()
+            except EOFError:
+                return
+            if i is None:
+                return
+            try:
+                encoder.embed_batch(ring.columns(i), out=ring.vectors(i))
+                ring.meta(i)["tx_ref"] = [hash_id_hex(t).encode() for t in ring.strings(i, "tx_id")]
+                conn.send((i, None))
+            except Exception as e:
+                conn.send((i, f"{type(e).__name__}: {e}"))
+    finally:
+        ring.close()
+
+
+class EncodeService:
+    """
+    `processes` encoder processes sharing one ShmRing of `slots` slots of
+    up to `rows` txs. encode() waits for a free slot, so at most `slots`
+    batches hold encoded vectors at a time (backpressure on the encode stage).
+    """
+
+    def __init__(self, processes: int, rows: int, slots: int = 64, bank_id: str = "bank1",
+                 arena_per_row: int = 256):
+        self.processes = processes
+        self.bank_id = bank_id
+        self.ring = ShmRing.create(slots, rows, dim=32, arena_per_row=arena_per_row, banks=[bank_id])
+        self.free: asyncio.Queue = asyncio.Queue()
+        for i in range(slots):
+            self.free.put_nowait(i)
+        self.procs: List = []
+        self.conns: List = []
+        self.pending: List[deque] = []
+        self.alive: List[bool] = []
+
+    def start(self):
+        ctx = mp.get_context("spawn")
+        loop = asyncio.get_running_loop()
+        for k in range(self.processes):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_encode_worker, args=(child, self.ring.name), name=f"effin-encode{k}", daemon=True)
+            proc.start()
+            child.close()
+            self.procs.append(proc)
+            self.conns.append(parent)
+            self.pending.append(deque())
+            self.alive.append(True)
+            loop.add_reader(parent.fileno(), self._on_reply, k)
+        print(f"[INFO] {self.processes} encoder processes, ring '{self.ring.name}' "
+              f"({self.ring.slots} slots × {self.ring.rows} rows, {self.ring.shm.size / 1e6:.1f} MB)")
+
+    def _fail(self, k: int, reason: str):
+        if self.alive[k]:
+            self.alive[k] = False
+            asyncio.get_running_loop().remove_reader(self.conns[k].fileno())
+            print(f"[ERROR] Encoder process {k} {reason}")
+        while self.pending[k]:
+            fut = self.pending[k].popleft()
+            if not fut.done():
+                fut.set_exception(RuntimeError(f"encoder process {k} {reason}"))
+
+    def _on_reply(self, k: int):
+        try:
+            i, err = self.conns[k].recv()
+        except (EOFError, OSError):
+            self._fail(k, f"exited (code {self.procs[k].exitcode})")
+            return
+        fut = self.pending[k].popleft()
+        if fut.done():
+            self.release(i)         # caller went away (cancelled)
+        elif err:
+            fut.set_exception(RuntimeError(err))
+        else:
+            fut.set_result(i)
+
+    async def encode(self, txs: List[dict]) -> Optional[Tuple[int, np.ndarray, List[str]]]:
+        """
+        (slot, vectors, tx_refs) with `vectors` a view into the slot, or None
+        when the batch should be encoded in-process (it does not fit a slot,
+        or no encoder process is left). The caller release()s the slot.
+        """
+        ready = [k for k in range(len(self.conns)) if self.alive[k]]
+        if not ready:
+            ENCODE_INLINE.labels(reason="no_process").inc()
+            return None
+        i = await self.free.get()
+        if not self.ring.write_txs(i, txs, self.bank_id):
+            self.release(i)
+            ENCODE_INLINE.labels(reason="too_large").inc()
+            return None
+
+        k = min(ready, key=lambda k: len(self.pending[k]))
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self.pending[k].append(fut)
+            self.conns[k].send(i)
+            await fut
+        except (OSError, RuntimeError):
+            self._fail(k, "is unreachable")
+            self.release(i)
+            raise
+        meta = self.ring.meta(i)
+        return i, self.ring.vectors(i), [r.decode() for r in meta["tx_ref"].tolist()]
+
+    def release(self, i: int):
+        self.free.put_nowait(i)
+
+    def close(self, timeout: float = 5.0):
+        loop = asyncio.get_running_loop()
+        for k, conn in enumerate(self.conns):
+            if self.alive[k]:
+                loop.remove_reader(conn.fileno())
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+        for proc in self.procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.kill()
+        self.ring.close()
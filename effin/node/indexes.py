@@ -0,0 +1,162 @@
+# effin/node/indexes.py
+import asyncio
+import re
+from typing import Dict, List, Optional
+
+from prometheus_client import Gauge
+
+INDEX_VERSION_GAUGE = Gauge("effin_index_version", "Index version this node queries (0 = unversioned)")
+INDEX_SHADOW_GAUGE = Gauge("effin_index_shadow_version", "Newer index version being dual-written (0 = none)")
+
+
+class IndexMismatch(RuntimeError):
+    """An existing index does not match the configured dimension / type."""
+
+
+class IndexManager:
+    """
+    Shared-index lifecycle for a bank node.
+
+    `alias` is the logical index name. Versions are separate physical
+    indexes named `<alias>__v<N>`; version "" is the unversioned legacy
+    index (the alias itself) and "latest" follows the highest version.
+
+    Startup (`open`):
+      - "keep" (default): reuse the index if it exists, after checking its
+        dimension and type against `config`; create it only if missing.
+      - "recreate": drop and create it (development only — it wipes every
+        bank's vectors).
+
+    Alias swap (version "latest"): refresh() spots a newer `<alias>__v<N>`
+    (created with effin.tools.index_admin) and starts dual-writing to it
+    (`shadow`) while queries stay on the current index. Dual-writes only
+    carry new vectors; every bank copies its earlier ones over with
+    `index_admin backfill`. Queries move once the new version covers the
+    current one (at least as many vectors, and at least `swap_min_vectors`),
+    so no bank's history drops out of neighbour search at the swap. Every
+    node does the same on its own, so the network converges on the new
+    version without a coordinated restart; the old version is dropped with
+    index_admin.
+    """
+
+    def __init__(self, cy, alias: str, dimension: int = 32, index_type: str = "ivfflat",
+                 version: str = "", swap_min_vectors: int = 0):
+        self.cy = cy
+        self.alias = alias
+        self.config = {"type": index_type, "dimension": dimension}
+        self.version = version
+        self.swap_min_vectors = swap_min_vectors
+        self.name = alias if version in ("", "latest") else self.physical(int(version))
+        self.shadow: Optional[str] = None
+
+    # ----------------------------------------------
+    # Naming
+    # ----------------------------------------------
+    def physical(self, version: Optional[int]) -> str:
+        return self.alias if not version else f"{self.alias}__v{version}"
+
+    def version_of(self, name: str) -> Optional[int]:
+        if name == self.alias:
+            return 0
+        m = re.fullmatch(re.escape(self.alias) + r"__v(\d+)", name)
+        return int(m.group(1)) if m else None
+
+    async def versions(self) -> Dict[int, str]:
+        """version → physical name of every existing version (0 = unversioned)."""
+        found = {}
+        for name in await self.cy.list_indexes():
+            v = self.version_of(name)
+            if v is not None:
+                found[v] = name
+        return dict(sorted(found.items()))
+
+    def _set(self, name: str, shadow: Optional[str] = None):
+        self.name, self.shadow = name, shadow
+        INDEX_VERSION_GAUGE.set(self.version_of(name) or 0)
+        INDEX_SHADOW_GAUGE.set((self.version_of(shadow) or 0) if shadow else 0)
+
+    # ----------------------------------------------
+    # Startup
+    # ----------------------------------------------
+    def mismatches(self, described: Optional[dict]) -> List[str]:
+        """Config keys where an existing index differs from ours."""
+        config = (described or {}).get("index_config") or {}
+        return [f"{k}={config[k]!r} (expected {v!r})" for k, v in self.config.items()
+                if k in config and str(config[k]).lower() != str(v).lower()]
+
+    async def check(self, name: str):
+        try:
+            described = await self.cy.describe_index(name)
+        except Exception as e:
+            print(f"[WARN] Could not describe index '{name}' — config not verified: {e}")
+            return
+        bad = self.mismatches(described)
+        if bad:
+            raise IndexMismatch(
+                f"index '{name}' does not match this node: {', '.join(bad)}. "
+                f"Create a new version (python -m effin.tools.index_admin create) or start with INDEX_STARTUP_MODE=recreate."
+            )
+
+    async def open(self, mode: str = "keep") -> str:
+        """Resolve, create or verify the index this node uses; returns its physical name."""
+        if self.version == "latest":
+            try:
+                existing = await self.versions()
+            except Exception as e:
+                print(f"[WARN] Could not list indexes — using '{self.alias}': {e}")
+                existing = {}
+            name = existing[max(existing)] if existing else self.alias
+        else:
+            name = self.name
+
+        if mode == "recreate":
+            if await self.cy.delete_index(name):
+                print(f"[INFO] Deleted existing index '{name}'")
+            await self.cy.create_index(name, self.config["dimension"], dict(self.config))
+        elif mode == "keep":
+            await self.cy.ensure_index_exists(name, self.config["dimension"])
+            await self.check(name)
+        else:
+            raise ValueError(f"unknown index startup mode {mode!r} (keep | recreate)")
+        self._set(name)
+        return name
+
+    # ----------------------------------------------
+    # Alias swap
+    # ----------------------------------------------
+    async def refresh(self):
+        """Follow "latest": dual-write to a newer version, switch queries once it covers the current one."""
+        if self.version != "latest":
+            return
+        existing = await self.versions()
+        current = self.version_of(self.name) or 0
+        newest = max(existing, default=current)
+        if newest <= current:
+            if self.shadow and self.shadow not in existing.values():
+                print(f"[WARN] Shadow index '{self.shadow}' disappeared — dual-write stopped.")
+                self._set(self.name)
+            return
+
+        target = existing[newest]
+        if target != self.shadow:
+            await self.check(target)
+            print(f"[INFO] Index '{target}' found — dual-writing until it covers '{self.name}' "
+                  f"(run index_admin backfill for every bank).")
+            self._set(self.name, target)
+
+        filled = int((await self.cy.describe_index(target) or {}).get("num_vectors") or 0)
+        needed = max(self.swap_min_vectors, int((await self.cy.describe_index(self.name) or {}).get("num_vectors") or 0))
+        if filled >= needed:
+            print(f"[SUCCESS] Index alias '{self.alias}' → '{target}' (was '{self.name}').")
+            self._set(target)
+
+    async def run(self, interval: float = 60.0):
+        """refresh() every `interval` seconds; cancel the task to stop it."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except IndexMismatch as e:
+                print(f"[ERROR] {e}")
+            except Exception as e:
+                print(f"[WARN] Index refresh failed: {e}")
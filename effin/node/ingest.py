@@ -1,10 +1,27 @@
 # effin/node/ingest.py
 import asyncio
-import uuid
-import time
+import json
+import math
+import os
 import random
+import stat
+import struct
+import sys
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
 import numpy as np
-import os
+from prometheus_client import Counter
+
+try:
+    import orjson  # optional: parses records and encodes frames several times faster than json
+except ImportError:
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+_dumps = orjson.dumps if orjson is not None else (lambda obj: json.dumps(obj).encode())
 
 # ----------------------------------------------
 # BANK ID for multi-bank simulation
@@ -120,3 +137,460 @@ async def tx_producer(q: asyncio.Queue, tps: float = 3.0):
         tx = generate_transaction()
         await q.put(tx)
         await asyncio.sleep(delay)
+
+
+# ----------------------------------------------
+# INGEST SOURCES (real transaction streams)
+#
+# Every source puts tx dicts on the node queue (await q.put → backpressure)
+# and tags each with `_ack` = (tracker, offset). The pipeline calls ack()
+# once a tx is fully processed; commit() persists the highest offset below
+# which everything was processed, so a restart resumes there (at-least-once:
+# txs in flight at a crash are scored again).
+# ----------------------------------------------
+INGEST_RECORDS = Counter("effin_ingest_records_total", "Transactions read from an ingest source", ["source"])
+INGEST_BAD = Counter("effin_ingest_bad_records_total", "Unparseable ingest records (skipped)", ["source"])
+
+FRAME_HEADER = struct.Struct(">QI")     # socket frame: seq, payload length; payload = NDJSON lines
+
+
+class OffsetTracker:
+    """
+    Offsets issued in increasing order, each covering `n` txs; `committed`
+    is the last offset whose txs (and all earlier ones) have been acked.
+    """
+
+    def __init__(self, committed=None):
+        self.committed = committed
+        self._pending = deque()          # [offset, txs not yet acked]
+        self._index: Dict = {}
+
+    def issue(self, offset, n: int = 1):
+        entry = [offset, n]
+        self._pending.append(entry)
+        self._index[offset] = entry
+        self._advance()
+
+    def ack(self, offset):
+        entry = self._index.get(offset)
+        if entry is not None:
+            entry[1] -= 1
+            self._advance()
+
+    def _advance(self):
+        while self._pending and self._pending[0][1] <= 0:
+            offset, _ = self._pending.popleft()
+            del self._index[offset]
+            self.committed = offset
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+
+def ack(txs):
+    """Mark txs processed (call after their audit events were written)."""
+    for tx in txs:
+        tag = tx.get("_ack")
+        if tag is not None:
+            tag[0].ack(tag[1])
+
+
+def _number(value, field: str) -> float:
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} is not a number: {value!r}")
+    if not math.isfinite(value):
+        raise ValueError(f"{field} is not finite: {value!r}")
+    return value
+
+
+def parse_tx(line: bytes, default_id: str) -> dict:
+    """
+    One JSON record → tx dict, with the fields later stages rely on coerced
+    to their types (numeric strings are accepted). ValueError if a record
+    cannot be: it is counted and skipped instead of failing its whole batch.
+    """
+    tx = _loads(line)
+    if not isinstance(tx, dict):
+        raise ValueError("not a JSON object")
+    tx["tx_id"] = str(tx.get("tx_id") or default_id)
+    tx["timestamp"] = _number(tx.get("timestamp", time.time()), "timestamp")
+    tx["amount"] = _number(tx.get("amount", 0.0), "amount")
+    tx["is_fraud"] = bool(tx.get("is_fraud", False))
+    for field in ("bank_id", "merchant_category", "location", "device_fingerprint"):
+        if field in tx and not isinstance(tx[field], str):
+            tx[field] = str(tx[field])
+    tx.setdefault("bank_id", BANK_ID)
+    if "feature_signature" in tx:
+        sig = tx["feature_signature"]
+        if not isinstance(sig, list) or len(sig) != 4:
+            raise ValueError(f"feature_signature is not a list of 4 numbers: {sig!r}")
+        tx["feature_signature"] = [_number(v, "feature_signature") for v in sig]
+    return tx
+
+
+def save_checkpoint(path: str, state: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: Optional[str]) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (TypeError, OSError, ValueError):
+        return {}
+
+
+class IngestSource:
+    """run(q) feeds the queue; snapshot() / commit(snap) persist progress."""
+
+    name = "source"
+
+    async def _emit(self, q: asyncio.Queue, tracker: OffsetTracker, offset, lines: List[bytes], id_base: str):
+        txs = []
+        for k, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                txs.append(parse_tx(line, f"{id_base}-{k}"))
+            except ValueError as e:
+                INGEST_BAD.labels(source=self.name).inc()
+                print(f"[WARN] {self.name}: skipping bad record at {offset}: {e}")
+        tracker.issue(offset, len(txs))
+        INGEST_RECORDS.labels(source=self.name).inc(len(txs))
+        for tx in txs:
+            tx["_ack"] = (tracker, offset)
+            try:
+                q.put_nowait(tx)
+            except asyncio.QueueFull:
+                await q.put(tx)
+
+    async def run(self, q: asyncio.Queue):
+        raise NotImplementedError
+
+    def snapshot(self):
+        return None
+
+    def commit(self, snap):
+        pass
+
+
+class FileTailSource(IngestSource):
+    """
+    Newline-delimited JSON file, read in `chunk`-byte blocks from the
+    checkpointed byte offset. With follow=True it keeps tailing (and
+    restarts from 0 if the file is truncated or replaced).
+    """
+
+    name = "file"
+
+    def __init__(self, path: str, checkpoint: Optional[str] = None, follow: bool = True,
+                 chunk: int = 1 << 16, poll: float = 0.2, start: Optional[int] = None):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.follow = follow
+        self.chunk = chunk
+        self.poll = poll
+        state = load_checkpoint(checkpoint)
+        if start is None:
+            start = state.get("offset", 0) if state.get("path") == os.path.abspath(path) else 0
+        self.tracker = OffsetTracker(start)
+        self._inode = state.get("inode")
+
+    async def run(self, q: asyncio.Queue):
+        f, pos = None, self.tracker.committed
+        buf = b""
+        try:
+            while True:
+                if f is None:
+                    try:
+                        f = open(self.path, "rb")
+                    except FileNotFoundError:
+                        if not self.follow:
+                            return
+                        await asyncio.sleep(self.poll)
+                        continue
+                    st = os.fstat(f.fileno())
+                    if st.st_size < pos or (self._inode is not None and st.st_ino != self._inode):
+                        print(f"[WARN] {self.path} was truncated or replaced — reading from the start.")
+                        pos = 0
+                    self._inode = st.st_ino
+                    f.seek(pos)
+                    buf = b""
+
+                data = f.read(self.chunk)
+                if not data:
+                    if not self.follow:
+                        return
+                    st = os.stat(self.path) if os.path.exists(self.path) else None
+                    if st is None or st.st_ino != self._inode or st.st_size < pos + len(buf):
+                        f.close()
+                        f, pos, self._inode = None, 0, None
+                    await asyncio.sleep(self.poll)
+                    continue
+
+                lines = (buf + data).split(b"\n")
+                buf = lines.pop()
+                if lines:
+                    pos += sum(len(line) + 1 for line in lines)
+                    await self._emit(q, self.tracker, pos, lines, f"{os.path.basename(self.path)}-{pos}")
+        finally:
+            if f is not None:
+                f.close()
+
+    def snapshot(self):
+        return self.tracker.committed
+
+    def commit(self, snap):
+        if self.checkpoint and snap is not None:
+            save_checkpoint(self.checkpoint, {"path": os.path.abspath(self.path), "inode": self._inode, "offset": snap})
+
+
+class StdinSource(IngestSource):
+    """NDJSON on stdin (not seekable: progress is tracked but a restart cannot resume)."""
+
+    name = "stdin"
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin.buffer
+        self.tracker = OffsetTracker(0)
+
+    async def _open(self):
+        """(read, readline) coroutines: a pipe transport when stdin is a pipe, socket
+        or tty, else (a redirected regular file) blocking reads in a thread."""
+        try:
+            mode = os.fstat(self.stream.fileno()).st_mode
+        except (AttributeError, OSError, ValueError):
+            mode = 0
+        if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode):
+            reader = asyncio.StreamReader(limit=1 << 20)
+            loop = asyncio.get_running_loop()
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), self.stream)
+            return reader.read, reader.readline
+        read = lambda n: asyncio.to_thread(self.stream.read, n)
+        readline = lambda: asyncio.to_thread(self.stream.readline)
+        return read, readline
+
+    async def run(self, q: asyncio.Queue):
+        read, readline = await self._open()
+        pos = 0
+        while True:
+            data = await read(1 << 16)
+            if not data:
+                return
+            data += await readline() if not data.endswith(b"\n") else b""
+            lines = data.split(b"\n")
+            pos += len(data)
+            await self._emit(q, self.tracker, pos, lines, f"stdin-{pos}")
+
+
+class SocketSource(IngestSource):
+    """
+    TCP ("host:port") or Unix-domain (path) listener for batched frames:
+    FRAME_HEADER (seq, length) + NDJSON payload. Each connection gets
+    "ACK <seq>\n" once every frame up to seq is processed and audited;
+    senders resend unacked frames after a reconnect (see FrameSender).
+    """
+
+    name = "socket"
+
+    def __init__(self, address: str):
+        self.address = address
+        self._conns: Dict[asyncio.StreamWriter, Tuple[OffsetTracker, list]] = {}
+        self.server = None
+
+    async def start(self, q: asyncio.Queue):
+        handler = lambda r, w: self._serve(q, r, w)
+        if ":" in self.address and not self.address.startswith("/"):
+            host, port = self.address.rsplit(":", 1)
+            self.server = await asyncio.start_server(handler, host, int(port))
+        else:
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            self.server = await asyncio.start_unix_server(handler, self.address)
+        return self.server
+
+    async def run(self, q: asyncio.Queue):
+        server = self.server or await self.start(q)
+        async with server:
+            await server.serve_forever()
+
+    async def _serve(self, q: asyncio.Queue, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        tracker = OffsetTracker()
+        self._conns[writer] = (tracker, [None])
+        try:
+            while True:
+                try:
+                    seq, length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                    payload = await reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.CancelledError:
+                    return      # node shutting down (the stream callback chokes on a cancelled handler)
+                await self._emit(q, tracker, seq, payload.split(b"\n"), f"frame-{seq}")
+        finally:
+            self._conns.pop(writer, None)
+            writer.close()
+
+    def snapshot(self):
+        return {w: t.committed for w, (t, _) in self._conns.items()}
+
+    def commit(self, snap):
+        for writer, seq in snap.items():
+            conn = self._conns.get(writer)
+            if conn is None or seq is None or conn[1][0] == seq:
+                continue
+            conn[1][0] = seq
+            writer.write(b"ACK %d\n" % seq)
+
+
+class FrameSender:
+    """
+    Client side of SocketSource: keeps frames until acked and resends them
+    after reconnecting; on_ack(seq) is called once per acked frame.
+    """
+
+    def __init__(self, address: str, on_ack=None):
+        self.address = address
+        self.on_ack = on_ack
+        self.seq = 0
+        self.unacked: "Dict[int, bytes]" = {}
+        self.acked = 0
+        self._writer = None
+        self._reader_task = None
+        self._acked_event = asyncio.Event()
+
+    async def connect(self):
+        if ":" in self.address and not self.address.startswith("/"):
+            host, port = self.address.rsplit(":", 1)
+            reader, self._writer = await asyncio.open_connection(host, int(port))
+        else:
+            reader, self._writer = await asyncio.open_unix_connection(self.address)
+        self._reader_task = asyncio.create_task(self._read_acks(reader))
+        for seq, frame in sorted(self.unacked.items()):
+            self._writer.write(frame)
+        await self._writer.drain()
+
+    async def _read_acks(self, reader: asyncio.StreamReader):
+        async for line in reader:
+            if line.startswith(b"ACK "):
+                self.acked = max(self.acked, int(line[4:]))
+                for seq in [s for s in self.unacked if s <= self.acked]:
+                    del self.unacked[seq]
+                    if self.on_ack is not None:
+                        self.on_ack(seq)
+                self._acked_event.set()
+
+    async def send(self, txs: List[dict]):
+        self.seq += 1
+        payload = b"\n".join(map(_dumps, txs))
+        frame = FRAME_HEADER.pack(self.seq, len(payload)) + payload
+        self.unacked[self.seq] = frame
+        self._writer.write(frame)
+        await self._writer.drain()
+        return self.seq
+
+    async def wait_acked(self, seq: Optional[int] = None, timeout: float = 10.0):
+        seq = self.seq if seq is None else seq
+        deadline = time.monotonic() + timeout
+        while self.acked < seq:
+            self._acked_event.clear()
+            await asyncio.wait_for(self._acked_event.wait(), max(0.0, deadline - time.monotonic()))
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+
+class LocalBroker:
+    """
+    Kafka-shaped stand-in on the local filesystem: a topic is a directory of
+    partition logs (<p>.log, NDJSON) and each consumer group stores its
+    committed byte offsets in <group>.offsets next to them.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _topic(self, topic: str) -> str:
+        path = os.path.join(self.root, topic)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def partitions(self, topic: str) -> List[int]:
+        return sorted(int(f[:-4]) for f in os.listdir(self._topic(topic)) if f.endswith(".log") and f[:-4].isdigit())
+
+    def log_path(self, topic: str, partition: int) -> str:
+        return os.path.join(self._topic(topic), f"{partition}.log")
+
+    def produce(self, topic: str, records: List[dict], partition: int = 0):
+        data = b"".join(json.dumps(r).encode() + b"\n" for r in records)
+        with open(self.log_path(topic, partition), "ab") as f:
+            f.write(data)
+
+    def committed(self, topic: str, group: str) -> Dict[int, int]:
+        return {int(p): off for p, off in load_checkpoint(os.path.join(self._topic(topic), f"{group}.offsets")).items()}
+
+    def commit(self, topic: str, group: str, offsets: Dict[int, int]):
+        save_checkpoint(os.path.join(self._topic(topic), f"{group}.offsets"), {str(p): o for p, o in offsets.items()})
+
+
+class BrokerSource(IngestSource):
+    """Consumes every partition of a LocalBroker topic as consumer group `group`."""
+
+    name = "broker"
+
+    def __init__(self, broker: LocalBroker, topic: str, group: str, poll: float = 0.2):
+        self.broker = broker
+        self.topic = topic
+        self.group = group
+        offsets = broker.committed(topic, group)
+        self.parts = {
+            p: FileTailSource(broker.log_path(topic, p), start=offsets.get(p, 0), poll=poll)
+            for p in broker.partitions(topic) or [0]
+        }
+        for src in self.parts.values():
+            src.name = self.name
+
+    async def run(self, q: asyncio.Queue):
+        await asyncio.gather(*(src.run(q) for src in self.parts.values()))
+
+    def snapshot(self):
+        return {p: src.tracker.committed for p, src in self.parts.items()}
+
+    def commit(self, snap):
+        self.broker.commit(self.topic, self.group, snap)
+
+
+def open_source(spec: str, checkpoint: Optional[str] = None, group: str = BANK_ID) -> Optional[IngestSource]:
+    """
+    INGEST_SOURCE → source; None for the built-in synthetic generator.
+      -  | stdin                 NDJSON on stdin
+      file:<path>                NDJSON file, tailed (offset in `checkpoint`)
+      tcp:<host>:<port> | unix:<path>   FrameSender frames
+      broker:<dir>/<topic>       LocalBroker topic, consumer group `group`
+    """
+    if not spec or spec == "synthetic":
+        return None
+    if spec in ("-", "stdin"):
+        return StdinSource()
+    kind, _, rest = spec.partition(":")
+    if kind == "file":
+        return FileTailSource(rest, checkpoint)
+    if kind in ("tcp", "unix"):
+        return SocketSource(rest)
+    if kind == "broker":
+        root, topic = os.path.split(rest.rstrip("/"))
+        return BrokerSource(LocalBroker(root), topic, group)
+    raise ValueError(f"unknown INGEST_SOURCE {spec!r}")
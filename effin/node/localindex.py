@@ -0,0 +1,165 @@
+# effin/node/localindex.py
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+LOCAL_LOOKUPS = Counter("effin_local_index_lookups_total", "Queries pre-screened against the local index")
+LOCAL_HITS = Counter("effin_local_index_hits_total", "Queries that raised an alert from the local index alone")
+LOCAL_DEGRADED = Counter("effin_local_index_degraded_alerts_total", "Alerts served locally while CyborgDB was unavailable")
+LOCAL_SIZE = Gauge("effin_local_index_vectors", "Vectors held in the local index")
+LOCAL_SAVED = Histogram(
+    "effin_local_index_latency_saved_seconds", "Local alert decision → remote result arrival",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+
+class LocalIndex:
+    """
+    Memory-bounded brute-force vector index over a ring buffer.
+
+    Holds at most `capacity` vectors of `dim` floats; the oldest slot is
+    overwritten first. Ids are unique: re-adding a known id refreshes its slot.
+    Distances use the same squared-L2 convention as the remote index unless
+    metric="cosine" (1 - dot, for normalized vectors).
+    """
+
+    def __init__(self, dim: int = 32, capacity: int = 16384, metric: str = "l2sq"):
+        self.dim = dim
+        self.capacity = capacity
+        self.metric = metric
+        self.vecs = np.zeros((capacity, dim), dtype=np.float32)
+        self.sqnorms = np.zeros(capacity, dtype=np.float32)
+        self.meta: List[Optional[Dict]] = [None] * capacity
+        self.ids: List[Optional[str]] = [None] * capacity
+        self.slots: Dict[str, int] = {}
+        self.head = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, id_: str):
+        return id_ in self.slots
+
+    # ----------------------------------------------
+    # Insert (ring-buffer eviction)
+    # ----------------------------------------------
+    def add(self, id_: str, vector: np.ndarray, metadata: Dict) -> int:
+        slot = self.slots.get(id_)
+        if slot is None:
+            slot = self.head
+            old = self.ids[slot]
+            if old is not None:
+                del self.slots[old]
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            self.slots[id_] = slot
+            self.ids[slot] = id_
+
+        self.vecs[slot] = vector
+        self.sqnorms[slot] = float(np.dot(self.vecs[slot], self.vecs[slot]))
+        self.meta[slot] = metadata
+        self._on_insert(slot)
+        LOCAL_SIZE.set(self.size)
+        return slot
+
+    def _on_insert(self, slot: int):
+        pass
+
+    # ----------------------------------------------
+    # Search
+    # ----------------------------------------------
+    def _candidates(self, queries: np.ndarray) -> Optional[np.ndarray]:
+        """Slots to scan per query batch (None = all occupied slots)."""
+        return None
+
+    def search(self, queries: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (distances, slots), each (N, k) sorted by distance, k <= top_k.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        n = len(queries)
+        k = min(top_k, self.size)
+        if k == 0:
+            return np.full((n, 0), np.inf, dtype=np.float32), np.full((n, 0), -1)
+
+        cand = self._candidates(queries)
+        rows = np.arange(self.size) if cand is None else cand
+        if len(rows) == 0:
+            return np.full((n, 0), np.inf, dtype=np.float32), np.full((n, 0), -1)
+        k = min(k, len(rows))
+
+        dots = queries @ self.vecs[rows].T
+        if self.metric == "cosine":
+            d = 1.0 - dots
+        else:
+            d = (queries * queries).sum(1)[:, None] + self.sqnorms[rows][None, :] - 2.0 * dots
+            np.maximum(d, 0.0, out=d)
+
+        part = np.argpartition(d, k - 1, axis=1)[:, :k]
+        part_d = np.take_along_axis(d, part, 1)
+        order = np.argsort(part_d, axis=1)
+        return np.take_along_axis(part_d, order, 1), rows[np.take_along_axis(part, order, 1)]
+
+    def neighbors(self, queries: np.ndarray, top_k: int = 5, max_distance: float = np.inf) -> List[List[Dict]]:
+        """search() shaped like CyborgDB results: [[{"id", "distance", "metadata"}, ...], ...]."""
+        dists, slots = self.search(queries, top_k)
+        return [
+            [{"id": self.ids[s], "distance": float(dd), "metadata": self.meta[s]}
+             for dd, s in zip(drow, srow) if s >= 0 and dd <= max_distance]
+            for drow, srow in zip(dists, slots)
+        ]
+
+
+class IVFLocalIndex(LocalIndex):
+    """
+    LocalIndex with an inverted-file coarse quantizer: `nlist` k-means
+    centroids; a query batch scans only the slots in the union of its
+    queries' `nprobe` nearest lists.
+    Centroids are (re)trained every `retrain_every` inserts; until the first
+    training it behaves like the brute-force index.
+    """
+
+    def __init__(self, dim: int = 32, capacity: int = 16384, metric: str = "l2sq",
+                 nlist: int = 64, nprobe: int = 4, retrain_every: int = 4096, seed: int = 0):
+        super().__init__(dim, capacity, metric)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.retrain_every = retrain_every
+        self.assign = np.full(capacity, -1, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self._since_train = 0
+        self._rng = np.random.default_rng(seed)
+
+    def _centroid_distances(self, x: np.ndarray) -> np.ndarray:
+        d = (x * x).sum(1)[:, None] + (self.centroids ** 2).sum(1)[None, :] - 2.0 * x @ self.centroids.T
+        return d
+
+    def train(self, iters: int = 8):
+        data = self.vecs[:self.size]
+        if self.size < self.nlist * 4:
+            return
+        self.centroids = data[self._rng.choice(self.size, self.nlist, replace=False)].copy()
+        for _ in range(iters):
+            labels = np.argmin(self._centroid_distances(data), axis=1)
+            for c in range(self.nlist):
+                members = data[labels == c]
+                if len(members):
+                    self.centroids[c] = members.mean(0)
+        self.assign[:self.size] = np.argmin(self._centroid_distances(data), axis=1)
+        self._since_train = 0
+
+    def _on_insert(self, slot: int):
+        self._since_train += 1
+        if self.centroids is None or self._since_train >= self.retrain_every:
+            self.train()
+        else:
+            self.assign[slot] = int(np.argmin(self._centroid_distances(self.vecs[slot:slot + 1])[0]))
+
+    def _candidates(self, queries: np.ndarray) -> Optional[np.ndarray]:
+        if self.centroids is None:
+            return None
+        probe = np.argsort(self._centroid_distances(queries), axis=1)[:, :self.nprobe]
+        lists = np.unique(probe)
+        return np.flatnonzero(np.isin(self.assign[:self.size], lists))
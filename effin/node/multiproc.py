@@ -0,0 +1,342 @@
+# effin/node/multiproc.py
+"""
+Multi-process node: NODE_PROCESSES=4 python -m effin.node
+
+A front process reads the ingest source (INGEST_SOURCE, or synthetic traffic)
+and routes each transaction by crc32(tx_id) to one of N worker processes.
+Every worker is a complete node (app.main): its own encoder, crypto,
+CyborgWrapper pool, pipeline and audit ledger (audit_<bank>.w<i>.*), fed
+over a Unix socket with SocketSource frames. Workers ack frames once they
+are audited, and the front commits the source offset behind those acks, so
+checkpointing stays at-least-once across processes.
+
+Worker acks are cumulative, so frames behind a slow one stay unacked while
+the worker still holds them; they are never dead-lettered as such. When a
+worker's oldest frame is unacked after FRONT_FRAME_TIMEOUT_S the worker is
+restarted and its unacked frames resent. Only a frame that stalled
+FRONT_FRAME_STRIKES workers in a row is appended to FRONT_DEAD_LETTER
+(NDJSON, can be fed back with INGEST_SOURCE=file:...), while its worker is
+down, so no process still holds it; its source offsets are then released.
+
+Metrics of every process go through prometheus_client's multiprocess mode
+(PROMETHEUS_MULTIPROC_DIR, set up by __main__) and are served by the front
+on PROM_PORT. Only worker 0 trains the index.
+"""
+import asyncio
+import multiprocessing as mp
+import os
+import signal
+import tempfile
+import time
+import zlib
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from effin.common.metrics import gauge_function, sample_gauges, serve
+from effin.node.ingest import BANK_ID, FRAME_HEADER, FrameSender, open_source
+from effin.node.loadgen import TxGenerator, generate_into, replay_into, parse_speed
+
+PROM_PORT = int(os.getenv("PROM_PORT", "8001"))
+AUDIT_FILE = os.getenv("AUDIT_FILE", f"audit_{BANK_ID}.jsonl")
+INGEST_SOURCE = os.getenv("INGEST_SOURCE", "")
+INGEST_CHECKPOINT = os.getenv("INGEST_CHECKPOINT", f"ingest_{BANK_ID}.offset")
+INGEST_CHECKPOINT_S = float(os.getenv("INGEST_CHECKPOINT_S", "1.0"))
+TRAFFIC_BLOCK = int(os.getenv("TRAFFIC_BLOCK", "256"))
+TRAFFIC_SEED = os.getenv("TRAFFIC_SEED", "")
+TRAFFIC_REPLAY = os.getenv("TRAFFIC_REPLAY", "")
+TRAFFIC_SPEED = parse_speed(os.getenv("TRAFFIC_SPEED", "1"))
+
+# Transactions routed per round, and frames a worker may hold unacked before the front waits
+FRONT_BLOCK = int(os.getenv("FRONT_BLOCK", "512"))
+FRONT_MAX_FRAMES = int(os.getenv("FRONT_MAX_FRAMES", "256"))
+# How often workers ack (flush their audit ledger and commit); bounds frames held unacked
+WORKER_ACK_S = os.getenv("WORKER_ACK_S", "0.2")
+# A worker whose oldest frame is unacked this long is restarted (0 = never); a frame that
+# stalls FRONT_FRAME_STRIKES workers in a row goes to FRONT_DEAD_LETTER instead of a new one
+FRONT_FRAME_TIMEOUT_S = float(os.getenv("FRONT_FRAME_TIMEOUT_S", "120"))
+FRONT_FRAME_STRIKES = int(os.getenv("FRONT_FRAME_STRIKES", "2"))
+FRONT_DEAD_LETTER = os.getenv("FRONT_DEAD_LETTER", f"deadletter_{BANK_ID}.ndjson")
+NODE_SOCKET_DIR = os.getenv("NODE_SOCKET_DIR", tempfile.gettempdir())
+WORKER_START_TIMEOUT_S = float(os.getenv("WORKER_START_TIMEOUT_S", "120"))
+
+FRONT_ROUTED = Counter("effin_front_routed_total", "Transactions routed to a worker process", ["worker"])
+FRONT_UNACKED = Gauge("effin_front_unacked_frames", "Frames sent to a worker and not acked yet", ["worker"],
+                      multiprocess_mode="mostrecent")
+FRONT_DEAD_FRAMES = Counter("effin_front_dead_letter_frames_total", "Frames dead-lettered after stalling FRONT_FRAME_STRIKES workers", ["worker"])
+FRONT_STUCK = Counter("effin_front_stuck_workers_total", "Workers whose oldest frame was unacked after FRONT_FRAME_TIMEOUT_S", ["worker"])
+WORKER_RESTARTS = Counter("effin_worker_restarts_total", "Worker processes restarted after exiting", ["worker"])
+
+
+def partition(txs: List[dict], n: int) -> List[List[dict]]:
+    """txs → n lists by crc32(tx_id): the same tx always lands on the same worker."""
+    parts = [[] for _ in range(n)]
+    for tx in txs:
+        parts[zlib.crc32(str(tx["tx_id"]).encode()) % n].append(tx)
+    return parts
+
+
+def worker_env(i: int, socket_path: str) -> Dict[str, str]:
+    """Environment overrides of worker `i`."""
+    root, ext = os.path.splitext(AUDIT_FILE)
+    env = {"NODE_WORKER": str(i), "INGEST_SOURCE": f"unix:{socket_path}", "INGEST_CHECKPOINT_S": WORKER_ACK_S,
+           "AUDIT_FILE": f"{root}.w{i}{ext}"}
+    if i:
+        # one trainer per node, not per process
+        env.update(TRAIN_AFTER="0", TRAIN_EVERY_S="0", TRAIN_MIN_RECALL="0")
+    return env
+
+
+def _worker(env: Dict[str, str]):
+    os.environ.update(env)
+    from effin.node import app          # after the overrides: app reads its config at import
+    asyncio.run(app.main(workers=int(os.getenv("WORKERS", "2")), serve_metrics=False))
+
+
+# ----------------------------------------------
+# Routing
+# ----------------------------------------------
+class Router:
+    """
+    One FrameSender per worker. Frames are partitions of a routed block; the
+    source ack tags of a frame's txs are kept until the worker acks it.
+
+    A worker whose oldest unacked frame is older than `frame_timeout` is
+    reported to `on_stuck(i)` (the front restarts it). Acks are cumulative,
+    so only that head frame is suspect: worker_lost(i), called while the
+    worker is down, dead-letters it once it has stalled `strikes` workers;
+    everything else is resent to the next worker.
+    """
+
+    def __init__(self, addresses: List[str], max_frames: int = FRONT_MAX_FRAMES,
+                 frame_timeout: float = FRONT_FRAME_TIMEOUT_S, dead_letter: str = FRONT_DEAD_LETTER,
+                 strikes: int = FRONT_FRAME_STRIKES, on_stuck: Optional[Callable[[int], None]] = None):
+        self.senders = [FrameSender(a, on_ack=partial(self._acked, i)) for i, a in enumerate(addresses)]
+        self.inflight: List[Dict[int, tuple]] = [{} for _ in addresses]      # seq → (sent at, ack tags)
+        self.stalls: List[Tuple[int, int]] = [(0, 0) for _ in addresses]      # (head seq, workers it stalled)
+        self.max_frames = max_frames
+        self.frame_timeout = frame_timeout
+        self.dead_letter = dead_letter
+        self.strikes = max(1, strikes)
+        self.on_stuck = on_stuck
+        for i, sender in enumerate(self.senders):
+            gauge_function(FRONT_UNACKED.labels(worker=str(i)), lambda s=sender: len(s.unacked))
+
+    def _acked(self, i: int, seq: int):
+        _, tags = self.inflight[i].pop(seq, (None, ()))
+        for tag in tags:
+            if tag is not None:
+                tag[0].ack(tag[1])
+
+    def check_stuck(self, i: int):
+        """Count a stall and call on_stuck(i) when worker i's oldest frame is past frame_timeout."""
+        sender, inflight = self.senders[i], self.inflight[i]
+        if not self.frame_timeout or not sender.unacked:
+            return
+        head = min(sender.unacked)
+        now = time.monotonic()
+        if head not in inflight or now - inflight[head][0] < self.frame_timeout:
+            return
+        seq, count = self.stalls[i]
+        self.stalls[i] = (head, count + 1 if seq == head else 1)
+        for s in sender.unacked:        # the clock restarts: they are resent to the next worker
+            if s in inflight:
+                inflight[s] = (now, inflight[s][1])
+        FRONT_STUCK.labels(worker=str(i)).inc()
+        print(f"[WARN] Worker {i} has not acked frame {head} in {self.frame_timeout:g}s "
+              f"({len(sender.unacked)} frames held) — {'restarting it' if self.on_stuck else 'still waiting'}.")
+        if self.on_stuck is not None:
+            self.on_stuck(i)
+
+    def worker_lost(self, i: int):
+        """Worker i is down (nothing holds its frames): dead-letter a head frame that stalled `strikes` workers."""
+        seq, count = self.stalls[i]
+        sender = self.senders[i]
+        if count < self.strikes or seq not in sender.unacked:
+            return
+        with open(self.dead_letter, "ab") as f:
+            f.write(sender.unacked.pop(seq)[FRAME_HEADER.size:] + b"\n")
+        self._acked(i, seq)             # releases the source offsets: the txs are in the dead-letter file
+        self.stalls[i] = (0, 0)
+        FRONT_DEAD_FRAMES.labels(worker=str(i)).inc()
+        print(f"[WARN] Frame {seq} to worker {i} stalled {count} workers — dead-lettered to {self.dead_letter}")
+
+    async def route(self, txs: List[dict]):
+        for i, part in enumerate(partition(txs, len(self.senders))):
+            if not part:
+                continue
+            sender = self.senders[i]
+            self.check_stuck(i)
+            while len(sender.unacked) >= self.max_frames:
+                try:
+                    await sender.wait_acked(min(sender.unacked), timeout=min(1.0, self.frame_timeout or 1.0))
+                except asyncio.TimeoutError:
+                    self.check_stuck(i)
+            self.inflight[i][sender.seq + 1] = (time.monotonic(), [tx.pop("_ack", None) for tx in part])
+            try:
+                await sender.send(part)
+            except ConnectionError:
+                pass                    # stays unacked: resent when the worker reconnects
+            FRONT_ROUTED.labels(worker=str(i)).inc(len(part))
+
+    async def run(self, q: asyncio.Queue, block: int = FRONT_BLOCK):
+        while True:
+            txs = [await q.get()]
+            while len(txs) < block and not q.empty():
+                txs.append(q.get_nowait())
+            await self.route(txs)
+
+    async def drain(self, timeout: float):
+        """Wait (up to `timeout` in total) until every worker acked everything sent to it."""
+        deadline = time.monotonic() + timeout
+        for sender in self.senders:
+            if not sender.unacked:
+                continue
+            try:
+                await sender.wait_acked(max(sender.unacked), timeout=max(0.0, deadline - time.monotonic()))
+            except (asyncio.TimeoutError, ConnectionError):
+                print(f"[WARN] {len(sender.unacked)} frames to {sender.address} left unacked — replayed on restart.")
+
+    async def close(self):
+        for sender in self.senders:
+            await sender.close()
+
+
+# ----------------------------------------------
+# Front process
+# ----------------------------------------------
+class Front:
+    def __init__(self, n: int):
+        self.n = n
+        self.ctx = mp.get_context("spawn")      # fresh interpreters: no forked loop / threads
+        self.paths = [os.path.join(NODE_SOCKET_DIR, f"effin_{BANK_ID}_w{i}.sock") for i in range(n)]
+        self.procs: List = [None] * n
+        self.router = Router(self.paths, on_stuck=self.kill_worker)
+        self.stopping = False
+
+    async def start_worker(self, i: int):
+        if os.path.exists(self.paths[i]):
+            os.unlink(self.paths[i])
+        proc = self.procs[i] = self.ctx.Process(target=_worker, args=(worker_env(i, self.paths[i]),),
+                                                name=f"effin-w{i}", daemon=False)
+        proc.start()
+        deadline = time.monotonic() + WORKER_START_TIMEOUT_S
+        while not os.path.exists(self.paths[i]):
+            if not proc.is_alive():
+                raise RuntimeError(f"worker {i} exited during startup (code {proc.exitcode})")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"worker {i} did not open {self.paths[i]} within {WORKER_START_TIMEOUT_S:.0f}s")
+            await asyncio.sleep(0.1)
+        await self.router.senders[i].connect()
+
+    def kill_worker(self, i: int):
+        """A worker stalled on a frame: kill it; supervise() restarts it and resends its frames."""
+        proc = self.procs[i]
+        if proc is not None and proc.is_alive() and not self.stopping:
+            proc.kill()
+
+    async def supervise(self, interval: float = 1.0):
+        """Restart workers that exit; their unacked frames are resent to the new process."""
+        while True:
+            await asyncio.sleep(interval)
+            for i, proc in enumerate(self.procs):
+                if self.stopping or proc.is_alive():
+                    continue
+                print(f"[WARN] Worker {i} exited (code {proc.exitcode}) — restarting.")
+                _mark_dead(proc.pid)
+                WORKER_RESTARTS.labels(worker=str(i)).inc()
+                self.router.worker_lost(i)
+                try:
+                    await self.start_worker(i)
+                except Exception as e:
+                    print(f"[ERROR] Worker {i} restart failed: {e}")
+
+    async def produce(self, q: asyncio.Queue, source, tps: float):
+        if source is not None:
+            await source.run(q)
+        elif TRAFFIC_REPLAY:
+            n = await replay_into(q, TRAFFIC_REPLAY, speed=TRAFFIC_SPEED, block=TRAFFIC_BLOCK)
+            print(f"[INFO] Replay of {TRAFFIC_REPLAY} finished: {n} transactions")
+            await asyncio.Event().wait()
+        else:
+            gen = TxGenerator(BANK_ID, seed=int(TRAFFIC_SEED) if TRAFFIC_SEED else None)
+            await generate_into(q, gen, tps, block=TRAFFIC_BLOCK)
+
+    async def stop_workers(self, timeout: float = 60.0):
+        self.stopping = True
+        for proc in self.procs:
+            if proc is not None and proc.is_alive():
+                proc.terminate()            # SIGTERM: the worker drains its pipeline and acks
+        for proc in self.procs:
+            if proc is not None:
+                await asyncio.to_thread(proc.join, timeout)
+                if proc.is_alive():
+                    print(f"[WARN] {proc.name} did not stop in {timeout:.0f}s — killing it.")
+                    proc.kill()
+                _mark_dead(proc.pid)
+
+    async def run(self, tps: float):
+        serve(PROM_PORT)
+        sample_task = asyncio.create_task(sample_gauges())
+        try:
+            # worker 0 opens (or creates) the index before the others race for it
+            await self.start_worker(0)
+            await asyncio.gather(*(self.start_worker(i) for i in range(1, self.n)))
+        except Exception:
+            await self.stop_workers()
+            raise
+
+        q = asyncio.Queue(maxsize=5000)
+        source = open_source(INGEST_SOURCE, INGEST_CHECKPOINT, group=BANK_ID)
+        producer_task = asyncio.create_task(self.produce(q, source, tps))
+        router_task = asyncio.create_task(self.router.run(q))
+        supervise_task = asyncio.create_task(self.supervise())
+        checkpoint_task = asyncio.create_task(_checkpoint_loop(source)) if source is not None else None
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        print(f"EFFIN node running → {BANK_ID} | {self.n} worker processes | port {PROM_PORT}")
+        stop_task = asyncio.create_task(stop.wait())
+        await asyncio.wait({producer_task, router_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+
+        print("[INFO] Shutting down — draining worker processes…")
+        producer_task.cancel()
+        while not q.empty() and not router_task.done():
+            await asyncio.sleep(0.05)
+        router_task.cancel()
+        stop_task.cancel()
+        supervise_task.cancel()
+        await self.router.drain(timeout=30.0)
+        await self.stop_workers()
+        await self.router.close()
+        if source is not None:
+            checkpoint_task.cancel()
+            source.commit(source.snapshot())
+        sample_task.cancel()
+
+
+async def _checkpoint_loop(source, interval: float = INGEST_CHECKPOINT_S):
+    # workers ack only audited frames, so the snapshot needs no flush here
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            source.commit(source.snapshot())
+        except Exception as e:
+            print(f"[WARN] Ingest checkpoint failed: {e}")
+
+
+def _mark_dead(pid):
+    if pid is not None and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+
+def run(n: int, tps: float):
+    asyncio.run(Front(n).run(tps))
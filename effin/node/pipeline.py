@@ -0,0 +1,152 @@
+# effin/node/pipeline.py
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from effin.common.metrics import gauge_function
+
+# ------------------------------------------------------------
+# METRICS (one label per stage → find the bottleneck stage)
+# ------------------------------------------------------------
+STAGE_QUEUE_DEPTH = Gauge("effin_stage_queue_depth", "Batches waiting in front of a pipeline stage", ["stage"])
+STAGE_LATENCY = Histogram("effin_stage_latency_seconds", "Time a pipeline stage spends on one batch", ["stage"])
+STAGE_BUSY = Gauge("effin_stage_busy_workers", "Pipeline stage workers currently processing a batch", ["stage"])
+STAGE_ERRORS = Counter("effin_stage_errors_total", "Batches dropped because a stage raised", ["stage"])
+
+
+class Batch:
+    """Unit of work flowing through the pipeline; stages fill in fields as it moves."""
+
+    __slots__ = ("txs", "vectors", "items", "result", "alerts", "created", "rtt",
+                 "prescreened", "prescreen_at", "degraded", "tx_refs", "release", "__weakref__")
+
+    def __init__(self, txs: List[Dict]):
+        self.txs = txs
+        self.vectors = None
+        self.items: List[Dict] = []
+        self.result: Dict = {}
+        self.alerts: List[Dict] = []
+        self.created = time.time()
+        self.rtt = 0.0   # seconds spent waiting on CyborgDB for this batch
+        self.prescreened = {}      # (row, matched_id) → local distance, already alerted from the local index
+        self.prescreen_at = 0.0
+        self.degraded = False      # CyborgDB was unavailable for this batch
+        self.tx_refs = None        # hash_id_hex of each tx_id, when computed with the vectors
+        self.release = None        # frees shared buffers `vectors` points into (once audited)
+
+    def __len__(self):
+        return len(self.txs)
+
+
+class Stage:
+    """
+    A named step with its own worker count.
+    `fn(batch)` may be sync or async. Returning None passes the (mutated) batch
+    on, returning False drops it, anything else replaces it.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], concurrency: int = 1):
+        self.name = name
+        self.fn = fn
+        self.concurrency = max(1, int(concurrency))
+        self._is_async = inspect.iscoroutinefunction(fn)
+
+    async def __call__(self, item):
+        result = self.fn(item)
+        if self._is_async:
+            result = await result
+        if result is None:
+            return item
+        return None if result is False else result
+
+
+class Pipeline:
+    """
+    source → stage[0] → stage[1] → … with a bounded asyncio.Queue in front of
+    every stage. When a stage falls behind its queue fills, upstream puts block,
+    and the pressure reaches the source (and whatever feeds it).
+
+    A batch whose stage raises is dropped; `on_drop(item, stage_name, exc)`
+    is called first, so whatever the batch holds (offsets, buffers) can be
+    settled rather than leaked.
+    """
+
+    def __init__(self, source: Callable[[], Awaitable[Optional[Any]]], stages: List[Stage], queue_size: int = 4,
+                 on_drop: Optional[Callable[[Any, str, BaseException], None]] = None):
+        self.source = source
+        self.stages = stages
+        self.on_drop = on_drop
+        self.queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+
+        for stage, queue in zip(stages, self.queues):
+            gauge_function(STAGE_QUEUE_DEPTH.labels(stage=stage.name), queue.qsize)
+
+    async def _pump(self):
+        while True:
+            item = await self.source()
+            if item is None:
+                return
+            await self.queues[0].put(item)
+
+    async def _work(self, idx: int):
+        stage = self.stages[idx]
+        inbox = self.queues[idx]
+        outbox = self.queues[idx + 1] if idx + 1 < len(self.queues) else None
+        busy = STAGE_BUSY.labels(stage=stage.name)
+        latency = STAGE_LATENCY.labels(stage=stage.name)
+
+        while True:
+            item = await inbox.get()
+            busy.inc()
+            start = time.perf_counter()
+            try:
+                out = await stage(item)
+            except Exception as e:
+                STAGE_ERRORS.labels(stage=stage.name).inc()
+                print(f"[ERROR stage {stage.name}] {e}")
+                out = None
+                if self.on_drop is not None:
+                    try:
+                        self.on_drop(item, stage.name, e)
+                    except Exception as e2:
+                        print(f"[ERROR stage {stage.name}] on_drop failed: {e2}")
+            finally:
+                latency.observe(time.perf_counter() - start)
+                busy.dec()
+
+            try:
+                if out is not None and outbox is not None:
+                    await outbox.put(out)
+            finally:
+                # only after hand-off, so join() in run() sees the item downstream
+                inbox.task_done()
+
+    async def run(self):
+        """Run until the source returns None, then drain every stage in order."""
+        workers = [
+            asyncio.create_task(self._work(idx))
+            for idx, stage in enumerate(self.stages)
+            for _ in range(stage.concurrency)
+        ]
+        try:
+            await self._pump()
+            for queue in self.queues:
+                await queue.join()
+        finally:
+            for t in workers:
+                t.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+def parse_concurrency(spec: str, defaults: Dict[str, int]) -> Dict[str, int]:
+    """Parse 'upsert=4,query=4' on top of per-stage defaults."""
+    out = dict(defaults)
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        name, _, value = part.partition("=")
+        if name.strip() not in out:
+            raise ValueError(f"unknown pipeline stage '{name.strip()}'")
+        out[name.strip()] = int(value)
+    return out
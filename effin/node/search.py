@@ -1,22 +1,562 @@
 # effin/node/search.py
 
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+
 import httpx
 import numpy as np
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from prometheus_client import Counter, Gauge, Histogram
+
+
+try:
+    import orjson  # optional: serializes numpy arrays without per-element Python floats
+except ImportError:
+    orjson = None
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+# "orjson" (fast, optional) → "numpy" (built-in matrix writer) → "stdlib" (.tolist() + json)
+DEFAULT_JSON_BACKEND = "orjson" if orjson is not None else "numpy"
+
+
+# -------------------------------------------------------------
+# POOL METRICS
+# -------------------------------------------------------------
+POOL_IN_FLIGHT = Gauge("effin_cyborg_requests_in_flight", "CyborgDB requests holding a pool connection")
+POOL_SATURATION = Gauge("effin_cyborg_pool_saturation", "In-flight requests / max connections")
+POOL_WAIT = Histogram(
+    "effin_cyborg_connection_wait_seconds", "Time spent waiting for a free pool connection",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+REQUEST_LATENCY = Histogram("effin_cyborg_request_seconds", "CyborgDB request latency", ["endpoint"])
+
+# -------------------------------------------------------------
+# RESILIENCE METRICS
+# -------------------------------------------------------------
+RETRIES = Counter("effin_cyborg_retries_total", "CyborgDB calls retried", ["endpoint"])
+HEDGES = Counter("effin_cyborg_hedged_queries_total", "Duplicate queries sent after the hedge delay", ["winner"])
+BREAKER_STATE = Gauge("effin_cyborg_breaker_state", "Circuit breaker: 0=closed 1=half-open 2=open")
+SPILL_DEPTH = Gauge("effin_cyborg_spill_depth", "Upsert items waiting in the local spill queue")
+SPILL_FULL_WAITS = Counter("effin_cyborg_spill_full_waits_total", "Spills held back because the spill queue was full")
+SPILL_REPLAYED = Counter("effin_cyborg_spill_replayed_total", "Spilled items replayed after recovery")
+
+
+def _spill_line(index_name: str, it: Dict) -> str:
+    vec = it["vector"]
+    return json.dumps({"index_name": index_name, "id": it["id"],
+                       "vector": vec.tolist() if isinstance(vec, np.ndarray) else list(vec),
+                       "metadata": it.get("metadata") or {}}, default=str) + "\n"
+
+
+class CyborgUnavailable(Exception):
+    """CyborgDB did not answer successfully after retries (or the breaker is open)."""
+
+
+class CircuitOpenError(CyborgUnavailable):
+    """Call rejected locally because the circuit breaker is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Network errors, 5xx and 429 are worth retrying; other 4xx are not."""
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code >= 500 or code == 429
+    return False
+
+
+async def _settle(coro):
+    """Await `coro`, returning its exception instead of raising (like gather(return_exceptions=True))."""
+    try:
+        return await coro
+    except Exception as e:
+        return e
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: sleep U(0, min(cap, base * 2^n))."""
+
+    def __init__(self, attempts: int = 3, base: float = 0.05, cap: float = 2.0):
+        self.attempts = max(1, attempts)
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies (for the hedge delay)."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    closed → (threshold consecutive failures) → open → (reset_timeout) → half-open
+    → one probe call: success closes, failure re-opens.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 10.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        BREAKER_STATE.set(self.state)
+
+    def _set(self, state: int):
+        self.state = state
+        BREAKER_STATE.set(state)
+
+    def allow(self) -> bool:
+        """May a call go out now? In half-open only one probe is let through."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._set(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def release_probe(self):
+        """The probe call was cancelled without an outcome."""
+        self._probing = False
+
+    def record_success(self) -> bool:
+        """Returns True when this success closed a previously open circuit."""
+        recovered = self.state != self.CLOSED
+        self.failures = 0
+        self._probing = False
+        if recovered:
+            self._set(self.CLOSED)
+            print("[INFO] CyborgDB recovered — circuit closed.")
+        return recovered
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                print(f"[WARN] CyborgDB unhealthy — circuit open for {self.reset_timeout:.0f}s.")
+            self._set(self.OPEN)
+            self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+
+# -------------------------------------------------------------
+# PAYLOAD HELPERS
+# Vectors are serialized once per batch and the bytes spliced into every
+# request body that carries them.
+# -------------------------------------------------------------
+def as_matrix(vectors) -> np.ndarray:
+    """List of vectors / 1-D vector / 2-D array → C-contiguous 2-D float array."""
+    if isinstance(vectors, np.ndarray):
+        mat = vectors
+    elif len(vectors) and isinstance(vectors[0], np.ndarray):
+        mat = np.stack(vectors)
+    else:
+        mat = np.asarray(vectors, dtype=np.float64)
+    if mat.ndim == 1:
+        mat = mat.reshape(1, -1)
+    if mat.dtype not in (np.float32, np.float64):
+        mat = mat.astype(np.float64)
+    return np.ascontiguousarray(mat)
+
+
+def _float32_rows(mat: np.ndarray) -> List[bytes]:
+    """
+    Vectorised float32 → JSON text: 9 significant digits (always round-trips
+    float32) written as digit bytes into a fixed-width grid, then the unused
+    cells (sign, trailing zeros, exponent) are masked out in one compress.
+    """
+    n, d = mat.shape
+    x = mat.astype(np.float64).ravel()
+    a = np.abs(x)
+    nz = a > 0
+    e = np.zeros(a.shape, np.int64)
+    e[nz] = np.floor(np.log10(a[nz]))
+    m = np.rint(a * 10.0 ** (8 - e)).astype(np.int64)
+    for fix in (m >= 10 ** 9, nz & (m < 10 ** 8)):   # log10 can be off by one next to a power of ten
+        if fix.any():
+            e[fix] += np.where(m[fix] >= 10 ** 9, 1, -1)
+            m[fix] = np.rint(a[fix] * 10.0 ** (8 - e[fix]))
+    m = m.astype(np.int32)
+    ae = np.abs(e).astype(np.int32)
+    zero = m == 0
+
+    # cells: [ - d . dddddddd e - d d , \n
+    chars = np.empty((len(m), 18), np.uint8)
+    keep = np.ones((len(m), 18), bool)
+    seen = np.zeros(len(m), bool)
+    rest = m
+    for col in range(11, 3, -1):   # fraction digits, last first; drop trailing zeros
+        rest, digit = np.divmod(rest, 10)
+        chars[:, col] = digit + 48
+        seen |= digit != 0
+        keep[:, col] = seen
+    chars[:, 2] = rest + 48
+    keep[zero, 4] = True           # zero is written 0.0 so -0.0 keeps its sign
+    chars[:, 0] = ord("["); keep[:, 0] = False; keep[::d, 0] = True
+    chars[:, 1] = ord("-"); keep[:, 1] = np.signbit(x)
+    chars[:, 3] = ord("."); keep[:, 3] = seen | zero
+    chars[:, 12] = ord("e"); keep[:, 12] = e != 0
+    chars[:, 13] = ord("-"); keep[:, 13] = e < 0
+    chars[:, 14] = ae // 10 + 48; keep[:, 14] = ae >= 10
+    chars[:, 15] = ae % 10 + 48; keep[:, 15] = e != 0
+    chars[:, 16] = ord(","); chars[d - 1::d, 16] = ord("]")
+    chars[:, 17] = ord("\n"); keep[:, 17] = False; keep[d - 1::d, 17] = True
+    return np.compress(keep.ravel(), chars.ravel()).tobytes().split(b"\n")[:-1]
+
+
+def dumps_rows(vectors, backend: Optional[str] = None) -> List[bytes]:
+    """
+    JSON-encode each vector row once → list of b"[f,f,...]".
+    NaN/inf have no JSON spelling, so rows holding them raise ValueError.
+    """
+    backend = backend or DEFAULT_JSON_BACKEND
+    if backend == "stdlib":
+        rows = []
+        for i, v in enumerate(vectors):
+            try:
+                rows.append(json.dumps(v.tolist() if hasattr(v, "tolist") else list(v), allow_nan=False).encode())
+            except ValueError as e:
+                raise ValueError(f"non-finite values in vector rows [{i}] — not representable in JSON") from e
+        return rows
+
+    mat = as_matrix(vectors)
+    n, d = mat.shape
+    if n == 0:
+        return []
+    finite = np.isfinite(mat).all(axis=1)
+    if not finite.all():
+        bad = np.flatnonzero(~finite)
+        raise ValueError(f"non-finite values in vector rows {bad[:10].tolist()} — not representable in JSON")
+
+    if backend == "orjson":
+        raw = orjson.dumps(mat, option=orjson.OPT_SERIALIZE_NUMPY)
+        return [b"[" + r + b"]" for r in raw[2:-2].split(b"],[")]
+
+    if mat.dtype == np.float32 and d > 0:
+        return _float32_rows(mat)
+
+    # float64: one printf over the whole matrix; %.17g round-trips exactly
+    row_fmt = "[" + ",".join(["%.17g"] * d) + "]\n"
+    text = (row_fmt * n) % tuple(mat.ravel().tolist())
+    return text.encode().split(b"\n")[:-1]
+
+
+def dumps_matrix(vectors, backend: Optional[str] = None) -> bytes:
+    """JSON array of arrays for a whole batch of vectors."""
+    return b"[" + b",".join(dumps_rows(vectors, backend)) + b"]"
+
+
+def dumps_json(obj, backend: Optional[str] = None) -> bytes:
+    if (backend or DEFAULT_JSON_BACKEND) == "orjson":
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def splice_json(payload: dict, key: str, raw: bytes, backend: Optional[str] = None) -> bytes:
+    """dumps_json(payload) with an extra, already-encoded field `key` appended."""
+    head = dumps_json(payload, backend)
+    sep = b", " if payload else b""
+    return head[:-1] + sep + json.dumps(key).encode() + b": " + raw + b"}"
+
+
+def upsert_items_json(items: Sequence[Dict], rows: Sequence[bytes], backend: Optional[str] = None) -> bytes:
+    """Encode upsert items reusing pre-serialized vector rows."""
+    return b"[" + b", ".join(
+        splice_json({"id": it["id"], "metadata": it.get("metadata", {})}, "vector", row, backend)
+        for it, row in zip(items, rows)
+    ) + b"]"
 
 
 class CyborgWrapper:
-    def __init__(self, endpoint: str, api_key: str, index_key: Optional[str] = None, timeout: float = 30.0):
+    """
+    Async CyborgDB REST client. Owns one pooled httpx client; every endpoint
+    goes through _request(), which also gates on the pool size so time spent
+    waiting for a connection is measured (effin_cyborg_connection_wait_seconds).
+
+    Upserts that fail while CyborgDB is unavailable go to the spill queue.
+    With `spill_path` the queue is also written (and fsynced) to that file
+    before batch_upsert() returns "spilled", and reloaded on start, so a
+    caller may ack spilled txs at once: a restart replays them from disk.
+    The queue (and so the file) holds at most `spill_max` items: a spill
+    that does not fit waits, replaying, until there is room, which
+    backpressures the caller instead of dropping acked upserts.
+    """
+
+    def __init__(self, endpoint: str, api_key: str, index_key: Optional[str] = None, timeout: float = 30.0,
+                 json_backend: Optional[str] = None, max_connections: int = 64,
+                 max_keepalive: int = 32, keepalive_expiry: float = 30.0, http2: bool = False,
+                 retry: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                 hedge_percentile: Optional[float] = None, spill_max: int = 50_000,
+                 spill_path: Optional[str] = None):
         self.endpoint = endpoint.rstrip("/")
         self.api_key = api_key
         self.index_key = index_key or ""
 
+        if json_backend == "orjson" and orjson is None:
+            print("[WARN] orjson not installed — using numpy JSON writer.")
+            json_backend = "numpy"
+        self.json_backend = json_backend or DEFAULT_JSON_BACKEND
+
         self.headers = {
             "Content-Type": "application/json",
             "X-API-Key": api_key
         }
 
-        self.client = httpx.AsyncClient(timeout=timeout)
+        if http2 and not HAS_HTTP2:
+            print("[WARN] HTTP/2 requested but 'h2' is not installed — using HTTP/1.1.")
+            http2 = False
+
+        self.max_connections = max(1, max_connections)
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self._in_flight = 0
+
+        # resilience: retries for idempotent calls, optional hedged queries,
+        # circuit breaker with a local spill queue for upserts
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_percentile = hedge_percentile
+        self.query_latency = LatencyTracker()
+        self.spill = deque()           # (index_name, item)
+        self.spill_max = spill_max
+        self.spill_path = spill_path
+        self._replay_task = None
+        self._spill_io = asyncio.Lock()     # spill file appends vs. rewrites
+        if spill_path:
+            self._load_spill()
+
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=min(max_keepalive, self.max_connections),
+                keepalive_expiry=keepalive_expiry
+            )
+        )
+
+    # -------------------------------------------------------------
+    # TRANSPORT
+    # -------------------------------------------------------------
+    async def _request(self, method: str, path: str, *, json_body: Optional[dict] = None,
+                       content: Optional[bytes] = None) -> httpx.Response:
+        t0 = time.perf_counter()
+        async with self._slots:
+            POOL_WAIT.observe(time.perf_counter() - t0)
+            self._in_flight += 1
+            POOL_IN_FLIGHT.inc()
+            POOL_SATURATION.set(self._in_flight / self.max_connections)
+            try:
+                with REQUEST_LATENCY.labels(endpoint=path.rsplit("/", 1)[-1]).time():
+                    return await self.client.request(
+                        method, f"{self.endpoint}{path}", json=json_body, content=content, headers=self.headers
+                    )
+            finally:
+                self._in_flight -= 1
+                POOL_IN_FLIGHT.dec()
+                POOL_SATURATION.set(self._in_flight / self.max_connections)
+
+    async def _attempt(self, path: str, body: Optional[bytes], json_body: Optional[dict]) -> Dict[str, Any]:
+        resp = await self._request("POST", path, json_body=json_body, content=body)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _hedged(self, path: str, body: Optional[bytes], json_body: Optional[dict]) -> Dict[str, Any]:
+        """
+        Send the call; if it has not answered within the recent p-th percentile
+        latency, send a duplicate and take whichever answers first.
+        """
+        delay = self.query_latency.percentile(self.hedge_percentile) if self.hedge_percentile else None
+        t0 = time.perf_counter()
+        first = asyncio.ensure_future(self._attempt(path, body, json_body))
+        tasks = {first}
+        hedged = False
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    hedged = True
+                    tasks.add(asyncio.ensure_future(self._attempt(path, body, json_body)))
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                # retrieve every finished attempt's exception, even when a sibling won
+                errors = {t: t.exception() for t in done}
+                for t in done:
+                    if errors[t] is None:
+                        if hedged:
+                            HEDGES.labels(winner="primary" if t is first else "hedge").inc()
+                        self.query_latency.observe(time.perf_counter() - t0)
+                        return t.result()
+                    error = errors[t]
+            raise error
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def _call(self, path: str, body: Optional[bytes] = None, json_body: Optional[dict] = None,
+                    idempotent: bool = True, hedge: bool = False) -> Dict[str, Any]:
+        """
+        POST with retries (idempotent calls only), optional hedging and the
+        circuit breaker. Raises CyborgUnavailable when the service is unhealthy;
+        other HTTP errors (4xx) propagate unchanged.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"circuit open — {path} not sent")
+
+        attempts = self.retry.attempts if idempotent else 1
+        for attempt in range(attempts):
+            try:
+                if hedge:
+                    result = await self._hedged(path, body, json_body)
+                else:
+                    result = await self._attempt(path, body, json_body)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()   # the service answered; the request was bad
+                    raise
+                if attempt + 1 < attempts:
+                    RETRIES.labels(endpoint=path.rsplit("/", 1)[-1]).inc()
+                    await asyncio.sleep(self.retry.delay(attempt))
+                    continue
+                self.breaker.record_failure()
+                raise CyborgUnavailable(f"{path}: {e}") from e
+
+            if self.breaker.record_success():
+                self._schedule_replay()
+            return result
+
+    # -------------------------------------------------------------
+    # SPILL QUEUE (upserts shed while CyborgDB is unhealthy)
+    # -------------------------------------------------------------
+    async def spill_items(self, index_name: str, items: List[Dict]):
+        """
+        Queue `items` for replay; returns once they are on disk (with spill_path).
+        While the queue is full, wait and replay (probing CyborgDB) until they fit.
+        """
+        items = [
+            # may be a view into a batch buffer (shared-memory ring slot) that is reused
+            dict(it, vector=it["vector"].copy())
+            if isinstance(it.get("vector"), np.ndarray) and it["vector"].base is not None else it
+            for it in items
+        ]
+        while True:
+            async with self._spill_io:
+                if not self.spill or len(self.spill) + len(items) <= self.spill_max:
+                    self.spill.extend((index_name, it) for it in items)
+                    SPILL_DEPTH.set(len(self.spill))
+                    if self.spill_path:
+                        await asyncio.to_thread(self._append_spill, [_spill_line(index_name, it) for it in items])
+                    return
+            SPILL_FULL_WAITS.inc()
+            await asyncio.sleep(self.breaker.reset_timeout)
+            self._schedule_replay()
+            if self._replay_task is not None:
+                await asyncio.shield(self._replay_task)
+
+    def _append_spill(self, lines: List[str]):
+        with open(self.spill_path, "a") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _load_spill(self):
+        try:
+            with open(self.spill_path) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue            # torn last line of a crash
+                    item = {"id": rec["id"], "vector": np.asarray(rec["vector"], dtype=np.float32),
+                            "metadata": rec.get("metadata") or {}}
+                    self.spill.append((rec["index_name"], item))
+        except FileNotFoundError:
+            return
+        SPILL_DEPTH.set(len(self.spill))
+        if self.spill:
+            print(f"[INFO] {len(self.spill)} spilled upserts loaded from {self.spill_path} — replayed once CyborgDB answers.")
+
+    def _rewrite_spill(self, entries: List[Tuple[str, Dict]]):
+        """Make the spill file hold exactly `entries` (the queue after a replay)."""
+        if not entries:
+            try:
+                os.remove(self.spill_path)
+            except FileNotFoundError:
+                pass
+            return
+        tmp = self.spill_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.writelines(_spill_line(index_name, it) for index_name, it in entries)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.spill_path)
+
+    def _schedule_replay(self):
+        if self.spill and (self._replay_task is None or self._replay_task.done()):
+            self._replay_task = asyncio.ensure_future(self.replay_spill())
+
+    async def replay_spill(self, chunk: int = 256) -> int:
+        """Re-send spilled upserts in chunks; stops (keeping the rest) on the first failure."""
+        replayed = 0
+        while self.spill:
+            index_name = self.spill[0][0]
+            take = []
+            while self.spill and len(take) < chunk and self.spill[0][0] == index_name:
+                take.append(self.spill.popleft()[1])
+            try:
+                await self.batch_upsert(index_name, take, spill_on_failure=False)
+            except Exception as e:
+                self.spill.extendleft((index_name, it) for it in reversed(take))
+                print(f"[WARN] Spill replay paused ({len(self.spill)} items left): {e}")
+                break
+            replayed += len(take)
+            SPILL_REPLAYED.inc(len(take))
+            SPILL_DEPTH.set(len(self.spill))
+        SPILL_DEPTH.set(len(self.spill))
+        if replayed:
+            if self.spill_path:
+                async with self._spill_io:
+                    await asyncio.to_thread(self._rewrite_spill, list(self.spill))
+            print(f"[INFO] Replayed {replayed} spilled upserts.")
+        return replayed
 
     # -------------------------------------------------------------
     # CREATE INDEX (32 dims)
@@ -32,8 +572,7 @@ class CyborgWrapper:
             }
         }
 
-        url = f"{self.endpoint}/v1/indexes/create"
-        resp = await self.client.post(url, json=payload, headers=self.headers)
+        resp = await self._request("POST", "/v1/indexes/create", json_body=payload)
 
         if resp.status_code in (400, 409):
             print(f"[INFO] Index '{index_name}' already exists — continuing.")
@@ -43,21 +582,54 @@ class CyborgWrapper:
         print(f"[SUCCESS] Index '{index_name}' created.")
         return resp.json()
 
+    # -------------------------------------------------------------
+    # DELETE / TRAIN / DESCRIBE / LIST
+    # -------------------------------------------------------------
+    async def delete_index(self, index_name: str) -> bool:
+        """Delete an index; False if it did not exist."""
+        resp = await self._request("POST", "/v1/indexes/delete",
+                                   json_body={"index_name": index_name, "index_key": self.index_key})
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        return True
+
+    async def train_index(self, index_name: str):
+        return await self._call("/v1/indexes/train", json_body={"index_name": index_name, "index_key": self.index_key})
+
+    async def describe_index(self, index_name: str) -> Optional[Dict[str, Any]]:
+        """Index name, config and vector count; None if it does not exist."""
+        resp = await self._request("POST", "/v1/indexes/describe",
+                                   json_body={"index_name": index_name, "index_key": self.index_key})
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return resp.json()
+
+    async def get_vectors(self, index_name: str, ids: List[str], include=None) -> List[Dict[str, Any]]:
+        """Stored items by id ({"id", "vector", "metadata"}); unknown ids are left out."""
+        result = await self._call("/v1/vectors/get", json_body={
+            "index_name": index_name, "index_key": self.index_key, "ids": list(ids),
+            "include": include or ["vector", "metadata"],
+        })
+        return result.get("results", [])
+
+    async def list_indexes(self) -> List[str]:
+        resp = await self._request("GET", "/v1/indexes/list")
+        resp.raise_for_status()
+        return resp.json().get("indexes", [])
+
     # -------------------------------------------------------------
     # ENSURE INDEX EXISTS
     # -------------------------------------------------------------
     async def ensure_index_exists(self, index_name: str, vector_dim: int = 32):
 
-        list_url = f"{self.endpoint}/v1/indexes/list"
-        resp = await self.client.get(list_url, headers=self.headers)
-
         try:
-            resp.raise_for_status()
+            indexes = await self.list_indexes()
         except Exception:
             print("[WARN] Could not list indexes — attempting create.")
             return await self.create_index(index_name, vector_dim)
 
-        indexes = resp.json().get("indexes", [])
         if index_name in indexes:
             print(f"[INFO] Index '{index_name}' exists.")
             return
@@ -69,85 +641,95 @@ class CyborgWrapper:
     # UPSERT (batch)
     # We keep numeric float vectors in "vector" and preserve any metadata.
     # -------------------------------------------------------------
-    async def batch_upsert(self, index_name: str, items: List[Dict]):
+    async def batch_upsert(self, index_name: str, items: List[Dict], spill_on_failure: bool = True):
 
-        url = f"{self.endpoint}/v1/vectors/upsert"
-
-        payload = {
-            "index_name": index_name,
-            "index_key": self.index_key,
-            "items": [
-                {
-                    "id": it["id"],
-                    # numeric vector must be a list of floats for CyborgDB
-                    "vector": it["vector"].tolist() if hasattr(it["vector"], "tolist") else list(it["vector"]),
-                    "metadata": it.get("metadata", {})
-                }
-                for it in items
-            ]
-        }
-
-        resp = await self.client.post(url, json=payload, headers=self.headers)
-        resp.raise_for_status()
-        return resp.json()
+        # numeric vectors are written straight from the float arrays (no per-item .tolist())
+        rows = dumps_rows([it["vector"] for it in items], self.json_backend)
+        body = splice_json(
+            {"index_name": index_name, "index_key": self.index_key},
+            "items", upsert_items_json(items, rows, self.json_backend), self.json_backend
+        )
+        try:
+            return await self._call("/v1/vectors/upsert", body)
+        except CyborgUnavailable:
+            if not spill_on_failure:
+                raise
+            await self.spill_items(index_name, items)
+            return {"status": "spilled", "spilled_count": len(items)}
 
     # -------------------------------------------------------------
     # SINGLE UPSERT (for tests)
     # -------------------------------------------------------------
     async def upsert(self, index_name: str, id: str, vector: np.ndarray, metadata: dict):
-        url = f"{self.endpoint}/v1/vectors/upsert"
-
-        payload = {
-            "index_name": index_name,
-            "index_key": self.index_key,
-            "items": [{
-                "id": id,
-                "vector": vector.tolist(),
-                "metadata": metadata
-            }]
-        }
-
-        resp = await self.client.post(url, json=payload, headers=self.headers)
-        resp.raise_for_status()
-        return resp.json()
+        return await self.batch_upsert(index_name, [{"id": id, "vector": vector, "metadata": metadata}])
 
     # -------------------------------------------------------------
     # SINGLE QUERY (numeric)
     # -------------------------------------------------------------
     async def query(self, index_name: str, vector: np.ndarray, top_k: int = 5, include=None):
+        return await self.batch_query(index_name, [vector], top_k=top_k, include=include)
 
-        url = f"{self.endpoint}/v1/vectors/query"
+    # -------------------------------------------------------------
+    # BATCH QUERY (numeric)
+    # -------------------------------------------------------------
+    async def batch_query(self, index_name: str, vectors: List[np.ndarray], top_k: int = 5, include=None):
 
         payload = {
             "index_name": index_name,
             "index_key": self.index_key,
-            "query_vectors": [vector.tolist()],     # correct JSON shape
             "top_k": top_k,
             "include": include or ["distance", "metadata"]
         }
-
-        resp = await self.client.post(url, json=payload, headers=self.headers)
-        resp.raise_for_status()
-        return resp.json()
+        body = splice_json(payload, "query_vectors", dumps_matrix(vectors, self.json_backend), self.json_backend)
+        return await self._call("/v1/vectors/query", body, hedge=True)
 
     # -------------------------------------------------------------
-    # BATCH QUERY (numeric)
+    # UPSERT + QUERY (one serialization, overlapped round trips)
     # -------------------------------------------------------------
-    async def batch_query(self, index_name: str, vectors: List[np.ndarray], top_k: int = 5):
+    async def upsert_and_query(self, index_name: str, items: List[Dict], top_k: int = 5,
+                               concurrent: bool = True) -> Dict[str, Any]:
+        """
+        Upsert `items` and query their vectors in one go.
 
-        url = f"{self.endpoint}/v1/vectors/query"
+        The vector list is JSON-encoded once; the same bytes go into both bodies.
+        With concurrent=True both requests are in flight together on the pooled
+        client (the service has no combined endpoint). Each query row's own id
+        is removed from its neighbors, whether or not the upsert landed first.
 
-        payload = {
-            "index_name": index_name,
-            "index_key": self.index_key,
-            "query_vectors": [v.tolist() for v in vectors],
-            "top_k": top_k,
-            "include": ["distance", "metadata"]
-        }
+        Returns {"upsert": <upsert response>, "results": [[neighbor, ...], ...]}.
+        """
+        backend = self.json_backend
+        rows = dumps_rows([it["vector"] for it in items], backend)
+        base = {"index_name": index_name, "index_key": self.index_key}
 
-        resp = await self.client.post(url, json=payload, headers=self.headers)
-        resp.raise_for_status()
-        return resp.json()
+        upsert_body = splice_json(base, "items", upsert_items_json(items, rows, backend), backend)
+        query_body = splice_json(
+            {**base, "top_k": top_k + 1, "include": ["distance", "metadata"]},   # +1: room for the self-match
+            "query_vectors", b"[" + b",".join(rows) + b"]", backend
+        )
+
+        upsert_call = self._call("/v1/vectors/upsert", upsert_body)
+        query_call = self._call("/v1/vectors/query", query_body, hedge=True)
+        if concurrent:
+            upserted, queried = await asyncio.gather(upsert_call, query_call, return_exceptions=True)
+        else:
+            upserted = await _settle(upsert_call)
+            queried = await _settle(query_call)
+
+        # an unavailable upsert is shed to the spill queue; the query error is the caller's
+        if isinstance(upserted, CyborgUnavailable):
+            await self.spill_items(index_name, items)
+            upserted = {"status": "spilled", "spilled_count": len(items)}
+        elif isinstance(upserted, BaseException):
+            raise upserted
+        if isinstance(queried, BaseException):
+            raise queried
+
+        results = [
+            [n for n in group if n.get("id") != it["id"]][:top_k]
+            for it, group in zip(items, queried.get("results", []))
+        ]
+        return {"upsert": upserted, "results": results}
 
     async def close(self):
         await self.client.aclose()
@@ -0,0 +1,133 @@
+# effin/node/training.py
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+TRAIN_RUNS = Counter("effin_train_runs_total", "Index training runs", ["reason", "result"])
+TRAIN_DURATION = Histogram(
+    "effin_train_duration_seconds", "Index training call duration",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+TRAIN_VECTORS = Counter("effin_train_vectors_total", "Vectors upserted since the previous run, covered by a training run")
+TRAIN_PENDING = Gauge("effin_train_pending_vectors", "Vectors upserted since the last training run")
+TRAIN_IN_FLIGHT = Gauge("effin_train_in_flight", "1 while a training run is in flight")
+TRAIN_RECALL = Gauge("effin_train_observed_recall", "Share of locally confirmed neighbors the remote index returned (recent window)")
+
+
+class TrainScheduler:
+    """
+    Retrains the index from its own task, off the upsert / query path.
+
+    A run starts on whichever comes first:
+      - `after_vectors` vectors upserted since the last run ("volume")
+      - `every_s` seconds since the last run, with vectors pending ("time")
+      - observed recall over the last `recall_window` checks below
+        `min_recall` ("recall"), once `recall_min_samples` were seen
+
+    At most one run is in flight, and runs are at least `min_interval_s`
+    apart. Time triggers are jittered (±10%) so nodes started together
+    don't all train the shared index at once.
+    """
+
+    def __init__(self, train: Callable[[], Awaitable], after_vectors: int = 500, every_s: float = 0.0,
+                 min_recall: float = 0.0, recall_window: int = 500, recall_min_samples: int = 50,
+                 min_interval_s: float = 30.0):
+        self.train = train
+        self.after_vectors = after_vectors
+        self.every_s = every_s
+        self.min_recall = min_recall
+        self.recall_min_samples = recall_min_samples
+        self.min_interval = min_interval_s
+        self.pending = 0
+        self.runs = 0
+        self.last_run = time.monotonic()
+        self._recall = deque(maxlen=recall_window)
+        self._next_time = self._schedule()
+        self._running = False
+        self._wake = asyncio.Event()
+
+    def _schedule(self) -> float:
+        return self.last_run + self.every_s * random.uniform(0.9, 1.1) if self.every_s > 0 else float("inf")
+
+    # ----------------------------------------------
+    # Signals (called from the pipeline, never block)
+    # ----------------------------------------------
+    def record_upserts(self, n: int):
+        self.pending += n
+        TRAIN_PENDING.set(self.pending)
+        if self.after_vectors and self.pending >= self.after_vectors:
+            self._wake.set()
+
+    def record_recall(self, expected: int, found: int):
+        """`expected` neighbors should have been returned by the remote index, `found` were."""
+        self._recall.extend([1] * found + [0] * (expected - found))
+        if self._recall:
+            TRAIN_RECALL.set(self.recall)
+            if self.min_recall and self.recall < self.min_recall:
+                self._wake.set()
+
+    @property
+    def recall(self) -> float:
+        return sum(self._recall) / len(self._recall) if self._recall else 1.0
+
+    # ----------------------------------------------
+    # Scheduling
+    # ----------------------------------------------
+    def due(self, now: Optional[float] = None) -> Optional[str]:
+        """Reason a run should start now, or None."""
+        now = time.monotonic() if now is None else now
+        if self._running or now - self.last_run < self.min_interval:
+            return None
+        if self.after_vectors and self.pending >= self.after_vectors:
+            return "volume"
+        if (self.min_recall and len(self._recall) >= self.recall_min_samples
+                and self.recall < self.min_recall):
+            return "recall"
+        if self.pending and now >= self._next_time:
+            return "time"
+        return None
+
+    async def run_once(self, reason: str) -> bool:
+        if self._running:
+            return False
+        self._running = True
+        TRAIN_IN_FLIGHT.set(1)
+        covered, self.pending = self.pending, 0
+        TRAIN_PENDING.set(0)
+        t0 = time.perf_counter()
+        try:
+            await self.train()
+            result = "ok"
+        except Exception as e:
+            print(f"[WARN] Index training ({reason}) failed: {e}")
+            result = "error"
+            self.pending += covered      # retried on the next trigger
+        finally:
+            self._running = False
+            TRAIN_IN_FLIGHT.set(0)
+            TRAIN_DURATION.observe(time.perf_counter() - t0)
+            self.last_run = time.monotonic()
+            self._next_time = self._schedule()
+        TRAIN_RUNS.labels(reason=reason, result=result).inc()
+        if result == "ok":
+            TRAIN_VECTORS.inc(covered)
+            self.runs += 1
+            self._recall.clear()         # judge the retrained index on fresh checks
+            print(f"[INFO] Index trained ({reason}): {covered} new vectors in {time.perf_counter() - t0:.1f}s")
+        return result == "ok"
+
+    async def run(self, poll_s: float = 1.0):
+        """Scheduler loop; cancel the task to stop it."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=poll_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            reason = self.due()
+            if reason:
+                await self.run_once(reason)
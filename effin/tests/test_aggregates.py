@@ -0,0 +1,42 @@
+import numpy as np
+
+from effin.dashboard.aggregates import AggregateStore
+
+
+def _alert(src, dst, ring, dist, ts):
+    return {"alert_id": f"a-{ts}", "bank_id": src, "matched_bank": dst, "ring_id": ring,
+            "distance": dist, "timestamp": ts}
+
+
+def test_incremental_aggregates():
+    agg = AggregateStore(horizon_s=60)
+    agg.update([{"event": "tx_processed", "bank_id": "bank1", "timestamp": 1000.0 + i / 10} for i in range(100)])
+    agg.update([{"event": "tx_processed", "bank_id": "bank2", "timestamp": 1005.0, "is_fraud": True}])
+    assert agg.totals("bank1") == {"tx": 100, "alerts": 0, "fraud": 0}
+    assert agg.tps("bank1", window_s=10) == 10.0
+
+    agg.update([_alert("bank1", "bank2", "r1", 0.1, 1001.0), _alert("bank1", "bank2", "r1", 0.2, 1002.0),
+                _alert("bank1", "bank3", "r1", 0.3, 1003.0), _alert("bank2", "bank1", "r2", 5.0, 1004.0)])
+    # five banks → matrix grows past its initial capacity
+    agg.update([_alert("bank4", "bank5", "r3", None, 1005.0)])
+
+    banks, m = agg.matrix()
+    assert banks == ["bank1", "bank2", "bank3", "bank4", "bank5"]
+    assert m[0, 1] == 2 and m[0, 2] == 1 and m[1, 0] == 1 and m[3, 4] == 1 and m.sum() == 5
+    assert ("bank1", "bank2", 2, 1) in agg.ring_edges()
+    assert agg.linked_rings == 3
+    assert agg.ring_members("r1") == ["bank1", "bank2", "bank3"]
+
+    edges, hist = agg.histogram()
+    assert hist.sum() == 4 and hist[-1] == 1          # 5.0 lands in the overflow bin
+    ts, dist = agg.timeline()
+    assert np.allclose(dist, [0.1, 0.2, 0.3, 5.0])
+
+
+def test_tps_buckets_roll_over():
+    agg = AggregateStore(horizon_s=10)
+    agg.update([{"event": "tx_processed", "bank_id": "b", "timestamp": 100.0}] * 5)
+    agg.update([{"event": "tx_processed", "bank_id": "b", "timestamp": 110.0}] * 2)   # same slot, newer second
+    agg.update([{"event": "tx_processed", "bank_id": "b", "timestamp": 100.0}])       # late event
+    assert agg.tps("b", window_s=10) == 0.2
+    assert agg.totals("b")["tx"] == 8
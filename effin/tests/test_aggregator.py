@@ -0,0 +1,65 @@
+import json
+import threading
+import urllib.request
+
+from cryptography.fernet import Fernet
+
+from effin.common.ledger import SegmentedLedger
+from effin.dashboard.aggregator import Aggregator, discover_banks, make_server
+
+FERNET = Fernet(Fernet.generate_key())
+
+
+def _write(tmp_path, bank, events):
+    ledger = SegmentedLedger(str(tmp_path / f"audit_{bank}.jsonl"))
+    ledger.append([FERNET.encrypt(json.dumps(e).encode()) for e in events], events[-1]["timestamp"])
+    ledger.close()
+
+
+def _tx(bank, ts):
+    return {"event": "tx_processed", "bank_id": bank, "tx_id": f"{bank}-{ts}", "timestamp": ts}
+
+
+def test_merges_banks_by_timestamp(tmp_path):
+    _write(tmp_path, "bank1", [_tx("bank1", t) for t in (100.0, 103.0, 106.0)])
+    _write(tmp_path, "bank2", [_tx("bank2", t) for t in (101.0, 102.0, 110.0)])
+    assert list(discover_banks(str(tmp_path))) == ["bank1", "bank2"]
+
+    agg = Aggregator(str(tmp_path), keys=lambda bank: FERNET, max_lag=5.0)
+    seen = []
+    agg.store.update = seen.extend
+
+    agg.poll(now=107.0)
+    # both banks active: the watermark is bank1's latest event (106), bank2's 110 waits
+    assert [e["timestamp"] for e in seen] == [100.0, 101.0, 102.0, 103.0, 106.0]
+
+    _write(tmp_path, "bank1", [_tx("bank1", 111.0)])
+    agg.poll(now=112.0)
+    assert [e["timestamp"] for e in seen][5:] == [110.0, 111.0]
+
+
+def test_snapshot_over_http(tmp_path):
+    _write(tmp_path, "bank1", [_tx("bank1", 100.0),
+                               {"alert_id": "a1", "bank_id": "bank1", "matched_bank": "bank3",
+                                "ring_id": "r1", "distance": 0.1, "timestamp": 100.5}])
+    _write(tmp_path, "bank3", [_tx("bank3", 99.0)])
+    with open(tmp_path / "audit_bank3.ledger" / "00000001.jsonl", "ab") as f:
+        f.write(b"garbage\n")
+
+    agg = Aggregator(str(tmp_path), keys=lambda bank: FERNET, max_lag=1.0)
+    agg.poll(now=1000.0)
+    server = make_server(agg, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/v1/snapshot?bank=bank3"
+        snap = json.loads(urllib.request.urlopen(url, timeout=5).read())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert snap["merged"] == 3 and snap["corrupted"] == {"bank1": 0, "bank3": 1}
+    assert [a["alert_id"] for a in snap["alerts"]] == ["a1"]
+    assert [t["tx_id"] for t in snap["txs"]] == ["bank3-99.0"]
+    # banks are numbered in merged (timestamp) order: bank3's tx came first
+    assert snap["aggregates"]["banks"] == ["bank3", "bank1"]
+    assert snap["aggregates"]["matrix"] == [[0, 0], [1, 0]]
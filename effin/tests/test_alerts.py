@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+
+from effin.node.alerts import NeighborBlock, loop_hits, make_results
+
+
+def test_ragged_rows_are_padded():
+    block = NeighborBlock([
+        [{"id": "a", "distance": 0.1, "metadata": {"bank_id": "bank2"}}],
+        [],
+        [{"id": "b", "distance": "0.2", "metadata": {"bank_id": "bank1"}},
+         {"id": "c", "similarity": 0.9}],
+    ])
+    assert block.shape == (3, 2)
+    assert block.valid.tolist() == [[True, False], [False, False], [True, True]]
+    assert block.ids[2, 1] == "c" and block.ids[0, 1] is None
+    assert np.isclose(block.distance[2, 0], 0.2) and np.isnan(block.distance[0, 1])
+    assert block.has_score.tolist() == [[False, False], [False, False], [False, True]]
+    # missing metadata is "another bank", padding never is
+    assert block.other_bank("bank1").tolist() == [[True, False], [False, False], [False, True]]
+    assert block.hits("bank1", 0.3, 0.7).tolist() == [[True, False], [False, False], [False, True]]
+
+
+def test_score_takes_precedence_over_distance():
+    block = NeighborBlock([[
+        {"id": "low-score", "distance": 0.0, "score": 0.5, "metadata": {"bank_id": "bank2"}},
+        {"id": "bad-score", "distance": 0.0, "score": "n/a", "metadata": {"bank_id": "bank2"}},
+        {"id": "bad-dist", "distance": "far", "metadata": {"bank_id": "bank2"}},
+        {"id": "zero-score", "distance": 0.1, "score": 0, "metadata": {"bank_id": "bank2"}},
+    ]])
+    # unparseable scores don't fall back to distance; a zero score does (score `or` similarity)
+    assert block.hits("bank1", 0.3, 0.7).tolist() == [[False, False, False, True]]
+
+
+def test_matches_the_neighbor_loop():
+    rng = random.Random(3)
+    for k in (1, 5, 50):
+        results = make_results(40, k, rng)
+        for group in results:
+            for nb in group:
+                if rng.random() < 0.2:
+                    nb["score"] = rng.choice([0.95, 0.1, None, "x"])
+        del results[5][k // 2:]
+        expect = [(i, nb["id"]) for i, nb in loop_hits(results, "bank1", 0.3, 0.7)]
+        rows, cols = np.nonzero(NeighborBlock(results).hits("bank1", 0.3, 0.7))
+        assert [(i, results[i][j]["id"]) for i, j in zip(rows.tolist(), cols.tolist())] == expect
+
+
+def test_other_bank_within_a_mask():
+    block = NeighborBlock([[{"id": "a", "distance": 0.1, "metadata": {"bank_id": "bank2"}},
+                            {"id": "b", "distance": 0.1, "metadata": {"bank_id": "bank1"}},
+                            {"id": "c", "distance": 0.9, "metadata": {"bank_id": "bank3"}}]])
+    assert block.other_bank("bank1", among=block.distance <= 0.5).tolist() == [[True, False, False]]
+    assert block.other_bank("bank1").tolist() == [[True, False, True]]
+    assert block.banks == ["bank2", "bank1", "bank3"]
@@ -0,0 +1,46 @@
+import json
+import threading
+
+from cryptography.fernet import Fernet
+
+from effin.common.audit import AuditWriter
+from effin.common.ledger import LedgerReader
+
+
+def _read(path, fernet):
+    return [json.loads(fernet.decrypt(t)) for t in LedgerReader(str(path)).tail(10 ** 6)]
+
+
+def test_writer_groups_and_flushes_everything_on_close(tmp_path):
+    fernet = Fernet(Fernet.generate_key())
+    path = tmp_path / "ledger" / "audit.jsonl"
+    w = AuditWriter(str(path), fernet, fsync_every=100, fsync_ms=0)
+
+    def produce(start):
+        for i in range(start, start + 500):
+            w.write({"n": i})
+
+    threads = [threading.Thread(target=produce, args=(k * 500,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    w.close()
+
+    events = _read(path, fernet)
+    assert sorted(e["n"] for e in events) == list(range(2000))
+
+
+def test_flush_makes_events_visible(tmp_path):
+    fernet = Fernet(Fernet.generate_key())
+    path = tmp_path / "audit.jsonl"
+    w = AuditWriter(str(path), fernet, fsync_every=0, fsync_ms=0, fmt="flat")
+    w.write({"event": "a"})
+    w.write({"event": "b"})
+    w.flush()
+    assert [e["event"] for e in _read(path, fernet)] == ["a", "b"]
+
+    w.write({"event": "c"})
+    w.close()
+    w.close()
+    assert [e["event"] for e in _read(path, fernet)] == ["a", "b", "c"]
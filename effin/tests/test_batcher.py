@@ -0,0 +1,35 @@
+# tests/test_batcher.py
+import pytest, asyncio, time
+from effin.node.batcher import MicroBatcher
+
+@pytest.mark.asyncio
+async def test_flushes_on_size_then_linger():
+    q = asyncio.Queue()
+    for i in range(5):
+        q.put_nowait(i)
+    b = MicroBatcher(q, max_size=3, linger_ms=20)
+    assert await b.next_batch() == [0, 1, 2]
+
+    t0 = time.monotonic()
+    assert await b.next_batch() == [3, 4]
+    assert time.monotonic() - t0 >= 0.015
+
+@pytest.mark.asyncio
+async def test_close_flushes_partial_batch():
+    q = asyncio.Queue()
+    b = MicroBatcher(q, max_size=10, linger_ms=10_000)
+    q.put_nowait("a")
+    task = asyncio.create_task(b.next_batch())
+    await asyncio.sleep(0.01)
+    b.close()
+    assert await asyncio.wait_for(task, 1) == ["a"]
+    assert await b.next_batch() is None
+
+def test_size_adapts_to_round_trip():
+    b = MicroBatcher(asyncio.Queue(), max_size=64, min_size=4, linger_ms=0, target_p99_s=0.1)
+    for _ in range(10):
+        b.observe_round_trip(0.5)
+    assert b.size == 48
+    for _ in range(200):
+        b.observe_round_trip(0.01)
+    assert b.size == 64
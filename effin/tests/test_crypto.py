@@ -0,0 +1,90 @@
+import base64
+import os
+
+import numpy as np
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+
+from effin.common.crypto import (  # noqa: E402
+    fernet, encrypt_vector_b64, decrypt_vector_b64, encrypt_vectors_b64, decrypt_vectors_b64,
+)
+
+
+def test_batch_vector_tokens_round_trip():
+    mat = np.random.default_rng(1).random((600, 32), dtype=np.float32)
+    fern = encrypt_vectors_b64(mat, "fernet", threads=2)
+    gcm = encrypt_vectors_b64(mat, "aesgcm")
+    assert len(set(fern)) == 600 and len(set(gcm)) == 600
+
+    # batched Fernet tokens are plain Fernet tokens
+    for k in (0, 1, 599):
+        assert np.array_equal(np.frombuffer(fernet.decrypt(fern[k].encode()), np.float32), mat[k])
+    for tokens in (fern, gcm, fern[:3] + gcm[3:]):
+        assert np.array_equal(decrypt_vectors_b64(tokens, threads=2), mat)
+    assert np.array_equal(decrypt_vector_b64(gcm[7]), mat[7])
+    assert np.array_equal(decrypt_vectors_b64([encrypt_vector_b64(mat[5])]), mat[5:6])
+    assert encrypt_vectors_b64(np.empty((0, 32), np.float32)) == []
+
+
+def _fernet_token(plain: bytes, pad: bytes) -> str:
+    """A correctly signed Fernet token around `plain` + `pad` (no padding check on our side)."""
+    import hashlib, hmac, struct, time
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    key = base64.urlsafe_b64decode(os.environ["FERNET_KEY"])
+    iv = os.urandom(16)
+    enc = Cipher(algorithms.AES(key[16:]), modes.CBC(iv)).encryptor()
+    body = struct.pack(">BQ", 0x80, int(time.time())) + iv + enc.update(plain + pad) + enc.finalize()
+    return base64.urlsafe_b64encode(body + hmac.new(key[:16], body, hashlib.sha256).digest()).decode()
+
+
+def test_vector_tokens_cross_check_with_fernet():
+    mat = np.random.default_rng(2).random((3, 32), dtype=np.float32)
+    tokens = [fernet.encrypt(row.tobytes()).decode() for row in mat]       # written by plain Fernet
+    assert np.array_equal(decrypt_vectors_b64(tokens), mat)
+    assert np.array_equal(decrypt_vectors_b64([_fernet_token(mat[0].tobytes(), bytes([16]) * 16)]), mat[:1])
+
+
+@pytest.mark.parametrize("mode", ["fernet", "aesgcm"])
+def test_batch_vector_tokens_reject_tampering(mode):
+    tokens = encrypt_vectors_b64(np.ones((4, 32), np.float32), mode)
+    for pos in (30, -1):                                # ciphertext, last byte of the HMAC / GCM tag
+        raw = bytearray(base64.urlsafe_b64decode(tokens[2]))
+        raw[pos] ^= 1
+        bad = tokens[:2] + [base64.urlsafe_b64encode(bytes(raw)).decode()] + tokens[3:]
+        with pytest.raises(InvalidToken):
+            decrypt_vectors_b64(bad)
+        with pytest.raises(InvalidToken):
+            decrypt_vector_b64(bad[2])
+
+
+@pytest.mark.parametrize("token", ["not-a-token", "gAAAA", "%%%%", "", "gQ", base64.urlsafe_b64encode(b"\x81" * 20).decode(),
+                                   base64.urlsafe_b64encode(b"\x82" * 40).decode(),
+                                   _fernet_token(b"x" * 128, bytes(15) + b"\x05")])      # signed, bad padding
+def test_malformed_vector_tokens_raise_invalid_token(token):
+    with pytest.raises(InvalidToken):
+        decrypt_vectors_b64([token])
+    with pytest.raises(InvalidToken):
+        decrypt_vector_b64(token)
+
+
+def test_gcm_tokens_rotate_their_subkey(monkeypatch):
+    import effin.common.crypto as crypto
+    monkeypatch.setattr(crypto, "GCM_KEY_MAX_TOKENS", 4)
+    monkeypatch.setattr(crypto, "_gcm_salt", b"")
+    mat = np.random.default_rng(3).random((3, 32), dtype=np.float32)
+    salts = [base64.urlsafe_b64decode(t)[1:17]
+             for t in encrypt_vectors_b64(mat, "aesgcm") + encrypt_vectors_b64(mat, "aesgcm")]
+    assert len(set(salts[:3])) == 1 and len(set(salts[3:])) == 1 and salts[0] != salts[3]   # 3 + 3 > 4
+
+    # tokens sealed before the per-salt subkeys (one HKDF key, no salt) still open
+    nonce = os.urandom(12)
+    old = base64.urlsafe_b64encode(b"\x81" + nonce + crypto._gcm_key(None).encrypt(nonce, mat[0].tobytes(), b"\x81"))
+    assert np.array_equal(decrypt_vector_b64(old.decode()), mat[0])
+
+
+def test_tokens_of_different_lengths_raise_invalid_token():
+    tokens = encrypt_vectors_b64(np.ones((2, 32), np.float32), "aesgcm") + encrypt_vectors_b64(np.ones((1, 16), np.float32))
+    with pytest.raises(InvalidToken):
+        decrypt_vectors_b64(tokens)
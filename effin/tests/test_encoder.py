@@ -8,3 +8,62 @@ def test_embed_shape():
     v = enc.embed_transaction(tx)
     assert v.shape[0] > 0
     assert isinstance(v, np.ndarray)
+
+def _sample_txs(n=64):
+    rng = np.random.default_rng(0)
+    merchants = ["GroceryMart", "CafeLux", "EvilMuleNetwork"]
+    return [{
+        "amount": float(rng.uniform(50, 5000)),
+        "merchant_category": merchants[i % 3],
+        "location": ["Mumbai", "Pune"][i % 2],
+        "device_fingerprint": f"dev{i % 5}",
+        "feature_signature": rng.normal(0, 0.1, 4).tolist(),
+        "is_fraud": bool(i % 7 == 0),
+    } for i in range(n)]
+
+def test_embed_batch_matches_single():
+    enc = FraudEncoder()
+    txs = _sample_txs() + [{}]
+    raw = enc.embed_batch(txs, normalize=False)
+    ref = np.stack([enc.embed_transaction(tx) for tx in txs])
+    assert raw.dtype == np.float32 and raw.shape == (len(txs), 32)
+    assert np.array_equal(raw, ref)
+
+    # normalization of a row does not depend on the rest of the batch
+    normed = enc.embed_batch(txs)
+    rows = np.concatenate([enc.embed_batch([tx]) for tx in txs])
+    assert np.array_equal(normed, rows)
+    assert np.allclose(np.linalg.norm(normed[:-1], axis=1), 1.0, atol=1e-6)
+
+def test_embed_batch_columns():
+    enc = FraudEncoder()
+    txs = _sample_txs()
+    cols = {k: [tx[k] for tx in txs] for k in txs[0]}
+    assert np.array_equal(enc.embed_batch(cols), enc.embed_batch(txs))
+
+def test_categorical_embedding_stable_across_processes():
+    import os, subprocess, sys
+    code = "from effin.encoder.model import FraudEncoder; print(FraudEncoder().embed_transaction({'merchant_category': 'CafeLux'}).tolist())"
+    outs = {
+        subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                       env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+        for seed in ("1", "2")
+    }
+    assert len(outs) == 1
+
+def test_exact_vocab_is_bounded():
+    enc = FraudEncoder(exact_vocab=True, max_vocab=8)
+    first = enc._embed_cat("dev0", enc.device_vocab).copy()
+    for i in range(100):
+        enc._embed_cat(f"dev{i}", enc.device_vocab)
+    assert len(enc.device_vocab) == 8
+    assert "dev0" not in enc.device_vocab
+    assert np.array_equal(enc._embed_cat("dev0", enc.device_vocab), first)
+
+
+def test_long_hash_key_is_accepted():
+    long_key = b"k" * 200
+    tx = {"merchant_category": "CafeLux", "location": "Pune", "device_fingerprint": "devA"}
+    a = FraudEncoder(hash_key=long_key).embed_transaction(tx)
+    assert np.array_equal(a, FraudEncoder(hash_key=long_key).embed_transaction(tx))
+    assert not np.array_equal(a, FraudEncoder(hash_key=long_key[:64]).embed_transaction(tx))
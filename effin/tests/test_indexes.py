@@ -0,0 +1,85 @@
+# tests/test_indexes.py
+import json
+import pytest
+from cryptography.fernet import Fernet
+from effin.node.indexes import IndexManager, IndexMismatch
+from effin.node.search import CyborgWrapper
+from effin.tools.stub_cyborgdb import StubCyborgDB
+
+
+@pytest.mark.asyncio
+async def test_keep_mode_reuses_existing_index():
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev")
+        mgr = IndexManager(cy, "idx")
+        assert await mgr.open("keep") == "idx"
+        await cy.batch_upsert("idx", [{"id": "a", "vector": [0.1] * 32, "metadata": {}}])
+
+        # a second node start keeps the vectors
+        assert await IndexManager(cy, "idx").open("keep") == "idx"
+        assert len(stub.indexes["idx"].ids) == 1 and stub.calls.get("/v1/indexes/delete", 0) == 0
+
+        await IndexManager(cy, "idx").open("recreate")
+        assert len(stub.indexes["idx"].ids) == 0
+        await cy.close()
+
+
+@pytest.mark.asyncio
+async def test_config_mismatch_is_refused():
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev")
+        await cy.create_index("idx", 64)
+        with pytest.raises(IndexMismatch):
+            await IndexManager(cy, "idx", dimension=32).open("keep")
+        await cy.close()
+
+
+@pytest.mark.asyncio
+async def test_latest_dual_writes_then_swaps():
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev")
+        await cy.create_index("idx__v1", 32)
+        mgr = IndexManager(cy, "idx", version="latest", swap_min_vectors=2)
+        assert await mgr.open("keep") == "idx__v1"
+
+        await cy.create_index("idx__v2", 32)
+        await mgr.refresh()
+        assert mgr.name == "idx__v1" and mgr.shadow == "idx__v2"
+
+        await cy.batch_upsert(mgr.shadow, [{"id": str(i), "vector": [0.1 * i] * 32, "metadata": {}} for i in range(2)])
+        await mgr.refresh()
+        assert mgr.name == "idx__v2" and mgr.shadow is None
+        await cy.close()
+
+
+@pytest.mark.asyncio
+async def test_swap_waits_for_backfill_to_cover_the_old_version(tmp_path, monkeypatch):
+    from effin.tools.index_admin import backfill, ledger_tx_ids
+    key = Fernet.generate_key()
+    monkeypatch.setenv("FERNET_KEY", key.decode())
+    ledger = str(tmp_path / "audit_bank1.jsonl")
+    with open(ledger, "wb") as f:
+        for i in range(5):
+            f.write(Fernet(key).encrypt(json.dumps({"event": "tx_processed", "bank_id": "bank1", "tx_id": f"t{i}"}).encode()) + b"\n")
+
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev")
+        await cy.create_index("idx__v1", 32)
+        await cy.batch_upsert("idx__v1", [{"id": f"t{i}", "vector": [0.1 * i] * 32, "metadata": {"bank_id": "bank1"}}
+                                          for i in range(5)])
+        mgr = IndexManager(cy, "idx", version="latest")
+        assert await mgr.open("keep") == "idx__v1"
+
+        await cy.create_index("idx__v2", 32)
+        await mgr.refresh()
+        new = [{"id": "t5", "vector": [0.7] * 32, "metadata": {}}]
+        for name in (mgr.name, mgr.shadow):          # one dual-written batch
+            await cy.batch_upsert(name, new)
+        await mgr.refresh()
+        assert mgr.name == "idx__v1"                 # v2 holds 1 of 6: t0..t4 would vanish from queries
+
+        assert await backfill(cy, mgr, ledger_tx_ids(ledger), 2) == 5
+        await mgr.refresh()
+        assert mgr.name == "idx__v2" and sorted(stub.indexes["idx__v2"].ids) == [f"t{i}" for i in range(6)]
+        assert stub.indexes["idx__v2"].meta[stub.indexes["idx__v2"].rows["t3"]] == {"bank_id": "bank1"}
+        await cy.close()
@@ -0,0 +1,202 @@
+# tests/test_ingest.py
+import pytest, asyncio, json
+from effin.node.ingest import (
+    OffsetTracker, FileTailSource, StdinSource, SocketSource, FrameSender, LocalBroker, BrokerSource, ack, open_source, parse_tx
+)
+from effin.node.pipeline import Pipeline, Stage
+
+
+def _drain(q):
+    out = []
+    while not q.empty():
+        out.append(q.get_nowait())
+    return out
+
+
+def _write(path, txs, mode="a"):
+    with open(path, mode) as f:
+        for tx in txs:
+            f.write(json.dumps(tx) + "\n")
+
+
+def test_tracker_commits_only_contiguous_acks():
+    t = OffsetTracker(0)
+    t.issue(10, 2)
+    t.issue(20, 1)
+    t.ack(20)
+    assert t.committed == 0          # offset 10 still has txs in flight
+    t.ack(10)
+    assert t.committed == 0
+    t.ack(10)
+    assert t.committed == 20 and t.in_flight == 0
+    t.issue(30, 0)                   # a chunk of bad records only
+    assert t.committed == 30
+
+
+@pytest.mark.asyncio
+async def test_file_tail_resumes_from_checkpoint(tmp_path):
+    log, ckpt = str(tmp_path / "tx.ndjson"), str(tmp_path / "tx.offset")
+    _write(log, [{"tx_id": f"t{i}", "amount": i} for i in range(5)], "w")
+    with open(log, "a") as f:
+        f.write("not json\n")
+
+    src = FileTailSource(log, ckpt, follow=False, chunk=16)     # one line per read
+    q = asyncio.Queue()
+    await src.run(q)
+    txs = _drain(q)
+    assert [tx["tx_id"] for tx in txs] == [f"t{i}" for i in range(5)]
+    assert all("timestamp" in tx for tx in txs)
+
+    ack(txs[:3])                     # crash with t3, t4 unprocessed
+    src.commit(src.snapshot())
+
+    _write(log, [{"amount": 99}])
+    src = FileTailSource(log, ckpt, follow=False)
+    await src.run(q)
+    again = _drain(q)
+    assert [tx["tx_id"] for tx in again][:2] == ["t3", "t4"]
+    assert len(again) == 3 and again[2]["amount"] == 99 and again[2]["tx_id"]
+
+
+def test_parse_tx_coerces_or_rejects():
+    tx = parse_tx(b'{"tx_id": 7, "timestamp": "1700000000.5", "amount": "12.5", "location": 3}', "d-0")
+    assert (tx["tx_id"], tx["timestamp"], tx["amount"], tx["location"]) == ("7", 1700000000.5, 12.5, "3")
+    assert tx["is_fraud"] is False and tx["bank_id"]
+    for bad in (b'{"amount": "abc"}', b'{"timestamp": "yesterday"}', b'{"amount": NaN}',
+                b'{"feature_signature": [1, 2]}', b'{"feature_signature": [1, 2, "x", 4]}', b'[1]'):
+        with pytest.raises(ValueError):
+            parse_tx(bad, "d-0")
+
+
+@pytest.mark.asyncio
+async def test_bad_records_do_not_stall_offsets(tmp_path):
+    log, ckpt = str(tmp_path / "tx.ndjson"), str(tmp_path / "tx.offset")
+    _write(log, [{"tx_id": "t0"}, {"tx_id": "t1", "amount": "lots"}, {"tx_id": "t2"}, {"tx_id": "boom"}, {"tx_id": "t4"}], "w")
+    src = FileTailSource(log, ckpt, follow=False, chunk=16)
+    q = asyncio.Queue()
+    await src.run(q)
+    txs = _drain(q)
+    assert [tx["tx_id"] for tx in txs] == ["t0", "t2", "boom", "t4"]     # t1 rejected at parse time
+
+    # a stage that raises on one batch: the pipeline hands it to on_drop, which acks it
+    batches = iter([[tx] for tx in txs])
+    dropped = []
+
+    async def source():
+        return next(batches, None)
+
+    def explode(batch):
+        if batch[0]["tx_id"] == "boom":
+            raise RuntimeError("poison")
+
+    def on_drop(batch, stage, exc):
+        dropped.append((stage, str(exc)))
+        ack(batch)
+
+    await Pipeline(source, [Stage("explode", explode), Stage("audit", ack)], on_drop=on_drop).run()
+    assert dropped == [("explode", "poison")]
+    assert src.tracker.in_flight == 0
+    assert src.snapshot() == len(open(log, "rb").read())
+
+
+@pytest.mark.asyncio
+async def test_stdin_reads_a_redirected_file_or_a_pipe(tmp_path):
+    import os
+    log = str(tmp_path / "tx.ndjson")
+    _write(log, [{"tx_id": f"t{i}", "amount": i} for i in range(2000)], "w")
+
+    with open(log, "rb") as f:                   # `python -m effin.node < tx.ndjson`
+        q = asyncio.Queue()
+        await StdinSource(f).run(q)
+    assert [tx["tx_id"] for tx in _drain(q)] == [f"t{i}" for i in range(2000)]
+
+    r, w = os.pipe()                             # `cat tx.ndjson | python -m effin.node`
+    with open(r, "rb", buffering=0) as rf:
+        with open(w, "wb") as wf:
+            wf.write(open(log, "rb").read()[:4096])
+        q = asyncio.Queue()
+        await StdinSource(rf).run(q)
+    txs = _drain(q)
+    assert txs and txs[0]["tx_id"] == "t0" and len(txs) < 2000
+
+
+@pytest.mark.asyncio
+async def test_file_tail_applies_backpressure(tmp_path):
+    log = str(tmp_path / "tx.ndjson")
+    _write(log, [{"tx_id": f"t{i}"} for i in range(50)], "w")
+    q = asyncio.Queue(maxsize=10)
+    task = asyncio.create_task(FileTailSource(log, follow=False).run(q))
+    await asyncio.sleep(0.05)
+    assert q.qsize() == 10 and not task.done()
+    got = []
+    while len(got) < 50:
+        got.append(await q.get())
+    await task
+    assert [tx["tx_id"] for tx in got] == [f"t{i}" for i in range(50)]
+
+
+@pytest.mark.asyncio
+async def test_socket_frames_are_acked_after_processing(tmp_path):
+    address = str(tmp_path / "ingest.sock")
+    src = SocketSource(address)
+    q = asyncio.Queue()
+    await src.start(q)
+    sender = FrameSender(address)
+    await sender.connect()
+    try:
+        await sender.send([{"tx_id": "a"}, {"tx_id": "b"}])
+        seq = await sender.send([{"tx_id": "c"}])
+        for _ in range(50):
+            if q.qsize() == 3:
+                break
+            await asyncio.sleep(0.01)
+        txs = _drain(q)
+        assert [tx["tx_id"] for tx in txs] == ["a", "b", "c"]
+
+        ack(txs[:1])
+        src.commit(src.snapshot())
+        await asyncio.sleep(0.05)
+        assert sender.acked == 0 and len(sender.unacked) == 2
+
+        ack(txs[1:])
+        src.commit(src.snapshot())
+        await sender.wait_acked(seq, timeout=2)
+        assert not sender.unacked
+    finally:
+        await sender.close()
+        src.server.close()
+
+
+@pytest.mark.asyncio
+async def test_broker_group_offsets(tmp_path):
+    broker = LocalBroker(str(tmp_path))
+    broker.produce("tx", [{"tx_id": "p0-a"}, {"tx_id": "p0-b"}], partition=0)
+    broker.produce("tx", [{"tx_id": "p1-a"}], partition=1)
+
+    src = open_source(f"broker:{tmp_path}/tx", group="bank1")
+    assert isinstance(src, BrokerSource) and sorted(src.parts) == [0, 1]
+    q = asyncio.Queue()
+    task = asyncio.create_task(src.run(q))
+    await asyncio.sleep(0.1)
+    txs = _drain(q)
+    assert sorted(tx["tx_id"] for tx in txs) == ["p0-a", "p0-b", "p1-a"]
+    ack(txs)
+    src.commit(src.snapshot())
+    task.cancel()
+
+    broker.produce("tx", [{"tx_id": "p0-c"}], partition=0)
+    src = BrokerSource(broker, "tx", "bank1")
+    task = asyncio.create_task(src.run(q))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    assert [tx["tx_id"] for tx in _drain(q)] == ["p0-c"]
+    # another group starts from the beginning
+    assert broker.committed("tx", "bank2") == {}
+
+
+def test_open_source_specs():
+    assert open_source("") is None and open_source("synthetic") is None
+    assert isinstance(open_source("file:/tmp/x.ndjson"), FileTailSource)
+    assert isinstance(open_source("tcp:127.0.0.1:9000"), SocketSource)
+    with pytest.raises(ValueError):
+        open_source("kafka:x")
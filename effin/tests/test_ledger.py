@@ -0,0 +1,98 @@
+import os
+
+from cryptography.fernet import Fernet
+
+from effin.common.ledger import LedgerFollower, LedgerReader, SegmentedLedger, ledger_dir, list_segments
+from effin.tools.migrate_ledger import migrate
+
+
+def _fill(path, n, per_group=10, t0=1000.0, **kw):
+    ledger = SegmentedLedger(path, **kw)
+    for g in range(0, n, per_group):
+        ledger.append([f"rec-{i}".encode() for i in range(g, min(n, g + per_group))], t0 + g)
+    ledger.close()
+
+
+def test_segments_roll_and_tail(tmp_path):
+    path = str(tmp_path / "audit_bank1.jsonl")
+    _fill(path, 1000, segment_bytes=2000)
+    assert len(list_segments(ledger_dir(path))) > 3
+
+    reader = LedgerReader(path)
+    assert reader.count() == 1000
+    assert reader.tail(3) == [b"rec-997", b"rec-998", b"rec-999"]
+    assert len(reader.tail(500)) == 500 and reader.tail(500)[0] == b"rec-500"
+    assert len(reader.tail(5000)) == 1000
+
+
+def test_time_range_and_reopen(tmp_path):
+    path = str(tmp_path / "audit_bank1.jsonl")
+    _fill(path, 100, segment_seconds=30)
+    # reopening continues the last segment (it is still within its time budget)
+    _fill(path, 10, t0=1095.0)
+
+    reader = LedgerReader(path)
+    got = list(reader.range(1020.0, 1039.0))
+    assert got == [f"rec-{i}".encode() for i in range(20, 40)]
+    assert len(list(reader.range(2000.0, 3000.0))) == 0
+    assert reader.tail(1) == [b"rec-9"]
+
+
+def test_unindexed_tail_lines_are_still_tailed(tmp_path):
+    path = str(tmp_path / "audit_bank1.jsonl")
+    _fill(path, 20)
+    seg = list_segments(ledger_dir(path))[-1]
+    with open(seg, "ab") as f:          # crash after data write, before index write
+        f.write(b"late\n")
+    assert LedgerReader(path).tail(2) == [b"rec-19", b"late"]
+
+    _fill(path, 1, t0=5000.0)           # writer starts a fresh segment
+    assert LedgerReader(path).tail(3) == [b"rec-19", b"late", b"rec-0"]
+
+
+def test_migrate_flat_ledger(tmp_path):
+    fernet = Fernet(Fernet.generate_key())
+    path = str(tmp_path / "audit_bank2.jsonl")
+    with open(path, "wb") as f:
+        for i in range(50):
+            f.write(fernet.encrypt(str(i).encode()) + b"\n")
+        f.write(b"garbage\n")
+
+    stats = migrate(path, fernet)
+    assert stats == {"records": 51, "corrupt": 1, "segments": 1}
+    assert not os.path.exists(path)
+    tail = LedgerReader(path).tail(2)
+    assert fernet.decrypt(tail[0]) == b"49" and tail[1] == b"garbage"
+
+
+def test_follower_decodes_only_new_records(tmp_path):
+    path = str(tmp_path / "audit_bank1.jsonl")
+    _fill(path, 1000, segment_bytes=2000)
+    follower = LedgerFollower(path, lambda t: {"rec": t.decode()}, window=100, min_interval=0)
+
+    events = follower.poll()
+    assert [e["rec"] for e in events] == [f"rec-{i}" for i in range(900, 1000)]
+    assert follower.decoded == 100
+
+    # new records cross a segment roll; only they are decoded
+    _fill(path, 30, t0=9000.0, segment_bytes=200)
+    events = follower.poll()
+    assert follower.decoded == 130
+    assert events[-1]["rec"] == "rec-29" and events[0]["rec"] == "rec-930"
+    assert follower.poll() == events and follower.decoded == 130
+
+
+def test_follower_flat_file_rotation(tmp_path):
+    path = str(tmp_path / "audit_bank3.jsonl")
+    with open(path, "wb") as f:
+        f.write(b"a\nb\nc")                      # "c" is still being written
+    follower = LedgerFollower(path, bytes.decode, window=10, min_interval=0)
+    assert follower.poll() == ["a", "b"]
+    with open(path, "ab") as f:
+        f.write(b"\nd\n")
+    assert follower.poll() == ["a", "b", "c", "d"]
+
+    os.replace(path, path + ".old")
+    with open(path, "wb") as f:
+        f.write(b"x\n")
+    assert follower.poll() == ["x"]
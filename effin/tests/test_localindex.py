@@ -0,0 +1,47 @@
+import numpy as np
+
+from effin.node.localindex import LocalIndex, IVFLocalIndex
+
+
+def test_ring_evicts_oldest():
+    idx = LocalIndex(dim=4, capacity=3)
+    for i in range(5):
+        idx.add(f"v{i}", np.full(4, i, dtype=np.float32), {"n": i})
+    assert len(idx) == 3
+    assert "v0" not in idx and "v1" not in idx and "v4" in idx
+
+    # re-adding a known id refreshes it in place
+    idx.add("v4", np.zeros(4, dtype=np.float32), {"n": 40})
+    assert len(idx) == 3
+    hit = idx.neighbors(np.zeros(4), top_k=1)[0][0]
+    assert hit["id"] == "v4" and hit["metadata"] == {"n": 40}
+
+
+def test_search_matches_brute_force():
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(500, 32)).astype(np.float32)
+    queries = rng.normal(size=(20, 32)).astype(np.float32)
+    idx = LocalIndex(dim=32, capacity=1000)
+    for i, v in enumerate(data):
+        idx.add(str(i), v, {})
+
+    dists, slots = idx.search(queries, top_k=5)
+    expect = np.argsort(((queries[:, None, :] - data[None, :, :]) ** 2).sum(-1), axis=1)[:, :5]
+    assert (slots == expect).all()
+    assert np.allclose(dists[:, 0], ((queries - data[expect[:, 0]]) ** 2).sum(1), atol=1e-3)
+
+    near = idx.neighbors(queries, top_k=5, max_distance=float(dists[0, 0]))
+    assert len(near[0]) == 1
+
+
+def test_ivf_finds_stored_vectors():
+    rng = np.random.default_rng(2)
+    data = rng.normal(size=(2000, 32)).astype(np.float32)
+    idx = IVFLocalIndex(dim=32, capacity=4096, nlist=16, nprobe=2, retrain_every=1000)
+    for i, v in enumerate(data):
+        idx.add(str(i), v, {})
+    assert idx.centroids is not None
+
+    dists, slots = idx.search(data[:50], top_k=1)
+    assert (slots[:, 0] == np.arange(50)).all()
+    assert np.allclose(dists[:, 0], 0.0, atol=1e-3)
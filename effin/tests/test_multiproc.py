@@ -0,0 +1,142 @@
+# tests/test_multiproc.py
+import pytest, asyncio, json, os
+from effin.node.ingest import OffsetTracker, SocketSource, ack
+from effin.node.multiproc import Router, partition, worker_env
+
+
+def test_partition_is_stable_and_spread():
+    txs = [{"tx_id": f"tx-{i}"} for i in range(4000)]
+    parts = partition(txs, 4)
+    assert sum(len(p) for p in parts) == 4000 and min(len(p) for p in parts) > 850
+    again = partition(list(reversed(txs)), 4)
+    assert [sorted(t["tx_id"] for t in p) for p in parts] == [sorted(t["tx_id"] for t in p) for p in again]
+
+
+def test_worker_env():
+    env0, env1 = worker_env(0, "/tmp/w0.sock"), worker_env(1, "/tmp/w1.sock")
+    assert env0["INGEST_SOURCE"] == "unix:/tmp/w0.sock" and env0["AUDIT_FILE"] != env1["AUDIT_FILE"]
+    assert "TRAIN_AFTER" not in env0 and env1["TRAIN_AFTER"] == "0"
+
+
+@pytest.mark.asyncio
+async def test_router_acks_source_after_workers(tmp_path):
+    paths = [str(tmp_path / f"w{i}.sock") for i in range(2)]
+    workers, queues = [SocketSource(p) for p in paths], [asyncio.Queue() for _ in paths]
+    for w, q in zip(workers, queues):
+        await w.start(q)
+    router = Router(paths, max_frames=4)
+    for s in router.senders:
+        await s.connect()
+
+    tracker = OffsetTracker(0)
+    txs = [{"tx_id": f"tx-{i}"} for i in range(20)]
+    tracker.issue(1, len(txs))
+    for tx in txs:
+        tx["_ack"] = (tracker, 1)
+    try:
+        await router.route(txs)
+        await asyncio.sleep(0.05)
+        got = [[queues[i].get_nowait() for _ in range(queues[i].qsize())] for i in range(2)]
+        assert sorted(tx["tx_id"] for g in got for tx in g) == sorted(tx["tx_id"] for tx in txs)
+        assert all("_ack" not in tx for tx in txs)
+
+        ack(got[0])                                  # worker 0 done, worker 1 not yet
+        for w in workers:
+            w.commit(w.snapshot())
+        await asyncio.sleep(0.05)
+        assert tracker.committed == 0
+
+        ack(got[1])
+        for w in workers:
+            w.commit(w.snapshot())
+        await router.drain(timeout=2)
+        assert tracker.committed == 1
+    finally:
+        await router.close()
+        for w in workers:
+            w.server.close()
+
+
+@pytest.mark.asyncio
+async def test_router_waits_for_late_acks_without_dead_lettering(tmp_path):
+    path, dead = str(tmp_path / "w0.sock"), str(tmp_path / "dead.ndjson")
+    worker, q = SocketSource(path), asyncio.Queue()
+    await worker.start(q)
+    router = Router([path], max_frames=2, frame_timeout=0.1, dead_letter=dead)
+    await router.senders[0].connect()
+
+    tracker = OffsetTracker(0)
+
+    async def slow_worker():
+        # frame 1 takes 0.35s; later frames are done at once but ride on its (cumulative) ack
+        await asyncio.sleep(0.35)
+        while True:
+            ack([q.get_nowait() for _ in range(q.qsize())])
+            worker.commit(worker.snapshot())
+            await asyncio.sleep(0.02)
+
+    try:
+        acker = asyncio.ensure_future(slow_worker())
+        for offset in (1, 2, 3):
+            tracker.issue(offset, 1)
+            await router.route([{"tx_id": f"tx-{offset}", "_ack": (tracker, offset)}])
+        await router.drain(timeout=2)
+        acker.cancel()
+        assert tracker.committed == 3 and not router.senders[0].unacked
+        assert router.stalls[0][1] >= 1 and not os.path.exists(dead)
+    finally:
+        await router.close()
+        worker.server.close()
+
+
+@pytest.mark.asyncio
+async def test_router_dead_letters_only_a_frame_that_stalls_restarted_workers(tmp_path):
+    path, dead = str(tmp_path / "w0.sock"), str(tmp_path / "dead.ndjson")
+    state = {"worker": SocketSource(path), "q": asyncio.Queue(), "restarts": 0}
+    await state["worker"].start(state["q"])
+    stuck = []
+    router = Router([path], max_frames=3, frame_timeout=0.1, dead_letter=dead, strikes=2, on_stuck=stuck.append)
+    await router.senders[0].connect()
+
+    async def restart():
+        # what Front.supervise does after kill_worker: the old process is gone, a new one gets the resends
+        state["worker"].server.close()
+        for w in list(state["worker"]._conns):
+            w.close()
+        router.worker_lost(0)
+        state["worker"], state["q"] = SocketSource(path), asyncio.Queue()
+        await state["worker"].start(state["q"])
+        await router.senders[0].connect()
+        state["restarts"] += 1
+
+    def process(skip):
+        # a worker that hangs on tx-1 and finishes everything else (acks stay behind tx-1)
+        got = [state["q"].get_nowait() for _ in range(state["q"].qsize())]
+        ack([tx for tx in got if tx["tx_id"] not in skip])
+        state["worker"].commit(state["worker"].snapshot())
+        return got
+
+    tracker = OffsetTracker(0)
+    try:
+        for offset in (1, 2, 3):
+            tracker.issue(offset, 1)
+            await router.route([{"tx_id": f"tx-{offset}", "_ack": (tracker, offset)}])
+        for _ in range(2):                           # frame 1 stalls two workers in a row
+            await asyncio.sleep(0.05)
+            process({"tx-1"})
+            while not stuck:
+                await asyncio.sleep(0.12)
+                router.check_stuck(0)
+            stuck.clear()
+            await restart()
+        await asyncio.sleep(0.05)
+        got = process(set())
+        await router.drain(timeout=2)
+
+        assert tracker.committed == 3 and not router.senders[0].unacked
+        assert sorted(tx["tx_id"] for tx in got) == ["tx-2", "tx-3"]      # the third worker never sees tx-1
+        with open(dead) as f:
+            assert [json.loads(line)["tx_id"] for line in f] == ["tx-1"]  # only the frame that stalled workers
+    finally:
+        await router.close()
+        state["worker"].server.close()
@@ -0,0 +1,28 @@
+# tests/test_pipeline.py
+import pytest, asyncio
+from effin.node.pipeline import Pipeline, Stage, parse_concurrency
+
+@pytest.mark.asyncio
+async def test_pipeline_runs_stages_in_order_and_drains():
+    items = iter(range(20))
+    seen = []
+
+    async def source():
+        return next(items, None)
+
+    async def slow_double(x):
+        await asyncio.sleep(0.001)
+        return x * 2
+
+    p = Pipeline(source, [
+        Stage("double", slow_double, concurrency=4),
+        Stage("filter", lambda x: None if x % 4 == 0 else False),
+        Stage("collect", seen.append),
+    ], queue_size=2)
+    await p.run()
+    assert sorted(seen) == [x * 2 for x in range(0, 20, 2)]
+
+def test_parse_concurrency():
+    assert parse_concurrency("query=4, upsert=3", {"query": 1, "upsert": 1, "audit": 1}) == {"query": 4, "upsert": 3, "audit": 1}
+    with pytest.raises(ValueError):
+        parse_concurrency("nope=1", {"query": 1})
@@ -0,0 +1,28 @@
+from effin.common.ratelimit import TokenBucket, KeyedRateLimiter, TTLSet
+
+
+def test_token_bucket_refills_up_to_burst():
+    b = TokenBucket(rate=2.0, burst=3.0, now=0.0)
+    assert [b.take(now=0.0) for _ in range(4)] == [True, True, True, False]
+    assert b.delay(now=0.0) == 0.5
+    assert b.take(now=0.5) and not b.take(now=0.5)
+    assert b.tokens <= 3.0 and b.take(now=100.0)
+    assert b.tokens == 2.0          # capped at burst before the take
+
+
+def test_keyed_limiter_is_per_key_and_bounded():
+    lim = KeyedRateLimiter(rate=1.0, burst=2.0, max_keys=2)
+    assert [lim.allow("r1", now=0.0) for _ in range(3)] == [True, True, False]
+    assert lim.allow("r2", now=0.0)
+    assert lim.allow("r3", now=0.0)          # evicts r1 (least recently used)
+    assert len(lim) == 2
+    assert lim.allow("r1", now=0.0)          # starts over with a full bucket
+
+
+def test_ttl_set_expires_and_evicts():
+    seen = TTLSet(ttl=10.0, max_keys=3)
+    assert seen.add("a", now=0.0) and not seen.add("a", now=5.0)
+    assert seen.add("a", now=10.0)           # expired, counts as new again
+    for k in "bcd":
+        seen.add(k, now=11.0)
+    assert len(seen) == 3 and seen.add("a", now=12.0)   # "a" was evicted as oldest
@@ -0,0 +1,55 @@
+from effin.common.rings import RingEngine
+
+
+def test_rings_merge_with_stable_ids():
+    eng = RingEngine(window_s=100)
+    r1 = eng.add_edge("a", "b", 0.0, "bank1", "bank2")
+    r2 = eng.add_edge("c", "d", 1.0, "bank1", "bank3")
+    assert r1 != r2
+    assert eng.add_edge("a", "e", 2.0, "bank1", "bank2") == r1
+
+    # joining the two rings keeps the older ID
+    assert eng.add_edge("e", "c", 3.0) == r1
+    info = eng.info("d")
+    assert info["ring_id"] == r1 and info["size"] == 5 and info["edges"] == 4
+    assert info["banks"] == ["bank1", "bank2", "bank3"] and info["bank_span"] == 3
+    assert (info["first_seen"], info["last_seen"]) == (0.0, 3.0)
+
+
+def test_window_expiry_splits_and_forgets():
+    eng = RingEngine(window_s=10)
+    r = eng.add_edge("a", "b", 0.0)
+    eng.add_edge("c", "d", 5.0)
+    eng.add_edge("b", "c", 6.0)
+    eng.add_edge("x", "y", 7.0)
+    big = eng.add_edge("d", "e", 8.0)
+    assert big == r and eng.info("e")["size"] == 5
+
+    eng.expire(now=10.5)            # a-b expired: 1 of 5, no rebuild yet
+    assert len(eng) == 7
+    eng.expire(now=16.5)            # c-d, b-c expired too: 3 ≥ 2 live → rebuild
+    assert eng.live_edges == 2 and len(eng) == 4
+    assert eng.ring_of("a") is None
+    assert eng.ring_of("d") == r    # surviving part keeps the ID
+    assert eng.ring_of("x") != r
+
+
+def test_bounded_edges():
+    eng = RingEngine(window_s=1e9, max_edges=1000)
+    for i in range(100_000):
+        eng.add_edge(f"t{i}", f"t{i + 1}", float(i))
+    assert eng.live_edges <= 1000 and len(eng) <= 2002
+    assert eng.info("t99999")["size"] == 1001
+
+
+def test_ring_ids_stable_across_cap_rebuilds():
+    eng = RingEngine(window_s=1e9, max_edges=3)
+    ring = eng.add_edge("hub", "t0", 0.0)
+    for i in range(1, 50):
+        # every edge touches the hub, so the live edges always form one ring
+        assert eng.add_edge("hub", f"t{i}", float(i)) == ring
+        assert eng.ring_of(f"t{i}") == ring
+    assert eng.live_edges <= 3 and eng.info("hub")["size"] <= 7     # rebuilt once half the edges expired
+
+    other = eng.add_edge("x", "y", 50.0)
+    assert other != ring and eng.add_edge("y", "z", 51.0) == other
@@ -9,3 +9,200 @@ async def test_create_and_upsert():
     res = await cy.upsert("test_index_unit", "id1", np.random.rand(32), {"k":"v"})
     assert "status" in res or res is not None
     await cy.close()
+
+@pytest.mark.asyncio
+async def test_upsert_and_query_filters_self_matches():
+    from effin.tools.stub_cyborgdb import StubCyborgDB
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev")
+        await cy.create_index("idx", 32)
+        vecs = np.random.default_rng(0).random((8, 32)).astype(np.float32)
+        items = [{"id": f"t{i}", "vector": v, "metadata": {"bank_id": "bank1"}} for i, v in enumerate(vecs)]
+        for concurrent in (False, True):
+            res = await cy.upsert_and_query("idx", items, top_k=3, concurrent=concurrent)
+            assert len(res["results"]) == 8
+            for it, group in zip(items, res["results"]):
+                assert len(group) == 3 and all(n["id"] != it["id"] for n in group)
+        assert stub.calls["/v1/vectors/upsert"] == 2
+        await cy.close()
+
+def test_json_backends_round_trip_exactly():
+    import json
+    from effin.node.search import dumps_matrix, orjson
+    mat = np.random.default_rng(1).normal(size=(16, 32)).astype(np.float32)
+    backends = ["stdlib", "numpy"] + (["orjson"] if orjson else [])
+    for backend in backends:
+        decoded = np.array(json.loads(dumps_matrix(mat, backend)), dtype=np.float32)
+        assert np.array_equal(decoded, mat), backend
+
+def test_dumps_matrix_is_valid_json_for_any_float():
+    import json
+    from effin.node.search import dumps_matrix, orjson
+    rng = np.random.default_rng(2)
+    bits = rng.integers(0, 2 ** 32, size=(256, 32), dtype=np.uint64).astype(np.uint32).view(np.float32)
+    edge = np.array([[0.0, -0.0, 1.0, 0.1, 1e-45, 3.4028235e38, -1.1754944e-38, 1e9, 123456789.0, 5e-1]],
+                    dtype=np.float32)
+    backends = ["stdlib", "numpy"] + (["orjson"] if orjson else [])
+    for mat in (bits[np.isfinite(bits).all(axis=1)], edge, edge.astype(np.float64)):
+        for backend in backends:
+            decoded = np.array(json.loads(dumps_matrix(mat, backend)), dtype=mat.dtype)
+            assert np.array_equal(decoded, mat), backend
+            if mat.dtype == np.float32:   # the wire dtype; %.17g writes -0.0 as -0
+                assert np.array_equal(np.signbit(decoded), np.signbit(mat)), backend
+
+    for bad in (np.nan, np.inf, -np.inf):
+        mat = np.ones((3, 4), dtype=np.float32)
+        mat[1, 2] = bad
+        for backend in backends:
+            with pytest.raises(ValueError, match=r"rows \[1\]"):
+                dumps_matrix(mat, backend)
+
+@pytest.mark.asyncio
+async def test_index_lifecycle_methods_share_one_pool():
+    from effin.tools.stub_cyborgdb import StubCyborgDB
+    with StubCyborgDB(latency_ms=5) as stub:
+        cy = CyborgWrapper(stub.url, "dev", max_connections=2)
+        assert await cy.delete_index("idx") is False
+        await cy.create_index("idx", 32)
+        assert "idx" in await cy.list_indexes()
+        vecs = np.random.default_rng(0).random((4, 32)).astype(np.float32)
+        # more concurrent calls than connections: they queue on the pool, none fail
+        await asyncio.gather(*(cy.upsert("idx", f"id{i}", v, {}) for i, v in enumerate(vecs)))
+        await cy.train_index("idx")
+        assert await cy.delete_index("idx") is True
+        assert cy._in_flight == 0
+        await cy.close()
+
+@pytest.mark.asyncio
+async def test_retries_recover_from_transient_faults():
+    from effin.tools.stub_cyborgdb import StubCyborgDB
+    from effin.node.search import RetryPolicy
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev", retry=RetryPolicy(attempts=3, base=0.001))
+        await cy.create_index("idx", 32)
+        stub.fail_next(2)
+        res = await cy.batch_query("idx", [np.zeros(32, dtype=np.float32)])
+        assert res["results"] == [[]]
+        assert stub.calls["/v1/vectors/query"] == 3
+        await cy.close()
+
+@pytest.mark.asyncio
+async def test_breaker_spills_upserts_and_replays_on_recovery():
+    from effin.tools.stub_cyborgdb import StubCyborgDB
+    from effin.node.search import RetryPolicy, CircuitBreaker, CircuitOpenError
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev", retry=RetryPolicy(attempts=1),
+                           breaker=CircuitBreaker(threshold=2, reset_timeout=0.05))
+        await cy.create_index("idx", 32)
+        vecs = np.random.default_rng(0).random((6, 32)).astype(np.float32)
+        items = [{"id": f"t{i}", "vector": v, "metadata": {}} for i, v in enumerate(vecs)]
+
+        stub.down = True
+        for chunk in (items[:2], items[2:4], items[4:]):
+            assert (await cy.batch_upsert("idx", chunk))["status"] == "spilled"
+        assert cy.breaker.is_open and len(cy.spill) == 6
+        with pytest.raises(CircuitOpenError):
+            await cy.batch_query("idx", vecs)
+
+        stub.down = False
+        await asyncio.sleep(0.06)
+        await cy.batch_query("idx", vecs[:1])       # probe succeeds → breaker closes → replay
+        await cy._replay_task
+        assert len(cy.spill) == 0
+        assert len(stub.indexes["idx"].ids) == 6
+        await cy.close()
+
+@pytest.mark.asyncio
+async def test_spill_survives_a_restart(tmp_path):
+    from effin.tools.stub_cyborgdb import StubCyborgDB
+    from effin.node.search import RetryPolicy, CircuitBreaker
+    path = str(tmp_path / "audit_bank1.spill")
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev", retry=RetryPolicy(attempts=1), spill_path=path)
+        await cy.create_index("idx", 32)
+        vecs = np.random.default_rng(0).random((5, 32)).astype(np.float32)
+        stub.down = True
+        assert (await cy.batch_upsert("idx", [{"id": f"t{i}", "vector": v, "metadata": {"k": i}}
+                                              for i, v in enumerate(vecs)]))["status"] == "spilled"
+        await cy.close()                            # "crash" with the breaker still open
+
+        stub.down = False
+        cy = CyborgWrapper(stub.url, "dev", breaker=CircuitBreaker(threshold=2), spill_path=path)
+        assert len(cy.spill) == 5 and np.array_equal(cy.spill[3][1]["vector"], vecs[3])
+        assert await cy.replay_spill() == 5
+        assert sorted(stub.indexes["idx"].ids) == [f"t{i}" for i in range(5)]
+        assert not os.path.exists(path)
+        await cy.close()
+
+@pytest.mark.asyncio
+async def test_full_spill_queue_backpressures_instead_of_dropping(tmp_path):
+    from effin.tools.stub_cyborgdb import StubCyborgDB
+    from effin.node.search import RetryPolicy, CircuitBreaker
+    path = str(tmp_path / "audit_bank1.spill")
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev", retry=RetryPolicy(attempts=1), spill_max=4, spill_path=path,
+                           breaker=CircuitBreaker(threshold=1, reset_timeout=0.02))
+        await cy.create_index("idx", 32)
+        vecs = np.random.default_rng(0).random((6, 32)).astype(np.float32)
+        items = [{"id": f"t{i}", "vector": v, "metadata": {}} for i, v in enumerate(vecs)]
+        stub.down = True
+        assert (await cy.batch_upsert("idx", items[:3]))["status"] == "spilled"
+
+        blocked = asyncio.ensure_future(cy.batch_upsert("idx", items[3:]))
+        await asyncio.sleep(0.1)
+        assert not blocked.done()                    # no room: not "spilled", so not acked
+        assert len(cy.spill) == 3 and len(open(path).readlines()) == 3
+
+        stub.down = False                            # the waiting spill's own replay drains the queue
+        assert (await asyncio.wait_for(blocked, 2))["status"] == "spilled"
+        assert [it["id"] for _, it in cy.spill] == ["t3", "t4", "t5"]
+        assert len(open(path).readlines()) == 3
+        assert await cy.replay_spill() == 3
+        assert sorted(stub.indexes["idx"].ids) == [f"t{i}" for i in range(6)] and not os.path.exists(path)
+        await cy.close()
+
+@pytest.mark.asyncio
+async def test_hedge_retrieves_the_losing_attempts_error():
+    import gc
+    loop = asyncio.get_running_loop()
+    unretrieved = []
+    loop.set_exception_handler(lambda _loop, ctx: unretrieved.append(ctx["message"]))
+    cy = CyborgWrapper("http://127.0.0.1:1", "dev", hedge_percentile=95)
+    cy.query_latency.percentile = lambda p: 0.001   # hedge after 1 ms, every time
+    for _ in range(50):
+        go = asyncio.Event()
+        outcomes = iter([RuntimeError("primary failed"), {"results": []}])
+
+        async def attempt(path, body, json_body):
+            outcome = next(outcomes)
+            await go.wait()                          # both attempts finish in the same wait round
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        cy._attempt = attempt
+        call = asyncio.ensure_future(cy._hedged("/v1/vectors/query", b"{}", None))
+        await asyncio.sleep(0.01)
+        go.set()
+        assert await call == {"results": []}
+    gc.collect()
+    await asyncio.sleep(0)
+    loop.set_exception_handler(None)
+    assert not unretrieved
+    await cy.close()
+
+@pytest.mark.asyncio
+async def test_hedged_query_beats_slow_primary():
+    import time
+    from effin.tools.stub_cyborgdb import StubCyborgDB
+    with StubCyborgDB() as stub:
+        cy = CyborgWrapper(stub.url, "dev", hedge_percentile=95)
+        await cy.create_index("idx", 32)
+        for _ in range(20):
+            cy.query_latency.observe(0.01)
+        stub.slow_next(1, ms=1000)
+        t0 = time.perf_counter()
+        await cy.query("idx", np.zeros(32, dtype=np.float32))
+        assert time.perf_counter() - t0 < 0.5
+        assert stub.calls["/v1/vectors/query"] == 2
+        await cy.close()
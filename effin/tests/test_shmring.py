@@ -0,0 +1,62 @@
+# tests/test_shmring.py
+import os
+import pytest, asyncio
+import numpy as np
+from cryptography.fernet import Fernet
+
+os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+
+from effin.common.crypto import hash_id_hex
+from effin.common.shmring import ShmRing
+from effin.encoder.model import FraudEncoder
+from effin.node.encodeproc import EncodeService
+from effin.node.loadgen import TxGenerator, to_txs
+
+
+def _txs(n, seed=3):
+    gen = TxGenerator("bank1", seed=seed)
+    return to_txs(gen.block(n), "bank1", gen.id_prefix)
+
+
+def test_slots_round_trip_through_attach():
+    ring = ShmRing.create(slots=3, rows=16, banks=["bank1", "bank2"])
+    other = ShmRing.attach(ring.name)
+    try:
+        txs = _txs(10)
+        txs[0]["merchant_category"] = "Café ☕"
+        del txs[1]["location"]
+        assert ring.write_txs(1, txs, "bank2")
+        assert other.count(1) == 10 and other.bank(1) == ["bank2"] * 10
+        assert other.strings(1, "tx_id") == [tx["tx_id"] for tx in txs]
+        cols = other.columns(1)
+        assert cols["merchant_category"][0] == "Café ☕" and cols["location"][1] == "unknown"
+        assert np.array_equal(cols["amount"], [tx["amount"] for tx in txs])
+
+        other.vectors(1)[:] = 2.0               # written on one side, seen on the other
+        assert ring.vectors(1).sum() == 2.0 * 10 * 32
+
+        assert not ring.write_txs(0, _txs(17), "bank1")                 # too many rows
+        assert not ring.write_txs(0, txs, "bank9")                      # unknown bank
+        assert not ring.write_txs(0, [{"tx_id": "x" * 3000}], "bank1")  # arena full
+    finally:
+        other.close()
+        ring.close()
+
+
+@pytest.mark.asyncio
+async def test_encoder_process_matches_in_process_encoding():
+    service = EncodeService(1, rows=64, slots=2, bank_id="bank1")
+    service.start()
+    try:
+        txs = _txs(50)
+        slot, vectors, refs = await service.encode(txs)
+        assert np.array_equal(vectors, FraudEncoder.from_env().embed_batch(txs))
+        assert refs == [hash_id_hex(tx["tx_id"]) for tx in txs]
+        assert service.free.qsize() == 1
+        service.release(slot)
+
+        assert await service.encode(_txs(65)) is None          # too large: encode in-process
+        assert service.free.qsize() == 2
+    finally:
+        del vectors
+        service.close()
@@ -0,0 +1,61 @@
+# tests/test_training.py
+import pytest, asyncio
+from effin.node.training import TrainScheduler
+
+
+def test_triggers_volume_recall_time():
+    async def train():
+        pass
+    s = TrainScheduler(train, after_vectors=100, every_s=0, min_recall=0.8, recall_min_samples=10, min_interval_s=0)
+    assert s.due() is None
+    s.record_upserts(99)
+    assert s.due() is None
+    s.record_upserts(1)
+    assert s.due() == "volume"
+
+    s = TrainScheduler(train, after_vectors=0, min_recall=0.8, recall_min_samples=10, min_interval_s=0)
+    s.record_recall(5, 2)
+    assert s.due() is None            # not enough samples yet
+    s.record_recall(5, 5)
+    assert s.recall == 0.7 and s.due() == "recall"
+
+    s = TrainScheduler(train, after_vectors=0, every_s=10, min_interval_s=0)
+    assert s.due(s.last_run + 20) is None      # nothing new to train on
+    s.record_upserts(1)
+    assert s.due(s.last_run + 5) is None and s.due(s.last_run + 20) == "time"
+
+
+@pytest.mark.asyncio
+async def test_single_run_in_flight_and_min_interval():
+    started, release = asyncio.Event(), asyncio.Event()
+    calls = []
+
+    async def train():
+        calls.append(1)
+        started.set()
+        await release.wait()
+
+    s = TrainScheduler(train, after_vectors=10, min_interval_s=60)
+    s.last_run -= 120
+    s.record_upserts(10)
+    task = asyncio.create_task(s.run(poll_s=0.01))
+    await asyncio.wait_for(started.wait(), 1)
+
+    s.record_upserts(50)                       # arrives mid-run
+    assert s.due() is None and not await s.run_once("volume")
+    release.set()
+    await asyncio.sleep(0.05)
+    assert len(calls) == 1 and s.runs == 1
+    assert s.pending == 50 and s.due() is None  # waits out min_interval
+    task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_failed_run_keeps_pending():
+    async def train():
+        raise RuntimeError("boom")
+
+    s = TrainScheduler(train, after_vectors=10, min_interval_s=0)
+    s.record_upserts(10)
+    assert not await s.run_once("volume")
+    assert s.pending == 10 and s.runs == 0
@@ -0,0 +1,58 @@
+# tools/benchmark_alerts.py
+"""
+Alert thresholding over a batch of query results: the old per-neighbor loop
+vs. NeighborBlock masks, at several top_k.
+
+    python -m effin.tools.benchmark_alerts --batch 256 --rounds 50
+
+On payloads of plain dicts both paths are bound by reading the fields out
+of Python objects; the old loop with DEBUG_MODE on (the default) also
+printed every neighbor, shown as "loop+debug" (printed to a buffer).
+"""
+import argparse, contextlib, io, random, time
+
+import numpy as np
+
+from effin.node import alerts
+from effin.node.alerts import NeighborBlock, make_results
+
+BANK_ID = "bank1"
+DIST, SIM = 0.3, 0.7
+
+
+def loop_hits(results, debug=False):
+    return alerts.loop_hits(results, BANK_ID, DIST, SIM, debug=debug)
+
+
+def block_hits(results):
+    block = NeighborBlock(results)
+    rows, cols = np.nonzero(block.hits(BANK_ID, DIST, SIM))
+    return [(i, block.rows[i][j]) for i, j in zip(rows.tolist(), cols.tolist())]
+
+
+def loop_debug_hits(results):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return loop_hits(results, debug=True)
+
+
+def run(batch, rounds, top_ks):
+    rng = random.Random(7)
+    for k in top_ks:
+        results = make_results(batch, k, rng)
+        assert len(loop_hits(results)) == len(block_hits(results))
+        for name, fn in (("loop+debug", loop_debug_hits), ("loop", loop_hits), ("numpy", block_hits)):
+            best = float("inf")
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                fn(results)
+                best = min(best, time.perf_counter() - t0)
+            print(f"top_k={k:<4} {name:<10}: {best * 1e3:8.3f} ms/batch  {batch * k / best / 1e6:6.2f} M neighbors/s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=256)
+    ap.add_argument("--rounds", type=int, default=50)
+    ap.add_argument("--top-k", type=int, nargs="+", default=[5, 50, 200])
+    args = ap.parse_args()
+    run(args.batch, args.rounds, args.top_k)
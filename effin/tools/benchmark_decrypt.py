@@ -0,0 +1,49 @@
+# tools/benchmark_decrypt.py
+"""
+Ledger decode throughput (decrypt + JSON parse) vs. process count.
+
+    FERNET_KEY=... python -m effin.tools.benchmark_decrypt --records 200000
+"""
+import argparse, json, os, tempfile, time, uuid
+
+from effin.common.crypto import fernet
+from effin.common.ledger_decode import LedgerDecoder
+
+
+def make_ledger(path, n):
+    with open(path, "wb") as f:
+        for i in range(n):
+            event = {"event": "tx_processed", "bank_id": "bank1", "tx_id": str(uuid.uuid4()),
+                     "timestamp": time.time(), "is_fraud": i % 50 == 0}
+            f.write(fernet.encrypt(json.dumps(event).encode()) + b"\n")
+
+
+def run(records, max_workers):
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "audit_bench.jsonl")
+        make_ledger(path, records)
+
+        # baseline: the dashboard's old one-token-at-a-time loop
+        t0 = time.perf_counter()
+        with open(path, "rb") as f:
+            for line in f:
+                json.loads(fernet.decrypt(line.strip()))
+        base = records / (time.perf_counter() - t0)
+        print(f"sequential loop : {base:10.0f} tokens/s")
+
+        workers = 1
+        while workers <= max_workers:
+            with LedgerDecoder(workers=workers) as dec:
+                t0 = time.perf_counter()
+                n = sum(1 for _ in dec.decode_file(path))
+                rate = n / (time.perf_counter() - t0)
+            print(f"workers={workers:<3}     : {rate:10.0f} tokens/s  ({rate / base:.2f}x)")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=int, default=100_000)
+    ap.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+    run(args.records, args.max_workers)
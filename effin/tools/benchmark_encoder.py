@@ -0,0 +1,37 @@
+# tools/benchmark_encoder.py
+import time, numpy as np
+from effin.encoder.model import FraudEncoder
+from effin.node.ingest import generate_transaction
+
+
+def per_tx_us(fn, n, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / n * 1e6
+
+
+def run():
+    enc = FraudEncoder()
+    print(f"{'N':>7} {'single us/tx':>14} {'batch us/tx':>13} {'speedup':>8}")
+    for n in (1, 32, 1024, 65536):
+        txs = [generate_transaction() for _ in range(n)]
+
+        def single():
+            # previous worker path: encode + normalize one vector at a time
+            for tx in txs:
+                v = enc.embed_transaction(tx)
+                v / (np.linalg.norm(v) + 1e-12)
+
+        def batch():
+            enc.embed_batch(txs)
+
+        s = per_tx_us(single, n, repeat=1 if n > 1024 else 3)
+        b = per_tx_us(batch, n)
+        print(f"{n:>7} {s:>14.2f} {b:>13.2f} {s / b:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,111 @@
+# tools/benchmark_front.py
+"""
+Routing cost of the multi-process front (effin.node.multiproc), alone:
+an NDJSON file is read and parsed by FileTailSource, partitioned and framed
+by Router / FrameSender, and sent to N sink processes that ack every frame
+as soon as they have parsed it (SocketSource, nothing scored or upserted).
+
+    python -m effin.tools.benchmark_front --txs 200000 --workers 1,2,4
+
+The front is one process on one core, so its CPU seconds per transaction
+bound the whole node: `front ceiling` is transactions / front CPU seconds.
+Multi-process mode scales until N workers together reach that ceiling; per
+worker node throughput comes from a single-process run (effin_tx_total).
+The wall-clock rate also includes the sinks, which share the cores here.
+"""
+import argparse, asyncio, json, multiprocessing as mp, os, tempfile, time
+
+from effin.node.ingest import FileTailSource, SocketSource, ack
+from effin.node.loadgen import TxGenerator, to_txs
+from effin.node.multiproc import Router, partition
+
+
+def _sink(path: str):
+    async def run():
+        src, q = SocketSource(path), asyncio.Queue()
+        await src.start(q)
+        while True:
+            txs = [await q.get()]
+            while not q.empty():
+                txs.append(q.get_nowait())
+            ack(txs)
+            src.commit(src.snapshot())
+    asyncio.run(run())
+
+
+def write_traffic(path: str, n: int):
+    gen = TxGenerator("bank1", seed=7)
+    with open(path, "w") as f:
+        for start in range(0, n, 10_000):
+            for tx in to_txs(gen.block(min(10_000, n - start)), "bank1", gen.id_prefix):
+                f.write(json.dumps(tx) + "\n")
+
+
+async def _route(path: str, socks, block: int):
+    router = Router(socks)
+    for sender in router.senders:
+        await sender.connect()
+    q = asyncio.Queue(maxsize=5000)
+    source = FileTailSource(path, follow=False)
+    t0, c0 = time.perf_counter(), time.process_time()
+    task = asyncio.create_task(router.run(q, block=block))
+    await source.run(q)
+    while not q.empty():
+        await asyncio.sleep(0.01)
+    await router.drain(timeout=60)
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+    task.cancel()
+    await router.close()
+    assert source.tracker.in_flight == 0, "frames left unacked"
+    return wall, cpu
+
+
+def bench(path: str, n: int, workers: int, block: int):
+    ctx = mp.get_context("spawn")
+    tmp = tempfile.mkdtemp(prefix="effin_front_")
+    socks = [os.path.join(tmp, f"w{i}.sock") for i in range(workers)]
+    procs = [ctx.Process(target=_sink, args=(s,), daemon=True) for s in socks]
+    for p in procs:
+        p.start()
+    while not all(os.path.exists(s) for s in socks):
+        time.sleep(0.05)
+    try:
+        return asyncio.run(_route(path, socks, block))
+    finally:
+        for p in procs:
+            p.kill()
+
+
+def breakdown(path: str, workers: int, limit: int = 50_000):
+    """Front CPU per transaction by step, in-process (µs)."""
+    from effin.node.ingest import _dumps, parse_tx
+    with open(path, "rb") as f:
+        lines = [line for _, line in zip(range(limit), f)]
+    t0 = time.process_time()
+    txs = [parse_tx(line, "x") for line in lines]
+    t1 = time.process_time()
+    parts = partition(txs, workers)
+    t2 = time.process_time()
+    for part in parts:
+        b"\n".join(map(_dumps, part))
+    t3 = time.process_time()
+    per = 1e6 / len(lines)
+    return (t1 - t0) * per, (t2 - t1) * per, (t3 - t2) * per
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--txs", type=int, default=200_000)
+    ap.add_argument("--workers", default="1,2,4")
+    ap.add_argument("--block", type=int, default=512)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="effin_front_"), "tx.ndjson")
+    write_traffic(path, args.txs)
+    parse_us, part_us, frame_us = breakdown(path, 2)
+    print(f"front CPU per tx: parse {parse_us:.1f} us | partition {part_us:.1f} us | frame encode {frame_us:.1f} us "
+          f"(cores here: {os.cpu_count()})")
+    print(f"{'workers':>7} {'wall tx/s':>10} {'front ceiling tx/s':>19}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        wall, cpu = bench(path, args.txs, workers, args.block)
+        print(f"{workers:>7} {args.txs / wall:>10.0f} {args.txs / cpu:>19.0f}")
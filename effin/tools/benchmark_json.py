@@ -0,0 +1,33 @@
+# tools/benchmark_json.py
+import time, json, numpy as np
+from effin.node.search import dumps_matrix, dumps_rows, upsert_items_json, orjson
+
+
+def per_batch_us(fn, repeat=200):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def run():
+    backends = ["stdlib", "numpy"] + (["orjson"] if orjson else [])
+    rng = np.random.default_rng(0)
+    for n in (32, 256, 1024):
+        mat = rng.normal(size=(n, 32)).astype(np.float32)
+        mat /= np.linalg.norm(mat, axis=1, keepdims=True)
+        items = [{"id": f"tx-{i}", "vector": v, "metadata": {"bank_id": "bank1"}} for i, v in enumerate(mat)]
+
+        # previous path: .tolist() per vector, then httpx runs stdlib json over the payload
+        legacy = lambda: json.dumps({"query_vectors": [v.tolist() for v in mat]}).encode()
+        print(f"N={n}: legacy query body {len(legacy())} bytes, {per_batch_us(legacy):8.1f} us")
+
+        for b in backends:
+            q = lambda: dumps_matrix(mat, b)
+            u = lambda: upsert_items_json(items, dumps_rows(mat, b), b)
+            print(f"  {b:<7} query {len(q()):>7} bytes {per_batch_us(q):8.1f} us | "
+                  f"upsert items {len(u()):>7} bytes {per_batch_us(u):8.1f} us")
+
+
+if __name__ == "__main__":
+    run()
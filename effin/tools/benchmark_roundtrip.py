@@ -0,0 +1,45 @@
+# tools/benchmark_roundtrip.py
+import time, numpy as np, asyncio, argparse
+from effin.node.search import CyborgWrapper
+from effin.tools.stub_cyborgdb import StubCyborgDB
+
+
+async def run(batches=50, batch_size=32, latency_ms=5.0):
+    with StubCyborgDB(latency_ms=latency_ms) as stub:
+        cy = CyborgWrapper(stub.url, "dev")
+        await cy.create_index("bench", 32)
+        rng = np.random.default_rng(0)
+
+        def make_items(tag):
+            vecs = rng.random((batch_size, 32)).astype(np.float32)
+            return [{"id": f"{tag}-{i}", "vector": v, "metadata": {"bank_id": "bank1"}} for i, v in enumerate(vecs)]
+
+        async def sequential(items):
+            await cy.batch_upsert("bench", items)
+            await cy.batch_query("bench", [it["vector"] for it in items], top_k=5)
+
+        modes = {
+            "sequential (upsert, then query)": sequential,
+            "upsert_and_query concurrent=False": lambda items: cy.upsert_and_query("bench", items, concurrent=False),
+            "upsert_and_query concurrent=True": lambda items: cy.upsert_and_query("bench", items),
+        }
+        print(f"{batches} batches x {batch_size} vectors, stub latency {latency_ms} ms/request")
+        for name, fn in modes.items():
+            lat = []
+            for b in range(batches):
+                items = make_items(f"{name[:3]}{b}")
+                t0 = time.perf_counter()
+                await fn(items)
+                lat.append(time.perf_counter() - t0)
+            lat = np.array(lat) * 1000
+            print(f"{name:<36} p50 {np.percentile(lat, 50):7.2f} ms  p95 {np.percentile(lat, 95):7.2f} ms")
+        await cy.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batches", type=int, default=50)
+    ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--latency-ms", type=float, default=5.0)
+    a = ap.parse_args()
+    asyncio.run(run(a.batches, a.batch_size, a.latency_ms))
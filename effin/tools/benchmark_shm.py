@@ -0,0 +1,95 @@
+# tools/benchmark_shm.py
+"""
+Round trip of one batch to an encoder process and back, transport only:
+tx dicts out, (N, 32) float32 embeddings + tx_refs back. Pickled through a
+multiprocessing Pipe vs. a ShmRing slot with only the slot index on the pipe.
+
+    python -m effin.tools.benchmark_shm --rows 32,256,1024 --rounds 500
+
+Neither side encodes: the "encoder" reads the inputs it would need (the
+strings, for tx_refs) and returns a precomputed matrix, so the numbers are
+the cost of moving the batch.
+"""
+import argparse, multiprocessing as mp, time
+
+import numpy as np
+
+from effin.common.shmring import ShmRing
+from effin.node.loadgen import TxGenerator, to_txs
+
+
+def _pickled_encoder(conn, rows):
+    out = np.random.default_rng(0).random((rows, 32), dtype=np.float32)
+    while True:
+        txs = conn.recv()
+        if txs is None:
+            return
+        refs = [tx["tx_id"][-12:] for tx in txs]
+        conn.send((out[:len(txs)], refs))
+
+
+def _ring_encoder(conn, name):
+    ring = ShmRing.attach(name)
+    out = np.random.default_rng(0).random((ring.rows, 32), dtype=np.float32)
+    try:
+        while True:
+            i = conn.recv()
+            if i is None:
+                return
+            ids = ring.strings(i, "tx_id")
+            ring.vectors(i)[:] = out[:len(ids)]
+            ring.meta(i)["tx_ref"] = [t[-12:].encode() for t in ids]
+            conn.send(i)
+    finally:
+        ring.close()
+
+
+def bench(rows, rounds):
+    ctx = mp.get_context("spawn")
+    gen = TxGenerator("bank1", seed=7)
+    txs = to_txs(gen.block(rows), "bank1", gen.id_prefix)
+
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_pickled_encoder, args=(child, rows), daemon=True)
+    proc.start()
+    parent.send(txs), parent.recv()     # warm-up
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        parent.send(txs)
+        vectors, refs = parent.recv()
+        float(vectors[:, 0].sum())
+    pickled = rounds / (time.perf_counter() - t0)
+    parent.send(None)
+    proc.join()
+
+    ring = ShmRing.create(slots=4, rows=rows, banks=["bank1"])
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_ring_encoder, args=(child, ring.name), daemon=True)
+    proc.start()
+    t0 = None
+    for r in range(rounds + 1):
+        if r == 1:
+            t0 = time.perf_counter()
+        i = r % ring.slots
+        ring.write_txs(i, txs, "bank1")
+        parent.send(i)
+        parent.recv()
+        float(ring.vectors(i)[:, 0].sum())
+        [x.decode() for x in ring.meta(i)["tx_ref"].tolist()]
+    shm = rounds / (time.perf_counter() - t0)
+    parent.send(None)
+    proc.join()
+    ring.close()
+    return pickled, shm
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", default="32,256,1024")
+    ap.add_argument("--rounds", type=int, default=500)
+    args = ap.parse_args()
+
+    print(f"{'rows':>6} {'pickled batch/s':>16} {'ring slot batch/s':>18} {'speedup':>8}")
+    for rows in (int(r) for r in args.rows.split(",")):
+        pickled, shm = bench(rows, args.rounds)
+        print(f"{rows:>6} {pickled:>16.0f} {shm:>18.0f} {shm / pickled:>7.2f}x")
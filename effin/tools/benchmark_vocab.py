@@ -0,0 +1,54 @@
+# tools/benchmark_vocab.py
+import time, tracemalloc, numpy as np
+from effin.encoder.vocab import CategoricalTable
+
+
+def legacy_embed_cat(value, vocab, size=4):
+    # previous FraudEncoder._embed_cat: one RNG per new value, unbounded dict
+    if value not in vocab:
+        seed = abs(hash(value)) % (2**32)
+        rng = np.random.default_rng(seed)
+        vocab[value] = rng.uniform(-0.5, 0.5, size)
+    return vocab[value]
+
+
+def measure(name, lookup, values):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for v in values:
+        lookup(v)
+    miss = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    for v in values:
+        lookup(v)
+    hit = time.perf_counter() - t0
+
+    n = len(values)
+    print(f"{name:<22} first-seen {miss / n * 1e6:7.2f} us  repeat {hit / n * 1e6:6.2f} us  "
+          f"retained {retained / 1e6:7.2f} MB  peak {peak / 1e6:7.2f} MB")
+
+
+def run(n=200_000):
+    values = [f"device-{i}" for i in range(n)]
+    print(f"{n} distinct device fingerprints")
+
+    legacy = {}
+    measure("legacy dict + RNG", lambda v: legacy_embed_cat(v, legacy), values)
+
+    hashed = CategoricalTable("device")
+    measure("hashed (16384 rows)", hashed.lookup, values)
+
+    exact = CategoricalTable("device", exact=True, max_entries=50_000)
+    measure("exact LRU (50k)", exact.lookup, values)
+
+    t0 = time.perf_counter()
+    hashed.lookup_many(values)
+    print(f"{'hashed lookup_many':<22} {(time.perf_counter() - t0) / n * 1e6:7.2f} us/value")
+
+
+if __name__ == "__main__":
+    run()
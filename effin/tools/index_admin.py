@@ -0,0 +1,99 @@
+# tools/index_admin.py
+"""
+Inspect and manage versions of the shared index (see effin.node.indexes).
+
+    python -m effin.tools.index_admin list
+    python -m effin.tools.index_admin create --version 2     # nodes on INDEX_VERSION=latest start dual-writing
+    python -m effin.tools.index_admin backfill --version 2 --ledger audit_bank1.jsonl   # once per bank
+    python -m effin.tools.index_admin drop --version 1       # once every node has swapped
+
+backfill copies a bank's earlier vectors (the tx_ids in its audit ledger)
+from the version the nodes query into the new one; nodes swap only once the
+new version holds as many vectors as the old. It copies vectors as they
+are: moving to a different embedding means replaying the transactions into
+nodes running the new encoder instead.
+
+Uses CYBORGDB_ENDPOINT / CYBORGDB_API_KEY / INDEX_KEY / INDEX_NAME / FERNET_KEY like the nodes.
+"""
+import argparse, asyncio, os
+
+from effin.common.ledger_decode import LedgerDecoder
+from effin.node.indexes import IndexManager
+from effin.node.search import CyborgWrapper
+
+
+def ledger_tx_ids(path: str, bank_id: str = "") -> list:
+    """tx_ids the ledger records as processed (first occurrence order)."""
+    seen = {}
+    with LedgerDecoder(workers=1) as dec:
+        for event in dec.decode_ledger(path):
+            if event.get("event") == "tx_processed" and (not bank_id or event.get("bank_id") == bank_id):
+                seen.setdefault(str(event["tx_id"]), None)
+        if dec.corrupted:
+            print(f"[WARN] {dec.corrupted} ledger lines could not be decoded — their txs are not copied.")
+    return list(seen)
+
+
+async def backfill(cy, mgr: IndexManager, ids: list, target: int, source=None, chunk: int = 256) -> int:
+    """Copy `ids` from version `source` (default: the newest below `target`) into `target`."""
+    existing = await mgr.versions()
+    if target not in existing:
+        raise SystemExit(f"v{target} does not exist")
+    if source is None:
+        older = [v for v in existing if v < target]
+        if not older:
+            raise SystemExit(f"no version below v{target} to copy from")
+        source = max(older)
+    src, dst = existing[source], existing[target]
+    copied = 0
+    for i in range(0, len(ids), chunk):
+        items = await cy.get_vectors(src, ids[i:i + chunk])
+        if items:
+            await cy.batch_upsert(dst, items, spill_on_failure=False)
+            copied += len(items)
+    print(f"[SUCCESS] Copied {copied} of {len(ids)} vectors '{src}' → '{dst}'.")
+    return copied
+
+
+async def run(args):
+    cy = CyborgWrapper(os.getenv("CYBORGDB_ENDPOINT"), os.getenv("CYBORGDB_API_KEY"), index_key=os.getenv("INDEX_KEY", ""))
+    mgr = IndexManager(cy, args.alias, dimension=args.dimension, index_type=args.type)
+    try:
+        if args.cmd == "list":
+            for version, name in (await mgr.versions()).items():
+                info = await cy.describe_index(name) or {}
+                bad = mgr.mismatches(info)
+                print(f"v{version:<3} {name:<40} vectors={info.get('num_vectors', '?'):<10} "
+                      f"config={info.get('index_config')}{'  MISMATCH ' + ', '.join(bad) if bad else ''}")
+        elif args.cmd == "create":
+            existing = await mgr.versions()
+            version = args.version or max(existing, default=0) + 1
+            if version in existing:
+                raise SystemExit(f"v{version} already exists")
+            await cy.create_index(mgr.physical(version), args.dimension, dict(mgr.config))
+        elif args.cmd == "backfill":
+            if not args.version:
+                raise SystemExit("backfill needs --version (the new version)")
+            ids = ledger_tx_ids(args.ledger, args.bank)
+            await backfill(cy, mgr, ids, args.version, args.source)
+        elif args.cmd == "drop":
+            name = mgr.physical(args.version)
+            if not await cy.delete_index(name):
+                raise SystemExit(f"{name} not found")
+            print(f"[SUCCESS] Dropped '{name}'.")
+    finally:
+        await cy.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["list", "create", "backfill", "drop"])
+    ap.add_argument("--alias", default=os.getenv("INDEX_NAME", "effin_global_fraud_index"))
+    ap.add_argument("--version", type=int, default=0, help="create: next free if omitted; drop: 0 = unversioned")
+    ap.add_argument("--dimension", type=int, default=32)
+    ap.add_argument("--type", default="ivfflat")
+    ap.add_argument("--ledger", default=os.getenv("AUDIT_FILE", f"audit_{os.getenv('BANK_ID', 'bank1')}.jsonl"),
+                    help="backfill: this bank's audit ledger")
+    ap.add_argument("--bank", default="", help="backfill: only this bank_id's txs (default: all in the ledger)")
+    ap.add_argument("--source", type=int, default=None, help="backfill: version to copy from (default: newest below --version)")
+    asyncio.run(run(ap.parse_args()))
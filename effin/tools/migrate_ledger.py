@@ -0,0 +1,71 @@
+# tools/migrate_ledger.py
+"""
+Convert a flat Fernet JSONL audit ledger into the segmented, indexed format.
+
+    FERNET_KEY=... python -m effin.tools.migrate_ledger audit_bank1.jsonl
+
+Record timestamps come from the Fernet tokens themselves (write time, to the
+second). Lines that fail authentication are kept, stamped with the previous
+record's time, and counted. The flat file is renamed to `<path>.migrated`
+afterwards (LedgerReader would otherwise read it as the oldest segment).
+"""
+import argparse, os, time
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from effin.common.ledger import SegmentedLedger, ledger_dir, list_segments
+
+
+def migrate(path: str, fernet: Fernet, segment_bytes: int = 64 << 20, segment_seconds: float = 3600.0,
+            keep: bool = False) -> dict:
+    if list_segments(ledger_dir(path)):
+        raise RuntimeError(f"{ledger_dir(path)} already has segments; refusing to mix histories")
+
+    ledger = SegmentedLedger(path, segment_bytes, segment_seconds)
+    records = corrupt = 0
+    group, group_ts, last_ts = [], None, 0.0
+    with open(path, "rb") as f:
+        for line in f:
+            token = line.strip()
+            if not token:
+                continue
+            try:
+                ts = float(fernet.extract_timestamp(token))
+            except InvalidToken:
+                corrupt += 1
+                ts = last_ts
+            ts = max(ts, last_ts)       # keep the index sorted
+            if group and (ts != group_ts or len(group) >= 1000):
+                ledger.append(group, group_ts)
+                group = []
+            group.append(token)
+            group_ts = last_ts = ts
+            records += 1
+    if group:
+        ledger.append(group, group_ts)
+    ledger.sync()
+    ledger.close()
+
+    if not keep:
+        os.replace(path, path + ".migrated")
+    return {"records": records, "corrupt": corrupt, "segments": len(list_segments(ledger_dir(path)))}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="+", help="flat ledger files, e.g. audit_bank1.jsonl")
+    ap.add_argument("--segment-mb", type=float, default=64)
+    ap.add_argument("--segment-s", type=float, default=3600)
+    ap.add_argument("--keep", action="store_true", help="leave the flat file in place")
+    args = ap.parse_args()
+
+    key = os.getenv("FERNET_KEY")
+    if not key:
+        raise SystemExit("FERNET_KEY missing")
+    fernet = Fernet(key.encode())
+
+    for p in args.paths:
+        t0 = time.perf_counter()
+        stats = migrate(p, fernet, int(args.segment_mb * (1 << 20)), args.segment_s, args.keep)
+        print(f"[SUCCESS] {p} → {ledger_dir(p)}: {stats['records']} records "
+              f"({stats['corrupt']} corrupt) in {stats['segments']} segments, {time.perf_counter() - t0:.1f}s")
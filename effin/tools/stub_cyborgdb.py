@@ -0,0 +1,206 @@
+# tools/stub_cyborgdb.py
+"""
+In-memory stand-in for the CyborgDB REST service (plain brute-force numpy).
+Used by benchmarks and tests; not encrypted, not for real data.
+
+    python -m effin.tools.stub_cyborgdb --port 8000 --latency-ms 5
+"""
+import argparse, json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class _Index:
+    def __init__(self, config: dict):
+        self.config = config
+        self.dim = int(config.get("dimension", 32))
+        self.rows = {}          # id -> position
+        self.ids = []
+        self.meta = []
+        self.vecs = np.empty((0, self.dim), dtype=np.float32)
+        self.trained = 0
+
+    def upsert(self, items):
+        new = []
+        for it in items:
+            vec = np.asarray(it["vector"], dtype=np.float32)
+            pos = self.rows.get(it["id"])
+            if pos is None:
+                self.rows[it["id"]] = len(self.ids) + len(new)
+                new.append((it["id"], vec, it.get("metadata", {})))
+            else:
+                self.vecs[pos] = vec
+                self.meta[pos] = it.get("metadata", {})
+        if new:
+            self.ids += [n[0] for n in new]
+            self.meta += [n[2] for n in new]
+            self.vecs = np.vstack([self.vecs, np.stack([n[1] for n in new])])
+
+    def get(self, ids):
+        rows = [(i, self.rows[i]) for i in ids if i in self.rows]
+        return [{"id": i, "vector": self.vecs[pos].tolist(), "metadata": self.meta[pos]} for i, pos in rows]
+
+    def query(self, queries, top_k):
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if not self.ids:
+            return [[] for _ in q]
+        d = (q * q).sum(1)[:, None] + (self.vecs * self.vecs).sum(1)[None, :] - 2.0 * q @ self.vecs.T
+        np.maximum(d, 0.0, out=d)
+        k = min(top_k, len(self.ids))
+        part = np.argpartition(d, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(part, np.argsort(np.take_along_axis(d, part, 1), axis=1), 1)
+        return [
+            [{"id": self.ids[j], "distance": float(d[i, j]), "metadata": self.meta[j]} for j in row]
+            for i, row in enumerate(order)
+        ]
+
+
+class StubCyborgDB:
+    """
+    Threaded HTTP stub. `latency_ms` delays every response.
+    `calls` counts requests per path.
+
+    Fault injection (for resilience tests):
+      - fail_rate: fraction of requests answered with 503
+      - fail_next(n): the next n requests get 503
+      - slow_next(n, ms): the next n requests are delayed by `ms`
+      - down = True: every request gets 503 until cleared
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 fail_rate: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.fail_rate = fail_rate
+        self.down = False
+        self._fail_next = 0
+        self._slow_next = []
+        self._rng = random.Random(seed)
+        self.indexes = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fail_next(self, n: int = 1):
+        with self._lock:
+            self._fail_next += n
+
+    def slow_next(self, n: int = 1, ms: float = 500.0):
+        with self._lock:
+            self._slow_next += [ms / 1000.0] * n
+
+    def _fault(self):
+        """(status or None, extra delay) for the request being served."""
+        with self._lock:
+            delay = self._slow_next.pop(0) if self._slow_next else 0.0
+            if self.down or self._fail_next or self._rng.random() < self.fail_rate:
+                self._fail_next = max(0, self._fail_next - 1)
+                return 503, delay
+        return None, delay
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ----------------------------------------------
+    # Routing
+    # ----------------------------------------------
+    def handle(self, path: str, body: dict):
+        """Returns (status, json-able response)."""
+        name = body.get("index_name")
+        with self._lock:
+            if path == "/v1/indexes/list":
+                return 200, {"indexes": list(self.indexes)}
+            if path == "/v1/indexes/create":
+                if name in self.indexes:
+                    return 409, {"detail": "exists"}
+                self.indexes[name] = _Index(body.get("index_config") or {})
+                return 200, {"status": "success"}
+            if path == "/v1/indexes/describe":
+                if name not in self.indexes:
+                    return 404, {"detail": "not found"}
+                idx = self.indexes[name]
+                return 200, {"index_name": name, "index_config": idx.config, "num_vectors": len(idx.ids)}
+            if path == "/v1/indexes/delete":
+                if self.indexes.pop(name, None) is None:
+                    return 404, {"detail": "not found"}
+                return 200, {"status": "success"}
+
+            idx = self.indexes.get(name)
+            if idx is None:
+                return 404, {"detail": f"index '{name}' not found"}
+            if path == "/v1/indexes/train":
+                idx.trained = len(idx.ids)
+                return 200, {"status": "success"}
+            if path == "/v1/vectors/upsert":
+                idx.upsert(body.get("items", []))
+                return 200, {"status": "success", "upserted_count": len(body.get("items", []))}
+            if path == "/v1/vectors/query":
+                return 200, {"results": idx.query(body["query_vectors"], int(body.get("top_k", 5)))}
+            if path == "/v1/vectors/get":
+                return 200, {"results": idx.get(body.get("ids", []))}
+        return 404, {"detail": "unknown path"}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True   # keep-alive + small writes would hit delayed ACKs
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.calls[self.path] = stub.calls.get(self.path, 0) + 1
+                fault, delay = stub._fault()
+                if stub.latency or delay:
+                    time.sleep(stub.latency + delay)
+                if fault:
+                    status, resp = fault, {"detail": "injected fault"}
+                else:
+                    status, resp = stub.handle(self.path, body)
+                raw = json.dumps(resp).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            do_GET = _serve
+            do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    stub = StubCyborgDB(args.host, args.port, args.latency_ms, args.fail_rate)
+    print(f"stub CyborgDB listening on {stub.url}")
+    stub.server.serve_forever()